@@ -0,0 +1,72 @@
+"""
+Activity statistics on NumPy arrays, shared by the bot (yuribot) and the
+dashboard (web/app). Depends on NumPy only, so both images can ship it.
+
+Time keys follow the rollup tables: ``day`` is UTC days since 1970-01-01,
+``hour`` is UTC hours since the epoch and ``month`` is calendar months since
+1970-01 (see .keys and .tiers).
+
+The binary rollup formats both sides read live here too: packed
+active-member bitmaps (.bitmaps) and HyperLogLog sketches (.hll).
+Non-statistical helpers both sides share live in the ``shared`` package.
+"""
+
+from . import bitmaps, hll
+from .kernel import (
+    content_summary,
+    day_labels,
+    dense_series,
+    dow_hour_means,
+    dow_hour_totals,
+    gini,
+    hour_labels,
+    latency_summary,
+    log2_hist,
+    log2_quantiles,
+    moments,
+    rolling_std,
+    silence_ratio,
+    weekday_counts,
+)
+from .keys import day_num, day_str, hour_num, hour_str
+from .tiers import (
+    SLOTS,
+    decode_slots,
+    encode_slots,
+    hour_slots,
+    month_first_day,
+    month_of_day,
+    month_slot_totals,
+    split_months,
+)
+
+__all__ = [
+    "SLOTS",
+    "bitmaps",
+    "content_summary",
+    "day_labels",
+    "day_num",
+    "day_str",
+    "decode_slots",
+    "dense_series",
+    "dow_hour_means",
+    "dow_hour_totals",
+    "encode_slots",
+    "gini",
+    "hll",
+    "hour_labels",
+    "hour_num",
+    "hour_slots",
+    "hour_str",
+    "latency_summary",
+    "log2_hist",
+    "log2_quantiles",
+    "moments",
+    "month_first_day",
+    "month_of_day",
+    "month_slot_totals",
+    "rolling_std",
+    "silence_ratio",
+    "split_months",
+    "weekday_counts",
+]
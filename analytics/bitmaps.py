@@ -0,0 +1,148 @@
+"""
+Packed bitmaps over dense per-guild member indexes (active-user rollups).
+
+A bitmap is plain bytes, bit ``i`` of byte ``i // 8`` in little-endian bit
+order, as long as its highest set index needs; shorter bitmaps are
+zero-extended when combined. Windows are answered by OR-ing a handful of
+rows, overlap (retention) by AND, sizes by popcount.
+
+``active_daily`` holds one bitmap per (guild, day) and ``active_ever`` one
+per (guild, month): everyone active on any day up to the end of that month.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .tiers import month_first_day, month_of_day
+
+# popcount of every byte value
+_POP = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def from_indexes(idxs: Iterable[int], blob: Optional[bytes] = None) -> bytes:
+    """``blob`` (or an empty bitmap) with the bits at ``idxs`` set."""
+    idx = np.fromiter(idxs, dtype=np.int64)
+    size = max(len(blob or b""), int(idx.max()) // 8 + 1 if idx.size else 0)
+    out = np.zeros(size, dtype=np.uint8)
+    if blob:
+        out[: len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+    if idx.size:
+        np.bitwise_or.at(out, idx >> 3, (1 << (idx & 7)).astype(np.uint8))
+    return out.tobytes()
+
+
+def union(a: Optional[bytes], b: Optional[bytes]) -> Optional[bytes]:
+    """OR of two bitmaps (None-tolerant)."""
+    if not a:
+        return b
+    if not b:
+        return a
+    if len(a) < len(b):
+        a, b = b, a
+    out = np.frombuffer(a, dtype=np.uint8).copy()
+    out[: len(b)] |= np.frombuffer(b, dtype=np.uint8)
+    return out.tobytes()
+
+
+def matrix(blobs: Sequence[Optional[bytes]], width: int = 0) -> np.ndarray:
+    """Stack bitmaps into a zero-padded (len(blobs) x bytes) uint8 matrix."""
+    width = max([width, *(len(b) for b in blobs if b)])
+    out = np.zeros((len(blobs), width), dtype=np.uint8)
+    for i, b in enumerate(blobs):
+        if b:
+            out[i, : len(b)] = np.frombuffer(b, dtype=np.uint8)
+    return out
+
+
+def popcount(bits: np.ndarray) -> np.ndarray:
+    """Set bits per bitmap (last axis)."""
+    return _POP[bits].sum(axis=-1)
+
+
+def rolling_union(bits: np.ndarray, window: int) -> np.ndarray:
+    """
+    Row ``i`` of the result is the OR of rows ``i - window + 1 .. i`` (clipped
+    at 0). Doubling spans, so ~log2(window) whole-matrix ORs instead of one
+    per row and window day.
+    """
+    out = bits.copy()
+    span = 1
+    while span * 2 <= window:
+        out[span:] |= out[:-span].copy()
+        span *= 2
+    rest = window - span
+    if rest > 0:
+        out[rest:] |= out[:-rest].copy()
+    return out
+
+
+def month_unions(days: Sequence[int], blobs: Sequence[bytes]) -> Dict[int, bytes]:
+    """
+    Running OR of day-ordered ``active_daily`` bitmaps, sampled at the end of
+    each month present: the ``active_ever`` rows from the first of them on,
+    given nothing before.
+    """
+    out: Dict[int, bytes] = {}
+    acc: Optional[bytes] = None
+    for day, blob in zip(days, blobs):
+        acc = union(acc, blob)
+        out[month_of_day(day)] = acc
+    return out
+
+
+def active_matrix(con: Any, guild_id: int, lo: int, hi: int) -> np.ndarray:
+    """active_daily for days lo..hi as a (days x bytes) matrix; gaps are empty rows."""
+    blobs: List[Optional[bytes]] = [None] * (hi - lo + 1)
+    for day, bits in con.execute(
+        "SELECT day, bits FROM active_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
+        (guild_id, lo, hi),
+    ):
+        blobs[int(day) - lo] = bits
+    return matrix(blobs)
+
+
+def active_before(con: Any, guild_id: int, day: int) -> Optional[bytes]:
+    """
+    Everyone active before epoch ``day``: the last ``active_ever`` row of an
+    earlier month plus this month's days so far, so at most 31 daily rows.
+    """
+    month = month_of_day(day)
+    row = con.execute(
+        "SELECT bits FROM active_ever WHERE guild_id=? AND month<? ORDER BY month DESC LIMIT 1",
+        (guild_id, month),
+    ).fetchone()
+    seen = row[0] if row else None
+    for (bits,) in con.execute(
+        "SELECT bits FROM active_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
+        (guild_id, month_first_day(month), day - 1),
+    ):
+        seen = union(seen, bits)
+    return seen
+
+
+def retention(
+    bits: np.ndarray, seen: Optional[bytes], period_days: int, periods: int
+) -> List[Tuple[int, List[int]]]:
+    """
+    (cohort size, retained per period) for each cohort of an active_matrix
+    covering ``n_cohorts + periods - 1`` whole periods: the members first
+    active in period k (not in ``seen`` nor an earlier period) and how many
+    of them were active in periods k .. k + periods - 1.
+    """
+    n_total = bits.shape[0] // period_days
+    n_cohorts = n_total - periods + 1
+    prior = matrix([seen], bits.shape[1])
+    width = prior.shape[1]
+    bits = np.pad(bits, ((0, 0), (0, width - bits.shape[1])))
+    # one OR per period, then "seen before period k" as a running OR
+    per = np.bitwise_or.reduce(bits.reshape(n_total, period_days, width), axis=1)
+    before = np.bitwise_or.accumulate(np.vstack([prior, per[:-1]]), axis=0)
+    out = []
+    for k in range(n_cohorts):
+        cohort = per[k] & ~before[k]
+        retained = popcount(cohort & per[k : k + periods])
+        out.append((int(retained[0]), [int(r) for r in retained]))
+    return out
@@ -0,0 +1,141 @@
+"""
+HyperLogLog sketches for distinct-token counts (lexical diversity).
+
+A sketch is ``2**p`` one-byte registers. Sketches for the same precision
+merge by element-wise max, so per-(guild, day, user) blobs roll up to any
+window. Standard error is about ``1.04 / sqrt(2**p)`` (3.25% at p=10).
+
+Blob layout: one byte ``p`` followed by either the dense registers
+(``2**p`` bytes) or, while fewer than a third of the registers are set, a
+sparse list of (u16 big-endian index, u8 rank) triples. The two lengths can
+never collide because ``2**p`` is not a multiple of 3.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_P = 10
+_SPARSE = np.dtype([("i", ">u2"), ("r", "u1")])
+
+
+def _hash64(token: str) -> int:
+    # stable across processes, unlike hash()
+    return int.from_bytes(
+        hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def registers(tokens: Iterable[str], p: int = DEFAULT_P) -> bytearray:
+    """Dense registers for ``tokens``."""
+    regs = bytearray(1 << p)
+    width = 64 - p
+    low = (1 << width) - 1
+    for t in tokens:
+        h = _hash64(t)
+        idx = h >> width
+        rank = width - (h & low).bit_length() + 1
+        if rank > regs[idx]:
+            regs[idx] = rank
+    return regs
+
+
+def encode(regs: Sequence[int] | np.ndarray, p: int = DEFAULT_P) -> bytes:
+    if isinstance(regs, (bytes, bytearray)):
+        arr = np.frombuffer(regs, dtype=np.uint8)
+    else:
+        arr = np.asarray(regs, dtype=np.uint8)
+    nz = np.flatnonzero(arr)
+    if 3 * len(nz) < len(arr):
+        pairs = np.empty(len(nz), dtype=_SPARSE)
+        pairs["i"] = nz
+        pairs["r"] = arr[nz]
+        return bytes([p]) + pairs.tobytes()
+    return bytes([p]) + arr.tobytes()
+
+
+def decode(blob: bytes) -> np.ndarray:
+    p = blob[0]
+    m = 1 << p
+    if len(blob) == m + 1:
+        return np.frombuffer(blob, dtype=np.uint8, offset=1).copy()
+    regs = np.zeros(m, dtype=np.uint8)
+    pairs = np.frombuffer(blob, dtype=_SPARSE, offset=1)
+    np.maximum.at(regs, pairs["i"].astype(np.intp), pairs["r"])
+    return regs
+
+
+def merge(a: Optional[bytes], b: Optional[bytes]) -> Optional[bytes]:
+    """Union of two blobs (None-tolerant)."""
+    if not a:
+        return b
+    if not b:
+        return a
+    if a[0] != b[0]:
+        raise ValueError("cannot merge HyperLogLog sketches of different precision")
+    return encode(np.maximum(decode(a), decode(b)), a[0])
+
+
+def estimate(regs: np.ndarray) -> np.ndarray | float:
+    """
+    Cardinality estimate for one register vector, or one per row of a 2-D
+    array. Small cardinalities use linear counting, as in the original paper;
+    64-bit hashes need no large-range correction.
+    """
+    m = regs.shape[-1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    raw = alpha * m * m / np.ldexp(1.0, -regs.astype(np.int32)).sum(axis=-1)
+    zeros = (regs == 0).sum(axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    out = np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+    return float(out) if out.ndim == 0 else out
+
+
+def union_by_key(
+    rows: Iterable[Tuple[Hashable, bytes]], p: int = DEFAULT_P
+) -> Dict[Hashable, float]:
+    """
+    Merge ``(key, blob)`` rows per key and estimate each union.
+
+    One (keys x 2**p) matrix takes every row: dense blobs are max-ed in as
+    stacked arrays and all sparse triples go through a single
+    ``np.maximum.at``, so the cost is a few vectorized passes, not a Python
+    loop per register.
+    """
+    keys: Dict[Hashable, int] = {}
+    dense_k: List[int] = []
+    dense: List[bytes] = []
+    sparse_k: List[int] = []
+    sparse_n: List[int] = []
+    sparse: List[bytes] = []
+    m = 1 << p
+    for key, blob in rows:
+        if not blob:
+            continue
+        if blob[0] != p:
+            raise ValueError("cannot merge HyperLogLog sketches of different precision")
+        k = keys.setdefault(key, len(keys))
+        if len(blob) == m + 1:
+            dense_k.append(k)
+            dense.append(blob[1:])
+        else:
+            sparse_k.append(k)
+            sparse_n.append((len(blob) - 1) // 3)
+            sparse.append(blob[1:])
+    if not keys:
+        return {}
+
+    regs = np.zeros((len(keys), m), dtype=np.uint8)
+    if dense:
+        block = np.frombuffer(b"".join(dense), dtype=np.uint8).reshape(-1, m)
+        np.maximum.at(regs, np.asarray(dense_k, dtype=np.intp), block)
+    if sparse:
+        pairs = np.frombuffer(b"".join(sparse), dtype=_SPARSE)
+        rows_k = np.repeat(np.asarray(sparse_k, dtype=np.intp), sparse_n)
+        np.maximum.at(regs, (rows_k, pairs["i"].astype(np.intp)), pairs["r"])
+    est = estimate(regs)
+    return {key: float(est[k]) for key, k in keys.items()}
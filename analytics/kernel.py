@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Mapping, Sequence, Tuple
+
+import numpy as np
+
+
+def dense_series(rows: Iterable[Sequence[int]], start: int, end: int) -> np.ndarray:
+    """
+    Zero-filled int64 series for keys start..end (inclusive) from
+    ``(key, value)`` query rows; keys outside the range are ignored and
+    repeated keys add up.
+    """
+    n = max(0, end - start + 1)
+    arr = np.array([(r[0], r[1]) for r in rows], dtype=np.int64).reshape(-1, 2)
+    keys = arr[:, 0] - start
+    ok = (keys >= 0) & (keys < n)
+    return np.bincount(keys[ok], weights=arr[ok, 1], minlength=n).astype(np.int64)
+
+
+def hour_labels(start: int, n: int) -> np.ndarray:
+    """'YYYY-MM-DDTHH' labels for ``n`` consecutive epoch hours from ``start``."""
+    hours = np.datetime64(int(start), "h") + np.arange(n)
+    return np.datetime_as_string(hours, unit="h")
+
+
+def day_labels(start: int, n: int) -> np.ndarray:
+    """'YYYY-MM-DD' labels for ``n`` consecutive epoch days from ``start``."""
+    return np.datetime_as_string(np.datetime64(int(start), "D") + np.arange(n), unit="D")
+
+
+def moments(values: Sequence[float] | np.ndarray) -> Dict[str, float]:
+    """
+    min / max / mean / population std / skewness / excess kurtosis (biased,
+    like scipy's defaults). Skewness and kurtosis are NaN when empty and 0
+    when every value is equal.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if x.size == 0:
+        return {
+            "min": 0.0,
+            "max": 0.0,
+            "mean": 0.0,
+            "std": 0.0,
+            "skewness": float("nan"),
+            "kurtosis": float("nan"),
+        }
+    mean = x.mean()
+    d = x - mean
+    var = (d * d).mean()
+    std = float(np.sqrt(var))
+    if std > 0:
+        z = d / std
+        z2 = z * z
+        skew = float((z2 * z).mean())
+        kurt = float((z2 * z2).mean() - 3.0)
+    else:
+        skew = kurt = 0.0
+    return {
+        "min": float(x.min()),
+        "max": float(x.max()),
+        "mean": float(mean),
+        "std": std,
+        "skewness": skew,
+        "kurtosis": kurt,
+    }
+
+
+def gini(values: Sequence[float] | np.ndarray) -> float:
+    """Gini coefficient of the non-negative values (NaN when there are none)."""
+    x = np.asarray(values, dtype=np.float64)
+    x = np.sort(x[x >= 0])
+    n = x.size
+    if n == 0:
+        return float("nan")
+    s = x.sum()
+    if s == 0:
+        return 0.0
+    ranks = np.arange(1, n + 1, dtype=np.float64)
+    return float(2.0 * (ranks * x).sum() / (n * s) - (n + 1) / n)
+
+
+def rolling_std(series: Sequence[float] | np.ndarray, window: int = 24) -> np.ndarray:
+    """
+    Population std over each trailing ``window`` (shorter at the start; 0 for
+    a single point), from running sums in O(n).
+    """
+    x = np.asarray(series, dtype=np.float64)
+    if x.size == 0:
+        return x
+    x = x - x.mean()  # centre first: keeps the E[x²] - E[x]² difference exact
+    c1 = np.concatenate(([0.0], np.cumsum(x)))
+    c2 = np.concatenate(([0.0], np.cumsum(x * x)))
+    idx = np.arange(1, x.size + 1)
+    lo = np.maximum(idx - window, 0)
+    n = (idx - lo).astype(np.float64)
+    mean = (c1[idx] - c1[lo]) / n
+    var = (c2[idx] - c2[lo]) / n - mean * mean
+    out = np.sqrt(np.clip(var, 0.0, None))
+    out[n < 2] = 0.0
+    return out
+
+
+def dow_hour_totals(series: Sequence[float] | np.ndarray, start_hour: int) -> np.ndarray:
+    """
+    7x24 sum per (weekday Mon=0, hour) of an hourly series that starts at
+    epoch hour ``start_hour``.
+    """
+    x = np.asarray(series, dtype=np.float64)
+    hours = start_hour + np.arange(x.size)
+    dow = (hours // 24 + 3) % 7  # 1970-01-01 was a Thursday
+    return np.bincount(dow * 24 + hours % 24, weights=x, minlength=168).reshape(7, 24)
+
+
+def weekday_counts(lo_day: int, hi_day: int) -> np.ndarray:
+    """How many of each weekday (Mon=0) epoch days lo_day..hi_day contain."""
+    span = np.arange(lo_day, hi_day + 1)
+    return np.bincount((span + 3) % 7, minlength=7)
+
+
+def dow_hour_means(series: Sequence[float] | np.ndarray, start_hour: int) -> np.ndarray:
+    """
+    7x24 average per (weekday Mon=0, hour) of an hourly series that starts
+    at epoch hour ``start_hour``, each cell divided by how many of that
+    weekday the series spans.
+    """
+    x = np.asarray(series)
+    grid = dow_hour_totals(x, start_hour)
+    if not x.size:
+        return grid
+    days = weekday_counts(start_hour // 24, (start_hour + x.size - 1) // 24)
+    return grid / np.maximum(days, 1)[:, None]
+
+
+def silence_ratio(series: Sequence[float] | np.ndarray) -> float:
+    """Share of slots with no activity."""
+    x = np.asarray(series)
+    return float((x == 0).mean()) if x.size else 0.0
+
+
+def log2_hist(values_ms: Sequence[float] | np.ndarray, max_bucket: int = 20) -> np.ndarray:
+    """
+    Histogram over floor(log2(ms)) buckets 0..max_bucket (values <= 1 ms in
+    bucket 0, larger ones clamped into the last).
+    """
+    x = np.asarray(values_ms, dtype=np.float64)
+    b = np.floor(np.log2(np.maximum(x, 1.0))).astype(np.int64)
+    b[x <= 1] = 0
+    return np.bincount(np.minimum(b, max_bucket), minlength=max_bucket + 1)
+
+
+def log2_quantiles(
+    hist: Sequence[int] | np.ndarray, probs: Sequence[float] = (0.5, 0.95)
+) -> Tuple[float, ...]:
+    """
+    Quantiles (ms) of a log2-bucket histogram: the lower edge ``2**i`` of
+    the first bucket whose CDF reaches p. NaN for an empty histogram.
+    """
+    h = np.asarray(hist, dtype=np.float64)
+    total = h.sum()
+    if total == 0:
+        return tuple(float("nan") for _ in probs)
+    cdf = np.cumsum(h) / total
+    idx = np.searchsorted(cdf, np.asarray(probs, dtype=np.float64), side="left")
+    return tuple(float(2.0**i) for i in idx)
+
+
+def latency_summary(
+    rows: Iterable[Sequence[int]], max_bucket: int = 20
+) -> Dict[str, Any]:
+    """
+    Per-channel and global median / p95 (ms) from ``(channel_id, bucket, n)``
+    rows of log2-bucket latency histograms. Channels come out in id order.
+    """
+    arr = np.array([(r[0], r[1], r[2]) for r in rows], dtype=np.int64).reshape(-1, 3)
+    chans, idx = np.unique(arr[:, 0], return_inverse=True)
+    hists = np.zeros((chans.size, max_bucket + 1), dtype=np.int64)
+    np.add.at(hists, (idx, np.clip(arr[:, 1], 0, max_bucket)), arr[:, 2])
+    channels = []
+    for cid, hist in zip(chans.tolist(), hists):
+        med, p95 = log2_quantiles(hist, (0.5, 0.95))
+        channels.append(
+            {"channel_id": cid, "median_ms": med, "p95_ms": p95, "n": int(hist.sum())}
+        )
+    total = hists.sum(axis=0)
+    gmed, gp95 = log2_quantiles(total, (0.5, 0.95))
+    return {
+        "channels": channels,
+        "global": {"median_ms": gmed, "p95_ms": gp95, "n": int(total.sum())},
+    }
+
+
+def _upper_median(x: np.ndarray) -> float:
+    return float(np.partition(x, x.size // 2)[x.size // 2])
+
+
+def content_summary(
+    rows: Iterable[Sequence[Any]],
+    vocab: Mapping[int, float],
+    sentiment: Iterable[Sequence[Any]] = (),
+) -> Dict[str, Any]:
+    """
+    Content stats from per-user ``(user_id, messages, words, url_msgs)``
+    rows, distinct-token counts ``vocab`` (exact or HLL) and optional
+    ``(user_id, n, sum_compound)`` sentiment rows. Medians are the upper
+    middle value; lexical diversity is distinct tokens over words (0 when
+    a user has no words).
+    """
+    rows = list(rows)
+    uids = [int(r[0]) for r in rows]
+    mwu = np.array(
+        [(r[1] or 0, r[2] or 0, r[3] or 0) for r in rows], dtype=np.int64
+    ).reshape(-1, 3)
+    msgs, words = mwu[:, 0], mwu[:, 1]
+    total_msgs = int(msgs.sum())
+
+    per_msg = words[msgs > 0] / msgs[msgs > 0]
+    uniq = np.array([float(vocab.get(u, 0)) for u in uids], dtype=np.float64)
+    ttr = uniq / np.maximum(words, 1)
+
+    sent = np.array(
+        [(r[1] or 0, r[2] or 0.0) for r in sentiment], dtype=np.float64
+    ).reshape(-1, 2)
+    scored = sent[sent[:, 0] > 0]
+    comp = np.clip(scored[:, 1] / scored[:, 0], -1.0, 1.0)
+
+    return {
+        "total_messages": total_msgs,
+        "total_words": int(words.sum()),
+        "words_per_msg_mean": float(per_msg.mean()) if per_msg.size else 0.0,
+        "words_per_msg_median": _upper_median(per_msg) if per_msg.size else 0.0,
+        "url_rate": float(mwu[:, 2].sum() / total_msgs) if total_msgs else 0.0,
+        "lexical_diversity_by_user": dict(zip(uids, ttr.tolist())),
+        "sentiment": {
+            "coverage": float(sent[:, 0].sum() / total_msgs) if total_msgs else 0.0,
+            "compound_mean": float(comp.mean()) if comp.size else None,
+            "compound_median": _upper_median(comp) if comp.size else None,
+        },
+    }
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Union
+
+# Rollup time keys: ``day`` is UTC days since 1970-01-01 and ``hour`` UTC
+# hours since the epoch. They are stored in the rollup tables, so the bot and
+# the dashboard must encode them the same way.
+_EPOCH = date(1970, 1, 1)
+
+
+def day_num(day: Union[str, date]) -> int:
+    """'YYYY-MM-DD' (or a date) -> rollup day key."""
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return (day - _EPOCH).days
+
+
+def day_str(n: int) -> str:
+    return (_EPOCH + timedelta(days=int(n))).isoformat()
+
+
+def hour_num(hour: str) -> int:
+    """'YYYY-MM-DDTHH' -> rollup hour key."""
+    return day_num(hour[:10]) * 24 + int(hour[11:13] or 0)
+
+
+def hour_str(n: int) -> str:
+    d, h = divmod(int(n), 24)
+    return f"{day_str(d)}T{h:02d}"
+
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Coarse rollup tiers: ``month`` counts calendar months since 1970-01 and a
+# month's weekday x hour accumulator is 168 little-endian int64 counts,
+# slot = weekday (Mon=0) * 24 + hour.
+SLOTS = 168
+_SLOT_DTYPE = np.dtype("<i8")
+
+
+def month_of_day(day):
+    """Month key of an epoch day (scalar or array)."""
+    m = np.asarray(day, dtype="datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return int(m) if m.ndim == 0 else m
+
+
+def month_first_day(month):
+    """Epoch day of the 1st of a month key (scalar or array)."""
+    d = np.asarray(month, dtype="datetime64[M]").astype("datetime64[D]").astype(np.int64)
+    return int(d) if d.ndim == 0 else d
+
+
+def split_months(
+    lo_day: int, hi_day: int
+) -> Tuple[Optional[Tuple[int, int]], List[Tuple[int, int]]]:
+    """
+    Cover days lo_day..hi_day with the whole calendar months inside it
+    (``(first, last)`` month keys, or None) plus the leftover day ranges at
+    either end, so a monthly tier answers the middle exactly.
+    """
+    m_lo = month_of_day(lo_day)
+    if month_first_day(m_lo) != lo_day:
+        m_lo += 1
+    m_hi = month_of_day(hi_day + 1) - 1  # last month ending on or before hi_day
+    if m_lo > m_hi:
+        return None, [(lo_day, hi_day)]
+    edges = []
+    first, after = month_first_day(m_lo), month_first_day(m_hi + 1)
+    if lo_day < first:
+        edges.append((lo_day, first - 1))
+    if after <= hi_day:
+        edges.append((after, hi_day))
+    return (m_lo, m_hi), edges
+
+
+def hour_slots(hours) -> np.ndarray:
+    """Weekday x hour slot of each epoch hour."""
+    h = np.asarray(hours, dtype=np.int64)
+    return ((h // 24 + 3) % 7) * 24 + h % 24  # 1970-01-01 was a Thursday
+
+
+def month_slot_totals(hours, counts) -> Dict[int, np.ndarray]:
+    """Per-month weekday x hour totals of ``counts`` at epoch ``hours``."""
+    h = np.asarray(hours, dtype=np.int64)
+    c = np.asarray(counts, dtype=np.int64)
+    if h.size == 0:
+        return {}
+    months = month_of_day(h // 24)
+    keys, inv = np.unique(months, return_inverse=True)
+    flat = np.bincount(inv * SLOTS + hour_slots(h), weights=c, minlength=len(keys) * SLOTS)
+    grid = flat.astype(np.int64).reshape(len(keys), SLOTS)
+    return dict(zip(keys.tolist(), grid))
+
+
+def encode_slots(counts) -> bytes:
+    return np.asarray(counts, dtype=_SLOT_DTYPE).tobytes()
+
+
+def decode_slots(blob: Optional[bytes]) -> np.ndarray:
+    if not blob:
+        return np.zeros(SLOTS, dtype=np.int64)
+    return np.frombuffer(blob, dtype=_SLOT_DTYPE).astype(np.int64)
@@ -0,0 +1,25 @@
+"""
+Small helpers the bot (yuribot) and the dashboard (web/app) must agree on
+that are not statistics: Discord snowflake bounds for the message_archive /
+message_facts range scans (.snowflakes), the user_totals leaderboard columns
+(.schema) and the FTS5 query sanitiser for the archive search (.fts).
+Standard library only; the NumPy statistics live in ``analytics``.
+"""
+
+from .fts import fts_query
+from .schema import TOP_STATS
+from .snowflakes import (
+    DISCORD_EPOCH_MS,
+    snowflake_at,
+    snowflake_day_range,
+    snowflake_time_ms,
+)
+
+__all__ = [
+    "DISCORD_EPOCH_MS",
+    "TOP_STATS",
+    "fts_query",
+    "snowflake_at",
+    "snowflake_day_range",
+    "snowflake_time_ms",
+]
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import re
+from typing import List
+
+_FTS_TERM_RE = re.compile(r'"[^"]*"|\S+')
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn user input into a safe FTS5 MATCH expression: every word is quoted
+    (so operators and punctuation can't break the parser), "quoted phrases"
+    stay phrases, and a trailing * keeps prefix matching. Terms are ANDed.
+    """
+    terms: List[str] = []
+    for raw in _FTS_TERM_RE.findall(text or ""):
+        prefix = raw.endswith("*") and not raw.startswith('"')
+        term = raw.strip('"').rstrip("*").replace('"', '""').strip()
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
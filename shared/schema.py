@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+# user_totals columns a leaderboard can rank by; each has a (guild_id, stat)
+# index, and both sides interpolate these names into SQL, so they are the
+# allow-list for the ``stat`` parameter.
+TOP_STATS = (
+    "messages",
+    "words",
+    "replies",
+    "mentions",
+    "gifs",
+    "reactions_rx",
+    "url_msgs",
+    "active_days",
+)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+# Discord snowflakes carry milliseconds since 2015-01-01 in their top 42 bits;
+# message_archive and message_facts range-scan on them instead of timestamps.
+DISCORD_EPOCH_MS = 1420070400000
+
+
+def snowflake_at(when: datetime) -> int:
+    """Smallest Discord snowflake at ``when`` (naive datetimes are UTC)."""
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0, int(when.timestamp() * 1000) - DISCORD_EPOCH_MS) << 22
+
+
+def snowflake_time_ms(snowflake: int) -> int:
+    """Unix epoch milliseconds encoded in a Discord snowflake."""
+    return (int(snowflake) >> 22) + DISCORD_EPOCH_MS
+
+
+def snowflake_day_range(
+    start_day: Optional[str], end_day: Optional[str]
+) -> Tuple[int, Optional[int]]:
+    """
+    Snowflake bounds [lo, hi) covering the UTC days start_day..end_day
+    ('YYYY-MM-DD', inclusive). Open ends give lo=0 / hi=None. Raises
+    ValueError for a malformed day.
+    """
+    lo = 0
+    hi = None
+    if start_day:
+        lo = snowflake_at(datetime.fromisoformat(start_day[:10]))
+    if end_day:
+        hi = snowflake_at(datetime.fromisoformat(end_day[:10]) + timedelta(days=1))
+    return lo, hi
@@ -0,0 +1,189 @@
+"""
+Upstream files the dashboard re-serves from its own origin (the Discord
+SDK), cached in memory and on disk.
+
+A copy younger than ``max_age`` is served as is. An older one is still
+served at once while a single background request revalidates it upstream
+with If-None-Match / If-Modified-Since (stale-while-revalidate); past
+``max_age + stale_for`` the request waits for that revalidation instead.
+If upstream is unreachable the last good copy is served regardless, so
+only a cold start with no cached copy can fail. Browsers get our own ETag
+and Cache-Control, and a matching If-None-Match is answered with 304.
+
+With ASSET_FIXTURE_DIR set, ``<dir>/<name>`` is served instead and
+upstream is never contacted (offline tests, local development).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import dataclasses
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+from fastapi import HTTPException, Request, Response
+
+from .conditional import etag_matches
+
+CACHE_DIR = Path(os.getenv("ASSET_CACHE_DIR") or "/tmp/yuribot-web-assets")
+FIXTURE_DIR = os.getenv("ASSET_FIXTURE_DIR") or None
+
+
+def _body_etag(body: bytes) -> str:
+    return '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class CachedAsset:
+    body: bytes
+    media_type: str
+    etag: str  # ours, from _body_etag(); sent to browsers
+    fetched_at: float  # wall clock of the last upstream 200 or 304
+    upstream_etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class UpstreamAsset:
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        media_type: str,
+        client: Callable[[], httpx.AsyncClient],
+        max_age: float = 3600,
+        stale_for: float = 7 * 86400,
+        browser_max_age: int = 300,
+    ):
+        self.name = name
+        self.url = url
+        self.media_type = media_type
+        self.client = client
+        self.max_age = max_age
+        self.stale_for = stale_for
+        self.browser_max_age = browser_max_age
+        self._entry: Optional[CachedAsset] = None
+        self._loaded = False
+        self._lock = asyncio.Lock()
+        self._refresh: Optional[asyncio.Task] = None
+
+    # ---- on-disk copy ----
+    @property
+    def _paths(self):
+        return CACHE_DIR / f"{self.name}.body", CACHE_DIR / f"{self.name}.json"
+
+    def _load(self) -> Optional[CachedAsset]:
+        if FIXTURE_DIR:
+            try:
+                body = (Path(FIXTURE_DIR) / self.name).read_bytes()
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail=f"No fixture for {self.name}")
+            # never stale, so upstream is never asked
+            return CachedAsset(body, self.media_type, _body_etag(body), fetched_at=float("inf"))
+        body_path, meta_path = self._paths
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+            entry = CachedAsset(body=body, **meta)
+        except (OSError, ValueError, TypeError):
+            return None
+        if entry.etag != _body_etag(body):  # body and metadata out of step
+            return None
+        return entry
+
+    def _save(self, entry: CachedAsset) -> None:
+        body_path, meta_path = self._paths
+        meta = dataclasses.asdict(entry)
+        del meta["body"]
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            for path, data in ((body_path, entry.body), (meta_path, json.dumps(meta).encode())):
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+        except OSError:
+            pass  # memory copy still works; next start refetches
+
+    # ---- upstream ----
+    async def _fetch(self, current: Optional[CachedAsset]) -> CachedAsset:
+        headers = {}
+        if current is not None and current.upstream_etag:
+            headers["If-None-Match"] = current.upstream_etag
+        if current is not None and current.last_modified:
+            headers["If-Modified-Since"] = current.last_modified
+        r = await self.client().get(self.url, headers=headers, timeout=10)
+        if r.status_code == 304 and current is not None:
+            entry = dataclasses.replace(current, fetched_at=time.time())
+        else:
+            r.raise_for_status()
+            entry = CachedAsset(
+                body=r.content,
+                media_type=self.media_type,
+                etag=_body_etag(r.content),
+                fetched_at=time.time(),
+                upstream_etag=r.headers.get("etag"),
+                last_modified=r.headers.get("last-modified"),
+            )
+        self._entry = entry
+        await asyncio.to_thread(self._save, entry)
+        return entry
+
+    async def _revalidate(self) -> CachedAsset:
+        """One upstream request at a time; waiters share its result."""
+        seen = self._entry
+        async with self._lock:
+            if self._entry is not seen and self._entry is not None:
+                return self._entry
+            return await self._fetch(self._entry)
+
+    async def _revalidate_quietly(self) -> None:
+        try:
+            await self._revalidate()
+        except (httpx.HTTPError, OSError):
+            pass  # keep serving the stale copy; the next request retries
+
+    async def get(self) -> CachedAsset:
+        if not self._loaded:
+            self._entry = self._entry or await asyncio.to_thread(self._load)
+            self._loaded = True
+        entry = self._entry
+        if entry is None:
+            return await self._revalidate()
+        age = time.time() - entry.fetched_at
+        if age < self.max_age:
+            return entry
+        if age < self.max_age + self.stale_for:
+            if self._refresh is None or self._refresh.done():
+                self._refresh = asyncio.create_task(self._revalidate_quietly())
+            return entry
+        try:
+            return await self._revalidate()
+        except (httpx.HTTPError, OSError):
+            return entry
+
+    async def response(self, request: Request) -> Response:
+        try:
+            entry = await self.get()
+        except httpx.HTTPStatusError as e:
+            raise HTTPException(
+                status_code=e.response.status_code,
+                detail=f"Failed to fetch {self.url}: {e}",
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=502, detail=f"Failed to fetch {self.url}: {e}")
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": (
+                f"public, max-age={self.browser_max_age}, "
+                f"stale-while-revalidate={int(self.max_age)}"
+            ),
+        }
+        if entry.last_modified:
+            headers["Last-Modified"] = entry.last_modified
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
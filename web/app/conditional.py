@@ -0,0 +1,19 @@
+"""
+Conditional GET helpers shared by the routes that send ETags.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches ``etag``: a comma-separated list
+    of tags or ``*``, compared weakly (a ``W/`` prefix is ignored), as
+    RFC 9110 asks of If-None-Match.
+    """
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
@@ -0,0 +1,156 @@
+"""
+Read-only SQLite access for the dashboard.
+
+Each thread keeps one ``mode=ro`` connection to BOT_DB_PATH (query_only,
+memory-mapped) and reuses it for every query, so a request no longer pays
+connect + schema parse per helper. Async handlers hand their queries to a
+bounded executor with ``run()`` and keep the event loop free; the admin
+write routes still open their own read-write connection (main.db_conn).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Any, Callable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name) or default))
+    except ValueError:
+        return default
+
+
+# Threads running dashboard queries; more concurrent requests queue up here
+# instead of each holding a Starlette worker thread and a connection.
+READ_WORKERS = _env_int("WEB_DB_READ_WORKERS", 8)
+# Page cache shared through the OS instead of copied per connection.
+MMAP_BYTES = _env_int("WEB_DB_MMAP_MB", 256) << 20
+
+_READER_PRAGMAS = (
+    "PRAGMA query_only=ON",
+    "PRAGMA busy_timeout=3000",
+    "PRAGMA temp_store=MEMORY",
+    f"PRAGMA mmap_size={MMAP_BYTES}",
+)
+
+
+def db_path() -> str:
+    return os.getenv("BOT_DB_PATH", "/app/data/bot.sqlite3")
+
+
+def connect_readonly(path: Optional[str] = None) -> sqlite3.Connection:
+    """A new read-only connection (Row rows); the caller owns and closes it."""
+    path = path or db_path()
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"DB not found at {path}")
+    try:
+        con = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    except sqlite3.OperationalError:
+        con = sqlite3.connect(path, check_same_thread=False)
+    for pragma in _READER_PRAGMAS:
+        con.execute(pragma)
+    con.row_factory = sqlite3.Row
+    return con
+
+
+class ReadPool:
+    """One read-only connection per thread, opened on first use."""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._open: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by close(); older thread connections are stale
+
+    def get(self) -> sqlite3.Connection:
+        path = db_path()
+        con = getattr(self._local, "con", None)
+        key = (path, self._generation)
+        if con is not None and self._local.key == key:
+            if con.in_transaction:  # never hold an old WAL snapshot between requests
+                con.rollback()
+            return con
+        if con is not None:
+            self._drop(con)
+        con = connect_readonly(path)
+        self._local.con, self._local.key = con, key
+        with self._lock:
+            self._open.append(con)
+        return con
+
+    def _drop(self, con: sqlite3.Connection) -> None:
+        with self._lock:
+            with suppress(ValueError):
+                self._open.remove(con)
+        with suppress(Exception):
+            con.close()
+
+    def close(self) -> None:
+        with self._lock:
+            cons, self._open = self._open, []
+            self._generation += 1
+        for con in cons:
+            with suppress(Exception):
+                con.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"path": db_path(), "connections": len(self._open)}
+
+
+_pool = ReadPool()
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=READ_WORKERS, thread_name_prefix="db-read"
+            )
+        return _executor
+
+
+def reader() -> sqlite3.Connection:
+    """
+    This thread's pooled read-only connection. Do not close it; read results
+    with fetchall()/fetchone() so no statement stays open between requests.
+    """
+    return _pool.get()
+
+
+def fetchall(sql: str, params: Any = ()) -> List[sqlite3.Row]:
+    return reader().execute(sql, params).fetchall()
+
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run blocking ``fn`` (which may call reader()) on the read executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(), functools.partial(fn, *args, **kwargs)
+    )
+
+
+def stats() -> dict:
+    return {**_pool.stats(), "workers": READ_WORKERS, "mmap_bytes": MMAP_BYTES}
+
+
+def close() -> None:
+    """Stop the executor and close every pooled connection (call on shutdown)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    _pool.close()
@@ -0,0 +1,231 @@
+"""
+Reading the bot log without loading it: tail by seeking backwards from the
+end in fixed-size blocks, and follow by polling the file size.
+
+Records are "<asctime> <LEVEL> <logger>: <message>" lines (yuribot.bot's
+logging format) plus any continuation lines, such as tracebacks, up to the
+next record; level and grep filters keep or drop whole records. Rotation
+is handled for logrotate-style setups: the tail continues into ``<path>.1``
+when the live file is short, and the follower notices a new inode or a
+truncated file and starts over from the top of the new one.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+BLOCK_SIZE = 64 * 1024
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+_RANK = {name: i for i, name in enumerate(LEVELS)}
+_HEADER_RE = re.compile(
+    r"^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)? (DEBUG|INFO|WARNING|ERROR|CRITICAL) "
+)
+
+
+class RecordFilter:
+    """Keeps records at or above ``level`` whose text matches ``grep``."""
+
+    def __init__(self, level: Optional[str] = None, grep: Optional[str] = None):
+        level = (level or "").upper()
+        if level and level not in _RANK:
+            raise ValueError(f"unknown level: {level}")
+        self.min_rank = _RANK.get(level)
+        self.pattern = None
+        if grep:
+            try:
+                self.pattern = re.compile(grep, re.IGNORECASE)
+            except re.error:  # not a regex: match it literally
+                self.pattern = re.compile(re.escape(grep), re.IGNORECASE)
+
+    @property
+    def active(self) -> bool:
+        return self.min_rank is not None or self.pattern is not None
+
+    def __call__(self, record: List[str]) -> bool:
+        if self.min_rank is not None:
+            m = _HEADER_RE.match(record[0])
+            if m is None or _RANK[m.group(1)] < self.min_rank:
+                return False
+        if self.pattern is not None:
+            return any(self.pattern.search(line) for line in record)
+        return True
+
+
+def _is_header(line: str) -> bool:
+    return _HEADER_RE.match(line) is not None
+
+
+def _lines_backwards(f: BinaryIO, block: int) -> Iterator[Tuple[bytes, int]]:
+    """(line without newline, bytes read so far) from the last line to the first."""
+    end = pos = f.seek(0, os.SEEK_END)
+    rest = b""
+    while pos > 0:
+        step = min(block, pos)
+        pos -= step
+        f.seek(pos)
+        chunk = f.read(step) + rest
+        if pos + step == end and chunk.endswith(b"\n"):
+            chunk = chunk[:-1]  # the final newline does not start another line
+        lines = chunk.split(b"\n")
+        rest = lines[0]
+        for line in reversed(lines[1:]):
+            yield line, end - pos
+    if end:
+        yield rest, end
+
+
+def tail(
+    path: str,
+    n: int,
+    rfilter: Optional[RecordFilter] = None,
+    max_scan: int = 64 << 20,
+    block: int = BLOCK_SIZE,
+) -> Tuple[List[str], bool]:
+    """
+    The last ``n`` lines of the log that belong to records ``rfilter`` keeps,
+    oldest first, each ending in a newline; continues into ``path``.1 if
+    needed. Reads about as many blocks as those lines span, or stops after
+    ``max_scan`` bytes when filtering; the flag says whether it stopped early.
+    """
+    rfilter = rfilter or RecordFilter()
+    found: List[List[str]] = []  # kept records, newest first
+    count = 0
+    pending: List[str] = []  # a record's lines, bottom up, until its header
+    scanned = 0
+    stopped = False
+
+    def take(record: List[str]) -> int:
+        record.reverse()
+        if not rfilter(record):
+            return 0
+        found.append(record)
+        return len(record)
+
+    for p in (path, path + ".1"):
+        try:
+            f = open(p, "rb")
+        except FileNotFoundError:
+            continue
+        with f:
+            read = 0
+            for raw, read in _lines_backwards(f, block):
+                line = raw.decode("utf-8", errors="replace") + "\n"
+                pending.append(line)
+                if _is_header(line):
+                    count += take(pending)
+                    pending = []
+                    if count >= n:
+                        break
+                if rfilter.active and scanned + read > max_scan:
+                    stopped = True
+                    break
+            scanned += read
+        if count >= n or stopped:
+            break
+    else:
+        if pending and not rfilter.active:  # lines above the first record header
+            count += take(pending)
+    lines = [line for record in reversed(found) for line in record]
+    return lines[-n:], stopped
+
+
+class LogFollower:
+    """
+    Lines appended to the log since the last poll(), read from the last
+    offset so each poll costs only the new bytes. ``position`` ("inode:offset")
+    lets a reconnecting client resume where it stopped.
+    """
+
+    def __init__(self, path: str, rfilter: Optional[RecordFilter] = None, position: str = ""):
+        self.path = path
+        self.rfilter = rfilter or RecordFilter()
+        self._f: Optional[BinaryIO] = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._partial = b""
+        self._keep = not self.rfilter.active  # fate of the record being continued
+        self._resume = position
+
+    @property
+    def position(self) -> str:
+        # the unterminated tail is re-read on resume, so it is not consumed yet
+        return f"{self._inode or 0}:{max(0, self._offset - len(self._partial))}"
+
+    def _open(self, from_end: bool) -> bool:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return False
+        self._close()
+        st = os.fstat(f.fileno())
+        self._f, self._inode = f, st.st_ino
+        self._offset = st.st_size if from_end else 0
+        if from_end and self._resume:
+            inode, _, offset = self._resume.partition(":")
+            if inode == str(st.st_ino) and offset.isdigit() and int(offset) <= st.st_size:
+                self._offset = int(offset)
+        self._resume = ""
+        return True
+
+    def _close(self) -> None:
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+    def _read(self) -> bytes:
+        self._f.seek(self._offset)
+        data = self._f.read()
+        self._offset += len(data)
+        return data
+
+    def poll(self) -> List[List[str]]:
+        """New complete records (lists of lines) that pass the filter."""
+        # the first poll starts at the end (the page already shows what came
+        # before) or where a reconnecting client left off
+        if self._f is None and not self._open(from_end=True):
+            return []
+        data = b""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if st is not None and st.st_ino != self._inode:
+            data += self._read()  # rest of the rotated file, then the new one
+            self._open(from_end=False)
+        elif st is not None and st.st_size < self._offset:
+            self._offset, self._partial = 0, b""  # truncated in place
+        data += self._read()
+        if not data:
+            return []
+        complete, newline, self._partial = (self._partial + data).rpartition(b"\n")
+        if not newline:
+            return []
+        return self._records(complete.decode("utf-8", errors="replace").split("\n"))
+
+    def _records(self, lines: List[str]) -> List[List[str]]:
+        # A handler writes a record in one go, so a record's lines nearly
+        # always arrive in the same poll; stragglers follow its verdict.
+        records: List[List[str]] = []
+        current: Optional[List[str]] = None
+
+        def close() -> None:
+            if current is not None:
+                self._keep = self.rfilter(current)
+                if self._keep:
+                    records.append(current)
+
+        for line in lines:
+            if _is_header(line):
+                close()
+                current = [line]
+            elif current is not None:
+                current.append(line)
+            elif self._keep:
+                records.append([line])
+        close()
+        return records
+
+    def close(self) -> None:
+        self._close()
@@ -4,28 +4,41 @@ from fastapi.responses import (
     JSONResponse,
     RedirectResponse,
     PlainTextResponse,
+    StreamingResponse,
 )
 from fastapi.staticfiles import StaticFiles
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pathlib import Path
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from . import auth
+from . import assets, auth, db, logtail
+import asyncio
 import os
 import sqlite3
 from datetime import datetime, timezone
-from urllib.parse import urlparse
+from urllib.parse import urlencode, urlparse
 import time
 import re
+import base64
+import csv
+import io
+import threading
+import zlib
 
 from .routes import activity as activity_routes
+from .routes import archive as archive_routes
 import warnings
 import json
 import httpx  # Added for SDK proxy
-from fastapi import Response  # Added for SDK proxy
 
 BOT_DB_PATH = os.getenv("BOT_DB_PATH", "/app/data/bot.sqlite3")
 LOG_PATH = os.getenv("LOG_PATH", "/app/data/bot.log")
+LOG_TAIL_MAX = 10000
+# Filtered tails give up after this much of the log (newest first).
+LOG_TAIL_MAX_SCAN = int(os.getenv("LOG_TAIL_MAX_SCAN_MB") or 32) << 20
+LOG_FOLLOW_POLL = float(os.getenv("LOG_FOLLOW_POLL") or 1)
+# Seconds a cached SDK copy is used before it is revalidated upstream.
+SDK_MAX_AGE = float(os.getenv("SDK_MAX_AGE") or 3600)
 STATIC_DIR = Path(__file__).parent / "static"
 GUILD_ID = 1417424779354574932
 
@@ -68,9 +81,16 @@ app.mount(
 )
 app.include_router(auth.router)
 app.include_router(activity_routes.router)
+app.include_router(archive_routes.router)
 # Create a reusable client for proxying
 client = httpx.AsyncClient()
 
+
+@app.on_event("shutdown")
+async def _shutdown():
+    await client.aclose()
+    db.close()
+
 templates_path = Path(__file__).parent / "templates"
 env = Environment(
     loader=FileSystemLoader(str(templates_path)), autoescape=select_autoescape()
@@ -78,6 +98,7 @@ env = Environment(
 
 
 def db_conn():
+    """Read-write connection for the admin editors; pages read through db.reader()."""
     if not os.path.exists(BOT_DB_PATH):
         raise FileNotFoundError(f"DB not found at {BOT_DB_PATH}")
     con = sqlite3.connect(BOT_DB_PATH)
@@ -100,13 +121,10 @@ def db_status():
             info["mtime"] = datetime.fromtimestamp(
                 os.path.getmtime(BOT_DB_PATH)
             ).isoformat()
-            con = db_conn()
-            cur = con.cursor()
-            cur.execute(
+            rows = db.fetchall(
                 "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name"
             )
-            info["tables"] = [r[0] for r in cur.fetchall()]
-            con.close()
+            info["tables"] = [r[0] for r in rows]
     except Exception as e:
         info["error"] = str(e)
     return info
@@ -117,11 +135,20 @@ def health():
     return {"ok": True, "service": "web", "time": datetime.utcnow().isoformat() + "Z"}
 
 
+def _read_table(table: str, sql: str):
+    """Rows of ``sql`` as dicts, or None when ``table`` does not exist yet."""
+    if not db.fetchall(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,)
+    ):
+        return None
+    return [dict(r) for r in db.fetchall(sql)]
+
+
 @app.get("/", response_class=HTMLResponse)
-def home(request: Request):
+async def home(request: Request):
     context = {
         "request": request,
-        "db": db_status(),
+        "db": await db.run(db_status),
         "env": {
             "BOT_DB_PATH": BOT_DB_PATH,
             "LOG_PATH": LOG_PATH,
@@ -138,18 +165,70 @@ def home(request: Request):
     response_class=HTMLResponse,
     dependencies=[Depends(auth.require_auth())],
 )
-def logs_page(request: Request, n: int = 400):
+def logs_page(request: Request, n: int = 400, level: str = "", q: str = ""):
+    n = max(1, min(n, LOG_TAIL_MAX))
+    rfilter = _log_filter(level, q)
     lines = []
+    truncated = False
     exists = os.path.exists(LOG_PATH)
     if exists:
         try:
-            with open(LOG_PATH, "r", errors="ignore") as f:
-                lines = f.readlines()[-n:]
+            lines, truncated = logtail.tail(LOG_PATH, n, rfilter, LOG_TAIL_MAX_SCAN)
         except Exception as e:
-            lines = [f"[error reading log] {e}\\n"]
+            lines = [f"[error reading log] {e}\n"]
     template = env.get_template("logs.html")
     return template.render(
-        request=request, log_path=LOG_PATH, exists=exists, lines=lines, n=n
+        request=request,
+        log_path=LOG_PATH,
+        exists=exists,
+        lines=lines,
+        n=n,
+        level=level.upper(),
+        q=q,
+        levels=logtail.LEVELS,
+        truncated=truncated,
+    )
+
+
+def _log_filter(level: str, q: str) -> logtail.RecordFilter:
+    try:
+        return logtail.RecordFilter(level, q)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _follow_log(follower: logtail.LogFollower):
+    quiet = 0.0
+    try:
+        while True:
+            records = await asyncio.to_thread(follower.poll)
+            if records:
+                lines = (line.replace("\r", "") for r in records for line in r)
+                data = "".join(f"data: {line}\n" for line in lines)
+                yield f"id: {follower.position}\n{data}\n"
+                quiet = 0.0
+            elif quiet >= 15:
+                yield ": ping\n\n"
+                quiet = 0.0
+            await asyncio.sleep(LOG_FOLLOW_POLL)
+            quiet += LOG_FOLLOW_POLL
+    finally:
+        follower.close()
+
+
+@app.get("/admin/logs/stream", dependencies=[Depends(auth.require_auth())])
+async def logs_stream(request: Request, level: str = "", q: str = ""):
+    """
+    Server-sent events with the records appended to the log from now on (or
+    from Last-Event-ID), one event per poll, filtered like the page.
+    """
+    follower = logtail.LogFollower(
+        LOG_PATH, _log_filter(level, q), request.headers.get("last-event-id") or ""
+    )
+    return StreamingResponse(
+        _follow_log(follower),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -159,37 +238,246 @@ def logs_page(request: Request, n: int = 400):
     response_class=HTMLResponse,
     dependencies=[Depends(auth.require_auth())],
 )
-def db_tables(request: Request):
-    status = db_status()
+async def db_tables(request: Request):
+    status = await db.run(db_status)
     tables = status.get("tables", [])
     template = env.get_template("db.html")
     return template.render(request=request, tables=tables, status=status)
 
 
-@app.get("/admin/db/table/{name}", response_class=HTMLResponse)
-def db_table_view(request: Request, name: str, limit: int = 100, offset: int = 0):
-    con = db_conn()
-    cur = con.cursor()
+# Table pages are keyset-paginated on the primary key (rowid when there is
+# none): "next" / "prev" carry the key of the edge row as an opaque token,
+# so every page is an index seek however deep it is, and rows inserted
+# meanwhile do not shift the pages. ``f.<column>=value`` query parameters
+# filter by equality, or by LIKE when the value contains %.
+DB_PAGE_MAX = 1000
+EXPORT_BATCH = 2000
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_info(name: str):
+    """(columns, primary key columns in key order); 404 for unknown tables."""
+    if not db.fetchall(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ):
+        raise HTTPException(status_code=404, detail=f"no such table: {name}")
+    pragma = db.fetchall(f"PRAGMA table_info({_ident(name)})")
+    pk = sorted((r for r in pragma if r["pk"]), key=lambda r: r["pk"])
+    return [r["name"] for r in pragma], [r["name"] for r in pk]
+
+
+def _table_filters(params, cols):
+    """SQL conditions and values for the ``f.<column>`` query parameters."""
+    where, values = [], []
+    for key, value in params.multi_items():
+        if not key.startswith("f.") or value == "":
+            continue
+        col = key[2:]
+        if col not in cols:
+            raise HTTPException(status_code=400, detail=f"unknown column: {col}")
+        where.append(f"{_ident(col)} {'LIKE' if '%' in value else '='} ?")
+        values.append(value)
+    return where, values
+
+
+def _encode_cursor(values) -> str:
+    def enc(v):
+        return {"b": base64.b64encode(v).decode()} if isinstance(v, bytes) else v
+
+    raw = json.dumps([enc(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(token: str, n: int):
     try:
-        cur.execute(f"PRAGMA table_info({name})")
-        cols = [r["name"] for r in cur.fetchall()]
-        cur.execute(f"SELECT * FROM {name} LIMIT ? OFFSET ?", (limit, offset))
-        rows = [dict(r) for r in cur.fetchall()]
-        # Try to detect PK
-        cur.execute(f"PRAGMA table_info({name})")
-        pragma = cur.fetchall()
-        pk_cols = [r["name"] for r in pragma if r["pk"]]
-    finally:
-        con.close()
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = [
+            base64.b64decode(v["b"]) if isinstance(v, dict) else v
+            for v in json.loads(raw)
+        ]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="invalid page token")
+    if len(values) != n:
+        raise HTTPException(status_code=400, detail="invalid page token")
+    return values
+
+
+def _table_page(name, limit, after, before, params):
+    cols, pk_cols = _table_info(name)
+    keys = pk_cols or ["rowid"]
+    where, values = _table_filters(params, cols)
+    key = ", ".join(map(_ident, keys))
+    token = after or before
+    if token:
+        # row-value comparison, so composite keys still seek on their index
+        marks = ", ".join("?" * len(keys))
+        where.append(f"({key}) {'<' if before else '>'} ({marks})")
+        values += _decode_cursor(token, len(keys))
+    direction = " DESC" if before else ""
+    sql = (
+        f"SELECT {key}, * FROM {_ident(name)}"
+        + (f" WHERE {' AND '.join(where)}" if where else "")
+        + f" ORDER BY {', '.join(_ident(k) + direction for k in keys)} LIMIT ?"
+    )
+    fetched = db.reader().execute(sql, [*values, limit + 1]).fetchall()
+    more = len(fetched) > limit
+    fetched = fetched[:limit]
+    if before:
+        fetched.reverse()
+    k = len(keys)
+    page_keys = [tuple(r[:k]) for r in fetched]
+    rows = []
+    for r, key in zip(fetched, page_keys):
+        row = dict(zip(cols, r[k:]))
+        if not pk_cols:
+            row["rowid"] = key[0]
+        rows.append(row)
+    has_prev, has_next = (more, True) if before else (bool(after), more)
+    return {
+        "cols": cols,
+        "pk_cols": pk_cols,
+        "rows": rows,
+        "prev": _encode_cursor(page_keys[0]) if rows and has_prev else None,
+        "next": _encode_cursor(page_keys[-1]) if rows and has_next else None,
+    }
+
+
+@app.get("/admin/db/table/{name}", response_class=HTMLResponse)
+async def db_table_view(
+    request: Request,
+    name: str,
+    limit: int = 100,
+    after: str = None,
+    before: str = None,
+):
+    limit = max(1, min(limit, DB_PAGE_MAX))
+    page = await db.run(_table_page, name, limit, after, before, request.query_params)
+    # filters and limit carried over to the next / prev / export links
+    query = urlencode(
+        [
+            (k, v)
+            for k, v in request.query_params.multi_items()
+            if k not in ("after", "before")
+        ]
+    )
+    filters = {
+        k[2:]: v for k, v in request.query_params.multi_items() if k.startswith("f.")
+    }
     template = env.get_template("db_table.html")
     return template.render(
         request=request,
         name=name,
-        cols=cols,
-        rows=rows,
         limit=limit,
-        offset=offset,
-        pk_cols=pk_cols,
+        query=query,
+        filters=filters,
+        **page,
+    )
+
+
+class _TableExport:
+    """
+    One export, encoded a fetchmany() batch at a time on its own read-only
+    connection, so memory stays flat however many rows match. BLOBs are
+    written as base64.
+    """
+
+    def __init__(self, name, fmt, compress, params):
+        cols, pk_cols = _table_info(name)
+        where, values = _table_filters(params, cols)
+        keys = ", ".join(map(_ident, pk_cols or ["rowid"]))
+        self.cols = cols
+        self.fmt = fmt
+        self.zip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        self.header = fmt == "csv"
+        self._lock = threading.Lock()
+        self._con = db.connect_readonly()
+        try:
+            self._cur = self._con.execute(
+                f"SELECT * FROM {_ident(name)}"
+                + (f" WHERE {' AND '.join(where)}" if where else "")
+                + f" ORDER BY {keys}",
+                values,
+            )
+        except BaseException:
+            self._con.close()
+            raise
+
+    @staticmethod
+    def _value(v):
+        return base64.b64encode(v).decode() if isinstance(v, bytes) else v
+
+    def read(self):
+        """The next encoded chunk, or None once everything has been sent."""
+        with self._lock:
+            if self._con is None:
+                return None
+            rows = self._cur.fetchmany(EXPORT_BATCH)
+            out = io.StringIO()
+            if self.fmt == "csv":
+                w = csv.writer(out)
+                if self.header:
+                    w.writerow(self.cols)
+                    self.header = False
+                w.writerows([self._value(v) for v in r] for r in rows)
+            else:
+                for r in rows:
+                    out.write(
+                        json.dumps(
+                            dict(zip(self.cols, map(self._value, r))),
+                            ensure_ascii=False,
+                        )
+                    )
+                    out.write("\n")
+            data = out.getvalue().encode()
+            if not rows:
+                self._close()
+            if self.zip is not None:
+                data = self.zip.compress(data)
+                if self._con is None:
+                    data += self.zip.flush()
+            return data
+
+    def _close(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+async def _export_chunks(export: _TableExport):
+    try:
+        while (chunk := await db.run(export.read)) is not None:
+            if chunk:
+                yield chunk
+    finally:
+        export.close()
+
+
+_EXPORT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@app.get(
+    "/admin/db/table/{name}/export",
+    dependencies=[Depends(auth.require_auth())],
+)
+async def db_table_export(
+    request: Request, name: str, format: str = "csv", gzip: bool = False
+):
+    """Stream every matching row (same ``f.<column>`` filters) in key order."""
+    if format not in _EXPORT_TYPES:
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+    export = await db.run(_TableExport, name, format, gzip, request.query_params)
+    filename = f"{name}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        _export_chunks(export),
+        media_type="application/gzip" if gzip else _EXPORT_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -265,27 +553,12 @@ def db_table_delete(name: str, id: str = Form(...)):
 
 # ---------- Birthday viewer/editor ----------
 @app.get("/admin/birthdays", response_class=HTMLResponse)
-def birthdays_page(request: Request):
-    con = db_conn()
-    cur = con.cursor()
+async def birthdays_page(request: Request):
     err = None
-    rows = []
-    try:
-        cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='birthdays'"
-        )
-        if cur.fetchone():
-            cur.execute("PRAGMA table_info(birthdays)")
-            cols = [r["name"] for r in cur.fetchall()]
-            # try common columns
-            q = "SELECT * FROM birthdays ORDER BY day"
-            cur.execute(q)
-            rows = [dict(r) for r in cur.fetchall()]
-        else:
-            cols = []
-            err = "Table 'birthdays' not found. Expected columns: id, user, day (YYYY-MM-DD), closeness (INT)."
-    finally:
-        con.close()
+    rows = await db.run(_read_table, "birthdays", "SELECT * FROM birthdays ORDER BY day")
+    if rows is None:
+        rows = []
+        err = "Table 'birthdays' not found. Expected columns: id, user, day (YYYY-MM-DD), closeness (INT)."
     template = env.get_template("birthdays.html")
     return template.render(request=request, rows=rows, err=err)
 
@@ -334,22 +607,12 @@ def birthdays_delete(id: int = Form(...)):
     response_class=HTMLResponse,
     dependencies=[Depends(auth.require_auth())],
 )
-def booly_page(request: Request):
-    con = db_conn()
-    cur = con.cursor()
+async def booly_page(request: Request):
     err = None
-    rows = []
-    try:
-        cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='booly'"
-        )
-        if cur.fetchone():
-            cur.execute("SELECT key, value FROM booly ORDER BY key")
-            rows = [dict(r) for r in cur.fetchall()]
-        else:
-            err = "Table 'booly' not found. Expected schema: key TEXT PRIMARY KEY, value INTEGER (0/1)."
-    finally:
-        con.close()
+    rows = await db.run(_read_table, "booly", "SELECT key, value FROM booly ORDER BY key")
+    if rows is None:
+        rows = []
+        err = "Table 'booly' not found. Expected schema: key TEXT PRIMARY KEY, value INTEGER (0/1)."
     template = env.get_template("booly.html")
     return template.render(request=request, rows=rows, err=err)
 
@@ -387,22 +650,14 @@ def booly_delete(key: str = Form(...)):
     response_class=HTMLResponse,
     dependencies=[Depends(auth.require_auth())],
 )
-def mu_page(request: Request):
-    con = db_conn()
-    cur = con.cursor()
+async def mu_page(request: Request):
     err = None
-    rows = []
-    try:
-        cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='mu_status'"
-        )
-        if cur.fetchone():
-            cur.execute("SELECT * FROM mu_status ORDER BY updated_at DESC")
-            rows = [dict(r) for r in cur.fetchall()]
-        else:
-            err = "Table 'mu_status' not found. Expected columns: id, user, status, updated_at."
-    finally:
-        con.close()
+    rows = await db.run(
+        _read_table, "mu_status", "SELECT * FROM mu_status ORDER BY updated_at DESC"
+    )
+    if rows is None:
+        rows = []
+        err = "Table 'mu_status' not found. Expected columns: id, user, status, updated_at."
     template = env.get_template("mu.html")
     return template.render(request=request, rows=rows, err=err)
 
@@ -508,29 +763,51 @@ def timestamp_now():
 
 
 # ---------- START: New Stats Dashboard ----------
-def get_ranking(con, stat_expr, order="DESC", limit=20):
-    """Helper to run a ranking query on the message_archive table."""
+def get_ranking(con, stat, limit=20):
+    """Top users by a user_totals column (indexed per stat, so a short walk)."""
     query = f"""
-        SELECT
-            user_id,
-            ({stat_expr}) AS value
-        FROM message_archive
-        GROUP BY user_id
-        HAVING value > 0
-        ORDER BY value {order}
+        SELECT user_id, {stat} AS value
+        FROM user_totals
+        WHERE guild_id = ? AND {stat} > 0
+        ORDER BY {stat} DESC
         LIMIT ?
     """
     cur = con.cursor()
-    cur.execute(query, (limit,))
+    cur.execute(query, (GUILD_ID, limit))
     return [dict(r) for r in cur.fetchall()]
 
 
+def _stats_rankings():
+    con = db.reader()
+
+    # Check if table exists
+    cur = con.cursor()
+    cur.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name='user_totals'"
+    )
+    if not cur.fetchone():
+        raise FileNotFoundError(
+            "Table 'user_totals' not found in database. Has the bot run its migrations?"
+        )
+
+    # --- Run all ranking queries ---
+    return {
+        "total_messages": get_ranking(con, "messages"),
+        "total_words": get_ranking(con, "words"),
+        "active_days": get_ranking(con, "active_days"),
+        "total_gifs": get_ranking(con, "gifs"),
+        "reactions_received": get_ranking(con, "reactions_rx"),
+        "mentions_sent": get_ranking(con, "mentions"),
+        "replies_sent": get_ranking(con, "replies"),
+    }
+
+
 @app.get(
     "/admin/stats",
     response_class=HTMLResponse,
     dependencies=[Depends(auth.require_auth())],
 )
-def stats_page(request: Request):
+async def stats_page(request: Request):
     rankings = {}
     error = None
 
@@ -546,43 +823,7 @@ def stats_page(request: Request):
     ]
 
     try:
-        con = db_conn()
-
-        # Check if table exists
-        cur = con.cursor()
-        cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='table' AND name='message_archive'"
-        )
-        if not cur.fetchone():
-            raise FileNotFoundError(
-                "Table 'message_archive' not found in database. Is the bot logging messages?"
-            )
-
-        # --- Run all ranking queries ---
-        rankings["total_messages"] = get_ranking(con, "COUNT(id)")
-
-        # Est. words: count spaces in messages longer than 10 chars
-        rankings["total_words"] = get_ranking(
-            con,
-            "SUM(CASE WHEN LENGTH(content) > 10 THEN (LENGTH(content) - LENGTH(REPLACE(content, ' ', '')) + 1) ELSE 0 END)",
-        )
-
-        rankings["active_hours"] = get_ranking(
-            con, "COUNT(DISTINCT STRFTIME('%Y-%m-%d %H', created_at))"
-        )
-
-        rankings["total_gifs"] = get_ranking(
-            con, "SUM(CASE WHEN content LIKE '%.gif%' THEN 1 ELSE 0 END)"
-        )
-
-        rankings["reactions_received"] = get_ranking(con, "SUM(num_reactions)")
-
-        rankings["mentions_sent"] = get_ranking(con, "SUM(num_mentions)")
-
-        rankings["replies_sent"] = get_ranking(con, "SUM(is_reply)")
-
-        con.close()
-
+        rankings = await db.run(_stats_rankings)
     except Exception as e:
         error = str(e)
 
@@ -593,20 +834,19 @@ def stats_page(request: Request):
 
 
 # ---------- SDK Proxy (from activity fix) ----------
+discord_sdk = assets.UpstreamAsset(
+    "sdk.js",
+    "https://discord.com/sdk.js",
+    "application/javascript",
+    client=lambda: client,
+    max_age=SDK_MAX_AGE,
+)
+
+
 @app.get("/sdk/sdk.js")
-async def get_discord_sdk():
+async def get_discord_sdk(request: Request):
     """
     Proxies the Discord SDK to the client.
     This is required for the URL Mapping to work.
     """
-    try:
-        r = await client.get("https://discord.com/sdk.js")
-        r.raise_for_status()  # Raise an exception for 4xx/5xx errors
-
-        # Return the content with the correct JavaScript MIME type
-        return Response(content=r.content, media_type="application/javascript")
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(
-            status_code=e.response.status_code,
-            detail=f"Failed to fetch Discord SDK: {e}",
-        )
+    return await discord_sdk.response(request)
@@ -1,51 +1,39 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import hashlib
+import json
+import logging
 import math
 import os
 import sqlite3
-from collections import defaultdict, deque
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from fastapi import APIRouter, HTTPException
-from starlette.responses import JSONResponse
-
-router = APIRouter(prefix="/api/activity", tags=["activity"])
+import analytics
+import numpy as np
+import shared
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
+from .. import db
+from ..conditional import etag_matches
 
-_TABLE_COLUMN_CACHE: Dict[Tuple[str, str], bool] = {}
+log = logging.getLogger(__name__)
 
+router = APIRouter(prefix="/api/activity", tags=["activity"])
 
-def _con() -> sqlite3.Connection:
-    path = os.getenv("BOT_DB_PATH", "/app/data/bot.sqlite3")
-    uri = f"file:{path}?mode=ro"
-    try:
-        c = sqlite3.connect(uri, uri=True, check_same_thread=False)
-    except sqlite3.OperationalError:
-        c = sqlite3.connect(path, check_same_thread=False)
-    c.row_factory = sqlite3.Row
-    return c
 
+# Lexical diversity source, as the bot's ACTIVITY_TTR_MODE: "hll" reads the
+# user_token_hll sketches, anything else the exact user_token_daily ids.
+_TTR_MODE = (os.getenv("ACTIVITY_TTR_MODE") or "exact").strip().lower()
 
-def _table_has_column(table: str, column: str) -> bool:
-    key = (table, column)
-    if key in _TABLE_COLUMN_CACHE:
-        return _TABLE_COLUMN_CACHE[key]
-    try:
-        con = _con()
-        cur = con.cursor()
-        cur.execute(f"PRAGMA table_info('{table}')")
-        cols = [str(r["name"]) for r in cur.fetchall()]
-        has = column in cols
-    except sqlite3.OperationalError:
-        has = False
-    finally:
-        try:
-            con.close()
-        except Exception:
-            pass
-    _TABLE_COLUMN_CACHE[key] = has
-    return has
+# Longer guild windows chart per day from the coarse rollup tiers instead of
+# per hour (see _daily_temporal).
+_HOURLY_MAX_DAYS = int(os.getenv("ACTIVITY_HOURLY_MAX_DAYS") or 92)
 
 
 def _bounds(days: int) -> Tuple[str, str, str, str]:
@@ -57,373 +45,376 @@ def _bounds(days: int) -> Tuple[str, str, str, str]:
     return start_day, end_day, start_hour, end_hour
 
 
-def _hour_limits(start_h: str, end_h: str) -> Tuple[str, str]:
-    start_dt = dt.datetime.fromisoformat(f"{start_h}:00:00")
-    end_dt = dt.datetime.fromisoformat(f"{end_h}:59:59")
-    return (
-        start_dt.isoformat(timespec="seconds"),
-        end_dt.isoformat(timespec="seconds"),
-    )
-
-
-def _gini(values: List[int]) -> float:
-    vals = [float(v) for v in values if v >= 0]
-    if not vals:
-        return float("nan")
-    s = sum(vals)
-    if s == 0:
-        return 0.0
-    vals.sort()
-    n = len(vals)
-    acc = 0.0
-    for i, v in enumerate(vals, 1):
-        acc += i * v
-    return (2.0 * acc / (n * s)) - (n + 1) / n
-
-
-def _mean_std(vals: List[float]) -> Tuple[float, float]:
-    if not vals:
-        return 0.0, 0.0
-    n = float(len(vals))
-    mu = sum(vals) / n
-    var = sum((x - mu) ** 2 for x in vals) / n
-    return float(mu), float(math.sqrt(var))
-
-
-def _skew_kurtosis(vals: List[float]) -> Tuple[float, float]:
-    n = len(vals)
-    if n < 2:
-        return float("nan"), float("nan")
-    mu, sigma = _mean_std(vals)
-    if sigma == 0.0:
-        return 0.0, 0.0
-    m3 = sum(((x - mu) ** 3) for x in vals) / n / (sigma**3)
-    m4 = sum(((x - mu) ** 4) for x in vals) / n / (sigma**4)
-    return float(m3), float(m4 - 3.0)
-
-
-def _quantiles_from_hist(hist: List[int], probs=(0.5, 0.95)) -> Tuple[float, float]:
-    total = sum(hist)
-    if total == 0:
-        return float("nan"), float("nan")
-    cdf = []
-    acc = 0
-    for c in hist:
-        acc += c
-        cdf.append(acc / total)
-    outs: List[float] = []
-    for p in probs:
-        i = 0
-        while i < len(cdf) and cdf[i] < p:
-            i += 1
-        outs.append(float(2**i))
-    return tuple(outs)  # type: ignore
-
-
-def _hourly_counts(
+def _hourly_series(
     gid: int, start_h: str, end_h: str, user_id: Optional[int] = None
-) -> Dict[str, int]:
-    if user_id is not None and not _table_has_column("message_metrics_hourly", "user_id"):
-        start_ts, end_ts = _hour_limits(start_h, end_h)
-        try:
-            con = _con()
-            cur = con.cursor()
-            rows = cur.execute(
-                """
-                SELECT STRFTIME('%Y-%m-%dT%H', created_at) AS hour, COUNT(*) AS messages
-                FROM message_archive
-                WHERE created_at BETWEEN ? AND ? AND user_id = ?
-                GROUP BY hour
-                ORDER BY hour
-                """,
-                (start_ts, end_ts, int(user_id)),
-            ).fetchall()
-        except sqlite3.OperationalError:
-            rows = []
-        finally:
-            try:
-                con.close()
-            except Exception:
-                pass
-        return {str(r["hour"]): int(r["messages"]) for r in rows}
-
-    con = _con()
-    try:
-        cur = con.cursor()
-        params: List[Any] = [gid, start_h, end_h]
-        where = "guild_id = ? AND hour BETWEEN ? AND ?"
-        if user_id is not None:
-            where += " AND user_id = ?"
-            params.append(int(user_id))
-        rows = cur.execute(
-            f"""
-            SELECT hour, SUM(messages) AS messages
-            FROM message_metrics_hourly
-            WHERE {where}
-            GROUP BY hour
-            ORDER BY hour
+) -> Tuple[int, np.ndarray]:
+    """(first epoch hour, zero-filled message counts for start_h..end_h)."""
+    lo_h, hi_h = analytics.hour_num(start_h), analytics.hour_num(end_h)
+    if user_id is None:
+        sql = """
+            SELECT hour, messages FROM message_metrics_hourly
+            WHERE guild_id = ? AND hour BETWEEN ? AND ?
+        """
+        params: Tuple[int, ...] = (gid, lo_h, hi_h)
+    else:
+        # (guild_id, user_id, hour) primary key: one range per member
+        sql = """
+            SELECT hour, messages FROM message_metrics_user_hourly
+            WHERE guild_id = ? AND user_id = ? AND hour BETWEEN ? AND ?
+        """
+        params = (gid, int(user_id), lo_h, hi_h)
+    rows = db.reader().execute(sql, params).fetchall()
+    return lo_h, analytics.dense_series(rows, lo_h, hi_h)
+
+
+def _hourly_counts(lo_h: int, series: np.ndarray) -> Dict[str, int]:
+    """Hours with activity, keyed 'YYYY-MM-DDTHH'."""
+    nz = np.flatnonzero(series)
+    labels = analytics.hour_labels(lo_h, len(series))[nz].tolist()
+    return dict(zip(labels, series[nz].tolist()))
+
+
+def _heatmap(lo_h: int, series: np.ndarray) -> List[List[float]]:
+    """7x24 average messages per (weekday, hour); see analytics.dow_hour_means."""
+    return analytics.dow_hour_means(series, lo_h).tolist()
+
+
+def _burst_std24(lo_h: int, series: np.ndarray) -> Dict[str, float]:
+    burst = analytics.rolling_std(series, 24)
+    return dict(zip(analytics.hour_labels(lo_h, len(burst)).tolist(), burst.tolist()))
+
+
+def _tiered_heatmap(gid: int, start_day: str, end_day: str) -> List[List[float]]:
+    """
+    Guild heatmap over whole days: calendar months inside the range from
+    message_metrics_dowhour_monthly, the days around them from the hourly rows.
+    """
+    lo, hi = analytics.day_num(start_day), analytics.day_num(end_day)
+    months, edges = analytics.split_months(lo, hi)
+    grid = np.zeros(analytics.SLOTS, dtype=np.float64)
+    if months:
+        rows = db.reader().execute(
+            """
+            SELECT slots FROM message_metrics_dowhour_monthly
+            WHERE guild_id = ? AND month BETWEEN ? AND ?
             """,
-            tuple(params),
+            (gid, *months),
         ).fetchall()
-    finally:
-        con.close()
-    return {str(r["hour"]): int(r["messages"]) for r in rows}
+        for r in rows:
+            grid += analytics.decode_slots(r[0])
+    for a, b in edges:
+        lo_h, series = _hourly_series(gid, analytics.hour_str(a * 24), analytics.hour_str(b * 24 + 23))
+        grid += analytics.dow_hour_totals(series, lo_h).ravel()
+    per_dow = np.maximum(analytics.weekday_counts(lo, hi), 1)
+    return (grid.reshape(7, 24) / per_dow[:, None]).tolist()
 
 
-def _heatmap(
-    gid: int, start_day: str, end_day: str, user_id: Optional[int] = None
-) -> List[List[float]]:
-    start = dt.date.fromisoformat(start_day)
-    end = dt.date.fromisoformat(end_day)
-    days_per_dow = [0] * 7
-    d = start
-    while d <= end:
-        days_per_dow[d.weekday()] += 1
-        d += dt.timedelta(days=1)
-
-    start_hour = f"{start_day}T00"
-    end_hour = f"{end_day}T23"
-    hourly = _hourly_counts(gid, start_hour, end_hour, user_id=user_id)
-
-    grid = [[0.0 for _ in range(24)] for _ in range(7)]
-    for h, count in hourly.items():
-        try:
-            day = dt.date.fromisoformat(h[:10])
-            dow = day.weekday()
-            hr = int(h[11:13])
-        except (ValueError, IndexError):
-            continue
-        grid[dow][hr] += int(count)
-    for dow in range(7):
-        denom = max(1, days_per_dow[dow])
-        for hr in range(24):
-            grid[dow][hr] = grid[dow][hr] / float(denom)
-    return grid
-
-
-def _burst_std24(
-    gid: int, start_h: str, end_h: str, user_id: Optional[int] = None
-) -> Dict[str, float]:
-    start_dt = dt.datetime.fromisoformat(f"{start_h}:00+00:00")
-    end_dt = dt.datetime.fromisoformat(f"{end_h}:00+00:00")
-    hours: List[str] = []
-    t = start_dt
-    while t <= end_dt:
-        hours.append(t.strftime("%Y-%m-%dT%H"))
-        t += dt.timedelta(hours=1)
-
-    raw = _hourly_counts(gid, start_h, end_h, user_id=user_id)
-    series = [int(raw.get(h, 0)) for h in hours]
-
-    out: Dict[str, float] = {}
-    dq: deque[int] = deque()
-    import statistics
-
-    for i, h in enumerate(hours):
-        dq.append(series[i])
-        if len(dq) > 24:
-            dq.popleft()
-        out[h] = float(statistics.pstdev(dq)) if len(dq) > 1 else 0.0
-    return out
+def _daily_temporal(
+    gid: int, start_day: str, end_day: str, end_hour: str
+) -> Dict[str, Any]:
+    """
+    Guild temporal stats at day resolution from message_metrics_guild_daily:
+    messages per day, each day's std of its 24 hourly counts, and the share
+    of hours start_day T00..end_hour without messages.
+    """
+    lo, hi = analytics.day_num(start_day), analytics.day_num(end_day)
+    rows = db.reader().execute(
+        """
+        SELECT day, messages, active_hours, hour_sq
+        FROM message_metrics_guild_daily
+        WHERE guild_id = ? AND day BETWEEN ? AND ?
+        """,
+        (gid, lo, hi),
+    ).fetchall()
+    arr = np.array([tuple(r) for r in rows], dtype=np.int64).reshape(-1, 4)
+    messages = analytics.dense_series(arr[:, [0, 1]], lo, hi)
+    hour_sq = analytics.dense_series(arr[:, [0, 3]], lo, hi)
+    mean = messages / 24.0
+    std = np.sqrt(np.clip(hour_sq / 24.0 - mean * mean, 0.0, None))
+    labels = analytics.day_labels(lo, len(messages))
+    nz = np.flatnonzero(messages)
+    hours = analytics.hour_num(end_hour) - lo * 24 + 1
+    return {
+        "heatmap_avg_per_hour": _tiered_heatmap(gid, start_day, end_day),
+        "burst_std_24h": dict(zip(labels.tolist(), std.tolist())),
+        "hourly_counts": dict(zip(labels[nz].tolist(), messages[nz].tolist())),
+        "silence_ratio": 1.0 - float(arr[:, 2].sum()) / hours if hours > 0 else 0.0,
+        "resolution": "day",
+    }
 
 
 def _latency_stats(gid: int, start_day: str, end_day: str) -> Dict[str, Any]:
-    con = _con()
+    cur = db.reader().cursor()
+    rows = cur.execute(
+        """
+        SELECT channel_id, bucket, SUM(n) AS n
+        FROM latency_hist_daily
+        WHERE guild_id = ? AND day BETWEEN ? AND ?
+        GROUP BY channel_id, bucket
+        """,
+        (gid, analytics.day_num(start_day), analytics.day_num(end_day)),
+    ).fetchall()
+    return analytics.latency_summary(rows)
+
+
+def _thread_stats(gid: int, start_day: str, end_day: str) -> Dict[str, Any]:
+    """Reply chains rooted in the range (see activity_metrics.get_thread_stats)."""
+    lo, hi = shared.snowflake_day_range(start_day, end_day)
     try:
-        cur = con.cursor()
-        rows = cur.execute(
+        rows = db.reader().execute(
             """
-            SELECT channel_id, bucket, SUM(n) AS n
-            FROM latency_hist_daily
-            WHERE guild_id = ? AND day BETWEEN ? AND ?
-            GROUP BY channel_id, bucket
+            SELECT root_id, last_id, max_depth, replies FROM thread_index
+            WHERE guild_id = ? AND root_id >= ? AND root_id < ?
             """,
-            (gid, start_day, end_day),
+            (gid, lo, hi),
         ).fetchall()
-    finally:
-        con.close()
-
-    max_bin = 20
-    by_chan: Dict[int, List[int]] = defaultdict(lambda: [0] * (max_bin + 1))
-    global_hist = [0] * (max_bin + 1)
-    for r in rows:
-        cid = int(r["channel_id"])
-        b = int(r["bucket"])
-        n = int(r["n"])
-        by_chan[cid][b] += n
-        global_hist[b] += n
-
-    chans = []
-    for cid, hist in by_chan.items():
-        med, p95 = _quantiles_from_hist(hist, (0.5, 0.95))
-        chans.append(
-            {"channel_id": cid, "median_ms": med, "p95_ms": p95, "n": int(sum(hist))}
-        )
-    gmed, gp95 = _quantiles_from_hist(global_hist, (0.5, 0.95))
+    except sqlite3.OperationalError:
+        rows = []
+
+    if not rows:
+        return {
+            "threads": 0,
+            "replies": 0,
+            "replies_mean": 0.0,
+            "depth_hist": {},
+            "lifespan_ms": {"p50": None, "p90": None, "max": None, "mean": None},
+            "lifespan_hist": [],
+        }
+    arr = np.array([tuple(r) for r in rows], dtype=np.int64)
+    life = ((arr[:, 1] >> 22) - (arr[:, 0] >> 22)).astype(np.float64)
+    depths, counts = np.unique(arr[:, 2], return_counts=True)
+    replies = int(arr[:, 3].sum())
+    p50, p90 = np.percentile(life, [50, 90])
     return {
-        "channels": chans,
-        "global": {"median_ms": gmed, "p95_ms": gp95, "n": int(sum(global_hist))},
+        "threads": len(rows),
+        "replies": replies,
+        "replies_mean": replies / len(rows),
+        "depth_hist": dict(zip(depths.tolist(), counts.tolist())),
+        "lifespan_ms": {
+            "p50": float(p50),
+            "p90": float(p90),
+            "max": float(life.max()),
+            "mean": float(life.mean()),
+        },
+        "lifespan_hist": analytics.log2_hist(life, max_bucket=31).tolist(),
     }
 
 
 def _content_stats(
     gid: int, start_day: str, end_day: str, user_id: Optional[int] = None
 ) -> Dict[str, Any]:
-    con = _con()
+    cur = db.reader().cursor()
+    params: List[Any] = [gid, analytics.day_num(start_day), analytics.day_num(end_day)]
+    where = "guild_id = ? AND day BETWEEN ? AND ?"
+    if user_id is not None:
+        where += " AND user_id = ?"
+        params.append(int(user_id))
+    rows = cur.execute(
+        f"""
+        SELECT user_id, SUM(messages) AS m, SUM(words) AS w, SUM(url_msgs) AS u
+          FROM message_metrics_daily
+         WHERE {where}
+         GROUP BY user_id
+        """,
+        tuple(params),
+    ).fetchall()
+    if _TTR_MODE == "hll":
+        uniq_map = {
+            int(u): n
+            for u, n in analytics.hll.union_by_key(
+                cur.execute(
+                    f"SELECT user_id, regs FROM user_token_hll WHERE {where}",
+                    tuple(params),
+                )
+            ).items()
+        }
+    else:
+        uniq_map = {
+            int(u): float(n)
+            for u, n in cur.execute(
+                f"""
+                SELECT user_id, COUNT(DISTINCT token_id)
+                  FROM user_token_daily
+                 WHERE {where}
+                 GROUP BY user_id
+                """,
+                tuple(params),
+            )
+        }
+    # sentiment optional
     try:
-        cur = con.cursor()
-        params: List[Any] = [gid, start_day, end_day]
-        where = "guild_id = ? AND day BETWEEN ? AND ?"
-        if user_id is not None:
-            where += " AND user_id = ?"
-            params.append(int(user_id))
-        rows = cur.execute(
+        sent_rows = cur.execute(
             f"""
-            SELECT user_id, SUM(messages) AS m, SUM(words) AS w, SUM(url_msgs) AS u
-              FROM message_metrics_daily
+            SELECT user_id, SUM(n) AS n, SUM(sum_compound) AS csum
+              FROM sentiment_daily
              WHERE {where}
              GROUP BY user_id
             """,
             tuple(params),
         ).fetchall()
-        tok_rows = cur.execute(
+    except sqlite3.OperationalError:
+        sent_rows = []
+
+    return analytics.content_summary(rows, uniq_map, sent_rows)
+
+
+def _top_users(
+    cur, gid: int, stat: str, lo: Optional[int], hi: Optional[int], limit: int
+) -> List[Dict[str, int]]:
+    """
+    Top ``limit`` users by ``stat``: all-time from the user_totals index,
+    days lo..hi from the message_metrics_daily (guild, day) range.
+    """
+    if lo is None:
+        rows = cur.execute(
+            f"""
+            SELECT user_id, {stat} AS v FROM user_totals
+            WHERE guild_id = ? AND {stat} > 0
+            ORDER BY {stat} DESC LIMIT ?
+            """,
+            (gid, limit),
+        ).fetchall()
+    else:
+        expr = "COUNT(*)" if stat == "active_days" else f"SUM({stat})"
+        rows = cur.execute(
             f"""
-            SELECT user_id, COUNT(DISTINCT token) AS uniq
-              FROM user_token_daily
-             WHERE {where}
-             GROUP BY user_id
+            SELECT user_id, {expr} AS v FROM message_metrics_daily
+            WHERE guild_id = ? AND day BETWEEN ? AND ?
+            GROUP BY user_id HAVING v > 0
+            ORDER BY v DESC LIMIT ?
             """,
-            tuple(params),
+            (gid, lo, hi, limit),
         ).fetchall()
-        # sentiment optional
-        try:
-            sent_rows = cur.execute(
-                f"""
-                SELECT user_id, SUM(n) AS n, SUM(sum_compound) AS csum
-                  FROM sentiment_daily
-                 WHERE {where}
-                 GROUP BY user_id
-                """,
-                tuple(params),
-            ).fetchall()
-        except sqlite3.OperationalError:
-            sent_rows = []
-    finally:
-        con.close()
-
-    total_msgs = sum(int(r["m"] or 0) for r in rows)
-    total_words = sum(int(r["w"] or 0) for r in rows)
-    url_msgs = sum(int(r["u"] or 0) for r in rows)
-
-    # words/msg stats
-    samples = [int(r["w"] or 0) / int(r["m"]) for r in rows if int(r["m"] or 0) > 0]
-    mu = sum(samples) / len(samples) if samples else 0.0
-    med = sorted(samples)[len(samples) // 2] if samples else 0.0
-
-    # lexical diversity per user: distinct tokens over total words in window
-    uniq_map = {int(r["user_id"]): int(r["uniq"]) for r in tok_rows}
-    ttr: Dict[int, float] = {}
-    for r in rows:
-        uid = int(r["user_id"])
-        w = int(r["w"] or 0)
-        ttr[uid] = (uniq_map.get(uid, 0) / float(w)) if w else 0.0
-
-    # sentiment coverage + mean/median compound if table present
-    n_scored = sum(int(r["n"] or 0) for r in sent_rows)
-    coverage = (n_scored / float(total_msgs)) if total_msgs else 0.0
-    comp_vals = [
-        (float(r["csum"]) / max(int(r["n"]), 1))
-        for r in sent_rows
-        if int(r["n"] or 0) > 0
-    ]
-    comp_mean = (sum(comp_vals) / len(comp_vals)) if comp_vals else None
-    comp_median = sorted(comp_vals)[len(comp_vals) // 2] if comp_vals else None
-
-    return {
-        "total_messages": int(total_msgs),
-        "total_words": int(total_words),
-        "words_per_msg_mean": float(mu),
-        "words_per_msg_median": float(med),
-        "url_rate": float((url_msgs / total_msgs) if total_msgs else 0.0),
-        "lexical_diversity_by_user": ttr,
-        "sentiment": {
-            "coverage": float(coverage),
-            "compound_mean": comp_mean,
-            "compound_median": comp_median,
-        },
-    }
+    return [{"user_id": int(r[0]), stat: int(r[1])} for r in rows]
 
 
 def _activity_rankings(
-    gid: int, end_dt: dt.datetime, limit: int = 5
+    gid: int, end_day: str, limit: int = 5
 ) -> Dict[str, List[Dict[str, int]]]:
-    windows = {
-        "day": end_dt - dt.timedelta(days=1),
-        "week": end_dt - dt.timedelta(days=7),
-        "month": end_dt - dt.timedelta(days=30),
-        "all": None,
-    }
-    out: Dict[str, List[Dict[str, int]]] = {}
-    has_guild = _table_has_column("message_archive", "guild_id")
+    """Top posters over the day / week / month ending on end_day, and all-time."""
+    hi = analytics.day_num(end_day)
+    windows = {"day": hi, "week": hi - 6, "month": hi - 29, "all": None}
     try:
-        con = _con()
-        cur = con.cursor()
-        for name, start_dt in windows.items():
-            where_parts = []
-            params: List[Any] = []
-            if has_guild:
-                where_parts.append("guild_id = ?")
-                params.append(gid)
-            if start_dt is not None:
-                where_parts.append("created_at BETWEEN ? AND ?")
-                params.append(start_dt.isoformat(timespec="seconds"))
-                params.append(end_dt.isoformat(timespec="seconds"))
-            else:
-                where_parts.append("created_at <= ?")
-                params.append(end_dt.isoformat(timespec="seconds"))
-            where_sql = f"WHERE {' AND '.join(where_parts)}" if where_parts else ""
-            try:
-                rows = cur.execute(
-                    f"""
-                    SELECT user_id, COUNT(*) AS messages
-                    FROM message_archive
-                    {where_sql}
-                    GROUP BY user_id
-                    ORDER BY messages DESC
-                    LIMIT ?
-                    """,
-                    (*params, limit),
-                ).fetchall()
-            except sqlite3.OperationalError:
-                rows = []
-            out[name] = [
-                {"user_id": int(r["user_id"]), "messages": int(r["messages"])}
-                for r in rows
-            ]
+        cur = db.reader().cursor()
+        return {
+            name: _top_users(cur, gid, "messages", lo, hi, limit)
+            for name, lo in windows.items()
+        }
     except sqlite3.OperationalError:
         return {}
-    finally:
-        try:
-            con.close()
-        except Exception:
-            pass
-    return out
 
 
-@router.get("/{guild_id}/live")
-def live_metrics(
+@router.get("/{guild_id}/top")
+async def top_users(
     guild_id: int,
-    days: int = 30,
+    stat: str = "messages",
+    days: Optional[int] = None,
     start: Optional[str] = None,
     end: Optional[str] = None,
-    scope: str = "guild",
-    user_id: Optional[int] = None,
+    limit: int = 10,
 ):
-    if scope not in {"guild", "personal"}:
-        raise HTTPException(status_code=400, detail="invalid scope")
-    if scope == "personal" and user_id is None:
-        raise HTTPException(status_code=400, detail="user_id required for personal scope")
+    """Leaderboard for one stat: all-time, or over ``days`` / start..end."""
+    if stat not in shared.TOP_STATS:
+        raise HTTPException(status_code=400, detail="invalid stat")
+    if not 1 <= limit <= 100:
+        raise HTTPException(status_code=400, detail="limit must be 1..100")
+    lo = hi = None
+    if days is not None or start or end:
+        start_day, end_day = _day_range(days or 30, start, end)
+        lo, hi = analytics.day_num(start_day), analytics.day_num(end_day)
+    rows = await db.run(
+        lambda: _top_users(db.reader().cursor(), guild_id, stat, lo, hi, limit)
+    )
+    return JSONResponse(
+        {
+            "stat": stat,
+            "range": None if lo is None else {"start_day": start_day, "end_day": end_day},
+            "users": rows,
+        }
+    )
+
 
+class _DataVersion:
+    """
+    ``PRAGMA data_version`` on one long-lived connection. It only moves when
+    another connection (the bot) commits, so equal values mean nothing the
+    dashboard reads has changed.
+    """
+
+    def __init__(self):
+        self._con: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[int]:
+        with self._lock:
+            try:
+                if self._con is None:
+                    self._con = db.connect_readonly()
+                return int(self._con.execute("PRAGMA data_version").fetchone()[0])
+            except sqlite3.Error:
+                if self._con is not None:
+                    self._con.close()
+                self._con = None
+                return None
+
+
+class _LiveCache:
+    """LRU of rendered /live bodies, each good for one data_version and ttl seconds."""
+
+    def __init__(self, capacity: int, ttl: float):
+        self.capacity = max(1, int(capacity))
+        self.ttl = float(ttl)
+        self._lru: OrderedDict[tuple, Tuple[int, float, str, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, version: int) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is None:
+                return None
+            if hit[0] != version or hit[1] < time.monotonic():
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return hit[2], hit[3]
+
+    def put(self, key: tuple, version: int, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._lru[key] = (version, time.monotonic() + self.ttl, etag, body)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+
+_data_version = _DataVersion()
+_live_cache = _LiveCache(
+    int(os.getenv("ACTIVITY_LIVE_CACHE_SIZE") or 128),
+    float(os.getenv("ACTIVITY_LIVE_CACHE_TTL") or 300),
+)
+
+
+def _finite(obj: Any) -> Any:
+    """NaN/inf -> None throughout, as JSON has no spelling for them."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    return obj
+
+
+def _json_response(body: bytes, etag: str, if_none_match: Optional[str]) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def _live_window(
+    days: int, start: Optional[str], end: Optional[str]
+) -> Tuple[str, str, str, str]:
+    """(start_day, end_day, start_hour, end_hour) of a /live query."""
     if start and not end or end and not start:
         raise HTTPException(status_code=400, detail="start and end must both be provided")
 
@@ -437,91 +428,468 @@ def live_metrics(
             raise HTTPException(status_code=400, detail="start must be <= end")
         start_day = start_date.isoformat()
         end_day = end_date.isoformat()
-        start_hour = f"{start_day}T00"
-        end_hour = f"{end_day}T23"
-    else:
-        if days <= 0:
-            raise HTTPException(status_code=400, detail="days must be > 0")
-        start_day, end_day, start_hour, end_hour = _bounds(days)
+        return start_day, end_day, f"{start_day}T00", f"{end_day}T23"
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="days must be > 0")
+    return _bounds(days)
 
-    range_end_dt = dt.datetime.fromisoformat(f"{end_day}T23:59:59")
-    filter_user = int(user_id) if scope == "personal" and user_id is not None else None
 
-    # basic distribution scoped to guild or specific user
-    con = _con()
-    try:
-        cur = con.cursor()
-        params: List[Any] = [guild_id, start_day, end_day]
-        where = "guild_id = ? AND day BETWEEN ? AND ?"
-        if filter_user is not None:
-            where += " AND user_id = ?"
-            params.append(filter_user)
-        rows = cur.execute(
-            f"""
-            SELECT user_id, SUM(messages) AS m
-            FROM message_metrics_daily
-            WHERE {where}
-            GROUP BY user_id
-            """,
-            tuple(params),
-        ).fetchall()
-    finally:
-        con.close()
-
-    counts = [int(r["m"] or 0) for r in rows]
-    f = [float(x) for x in counts]
-    mean = sum(f) / len(f) if f else 0.0
-    var = sum((x - (mean or 0.0)) ** 2 for x in f) / (len(f) or 1)
-    std = math.sqrt(var)
-    skew = (
-        (sum(((x - (mean or 0.0)) ** 3) for x in f) / (len(f) or 1) / (std**3))
-        if len(f) > 1 and std > 0
-        else 0.0
+def _live_scope(scope: str, user_id: Optional[int]) -> Optional[int]:
+    """The member a /live query is filtered to (None for the whole guild)."""
+    if scope not in {"guild", "personal"}:
+        raise HTTPException(status_code=400, detail="invalid scope")
+    if scope == "personal" and user_id is None:
+        raise HTTPException(status_code=400, detail="user_id required for personal scope")
+    return int(user_id) if scope == "personal" else None
+
+
+@router.get("/{guild_id}/live")
+async def live_metrics(
+    request: Request,
+    guild_id: int,
+    days: int = 30,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    scope: str = "guild",
+    user_id: Optional[int] = None,
+):
+    filter_user = _live_scope(scope, user_id)
+    window = _live_window(days, start, end)
+    return await db.run(
+        _live_response,
+        request.headers.get("if-none-match"),
+        guild_id,
+        window,
+        scope,
+        filter_user,
     )
-    kurt = (
-        (sum(((x - (mean or 0.0)) ** 4) for x in f) / (len(f) or 1) / (std**4) - 3.0)
-        if len(f) > 1 and std > 0
-        else 0.0
+
+
+def _live_response(
+    if_none_match: Optional[str],
+    guild_id: int,
+    window: Tuple[str, str, str, str],
+    scope: str,
+    filter_user: Optional[int],
+) -> Response:
+    etag, body = _live_cached(guild_id, window, scope, filter_user, _data_version.get())
+    return _json_response(body, etag, if_none_match)
+
+
+def _live_cached(
+    guild_id: int,
+    window: Tuple[str, str, str, str],
+    scope: str,
+    filter_user: Optional[int],
+    version: Optional[int],
+) -> Tuple[str, bytes]:
+    """(ETag, body) of a /live query, from _live_cache while ``version`` holds."""
+    # Relative windows are keyed by their resolved hours, so they roll over
+    # on the hour; any bot commit bumps the data version and misses.
+    start_day, end_day, start_hour, end_hour = window
+    key = (guild_id, start_hour, end_hour, scope, filter_user)
+    hit = _live_cache.get(key, version) if version is not None else None
+    if hit is not None:
+        return hit
+
+    body = _live_payload(
+        guild_id, start_day, end_day, start_hour, end_hour, scope, filter_user
     )
-    basic = {
-        "min": float(min(counts) if counts else 0),
-        "max": float(max(counts) if counts else 0),
-        "mean": float(mean),
-        "std": float(std),
-        "skewness": float(skew) if counts else float("nan"),
-        "kurtosis": float(kurt) if counts else float("nan"),
-        "gini": float(_gini(counts)) if counts else float("nan"),
-    }
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+    if version is not None:
+        _live_cache.put(key, version, etag, body)
+    return etag, body
 
-    heat = _heatmap(guild_id, start_day, end_day, user_id=filter_user)
-    burst = _burst_std24(guild_id, start_hour, end_hour, user_id=filter_user)
-    hourly = _hourly_counts(guild_id, start_hour, end_hour, user_id=filter_user)
-    zeros = sum(1 for _, v in (hourly or {}).items() if int(v) == 0)
-    silence_ratio = float(zeros) / float(len(hourly or {}) or 1)
+
+def _live_payload(
+    guild_id: int,
+    start_day: str,
+    end_day: str,
+    start_hour: str,
+    end_hour: str,
+    scope: str,
+    filter_user: Optional[int],
+) -> bytes:
+    """The /live response body, rendered as JSONResponse would (NaN as null)."""
+    # basic distribution scoped to guild or specific user
+    cur = db.reader().cursor()
+    params: List[Any] = [guild_id, analytics.day_num(start_day), analytics.day_num(end_day)]
+    where = "guild_id = ? AND day BETWEEN ? AND ?"
+    if filter_user is not None:
+        where += " AND user_id = ?"
+        params.append(filter_user)
+    rows = cur.execute(
+        f"""
+        SELECT user_id, SUM(messages) AS m
+        FROM message_metrics_daily
+        WHERE {where}
+        GROUP BY user_id
+        """,
+        tuple(params),
+    ).fetchall()
+
+    counts = np.array([int(r["m"] or 0) for r in rows], dtype=np.int64)
+    basic = analytics.moments(counts)
+    basic["gini"] = analytics.gini(counts)
+
+    span_days = analytics.day_num(end_day) - analytics.day_num(start_day) + 1
+    if filter_user is None and span_days > _HOURLY_MAX_DAYS:
+        temporal = _daily_temporal(guild_id, start_day, end_day, end_hour)
+    else:
+        # One dense hourly series over the whole days feeds the heatmap; the
+        # hour window within it feeds burstiness, hourly counts and silence.
+        day_lo, days_series = _hourly_series(
+            guild_id, f"{start_day}T00", f"{end_day}T23", user_id=filter_user
+        )
+        lo_h = analytics.hour_num(start_hour)
+        series = days_series[lo_h - day_lo : analytics.hour_num(end_hour) - day_lo + 1]
+        temporal = {
+            "heatmap_avg_per_hour": _heatmap(day_lo, days_series),
+            "burst_std_24h": _burst_std24(lo_h, series),
+            "hourly_counts": _hourly_counts(lo_h, series),
+            "silence_ratio": analytics.silence_ratio(series),
+            "resolution": "hour",
+        }
     latency = (
         None if scope == "personal" else _latency_stats(guild_id, start_day, end_day)
     )
     content = _content_stats(guild_id, start_day, end_day, user_id=filter_user)
-    rankings = _activity_rankings(guild_id, range_end_dt)
+    threads = (
+        None if scope == "personal" else _thread_stats(guild_id, start_day, end_day)
+    )
+    rankings = _activity_rankings(guild_id, end_day)
+
+    payload = {
+        "range": {
+            "start_day": start_day,
+            "end_day": end_day,
+            "start_hour": start_hour,
+            "end_hour": end_hour,
+        },
+        "scope": scope,
+        "basic": basic,
+        "temporal": temporal,
+        "latency": latency,
+        "content": content,
+        "threads": threads,
+        "rankings": rankings,
+    }
+    return JSONResponse(_finite(payload)).body
+
+
+# ---- /stream: server-sent /live deltas ----
+# Open streams are grouped by query. One task polls data_version for all of
+# them; when it moves (or a relative window rolls over) each query's payload
+# is rebuilt once, through _live_cache, and subscribers get a JSON merge
+# patch (RFC 7386) from the previous payload. A null member in a patch
+# removes it; clients read a missing member as null.
+
+_STREAM_POLL = float(os.getenv("ACTIVITY_STREAM_POLL") or 2)
+_STREAM_PING = 15.0
+# Streams end after this long; EventSource reconnects with Last-Event-ID and
+# only gets a snapshot if the payload moved meanwhile.
+_STREAM_MAX_AGE = float(os.getenv("ACTIVITY_STREAM_MAX_AGE") or 900)
+_STREAM_BACKLOG = 32
+
+_UNCHANGED = object()
+
+
+def _merge_patch(old: Any, new: Any) -> Any:
+    """
+    Merge patch turning ``old`` into ``new``, or _UNCHANGED if they are equal.
+    Floats within round-off count as equal: the running-sum kernels move the
+    last digits of every point when any count changes.
+    """
+    if isinstance(old, float) and isinstance(new, float):
+        return _UNCHANGED if math.isclose(old, new, rel_tol=1e-9, abs_tol=1e-12) else new
+    if not (isinstance(old, dict) and isinstance(new, dict)):
+        return _UNCHANGED if old == new else new
+    patch = {k: None for k in old.keys() - new.keys()}
+    for k, v in new.items():
+        sub = _merge_patch(old[k], v) if k in old else v
+        if sub is not _UNCHANGED:
+            patch[k] = sub
+    return patch or _UNCHANGED
+
+
+def _sse(event: str, event_id: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {data}\n\n"
+
+
+class _LiveTopic:
+    """One /live query with open streams, and the payload they last saw."""
+
+    def __init__(
+        self,
+        guild_id: int,
+        days: Optional[int],
+        start: Optional[str],
+        end: Optional[str],
+        scope: str,
+        filter_user: Optional[int],
+    ):
+        self.query = (days, start, end)
+        self.guild_id = guild_id
+        self.scope = scope
+        self.filter_user = filter_user
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.lock = asyncio.Lock()
+        self.version: Optional[int] = None
+        self.window: Optional[Tuple[str, str, str, str]] = None
+        self.etag: Optional[str] = None
+        self.body: Optional[bytes] = None
+        self.payload: Optional[Dict[str, Any]] = None
+
+    def snapshot(self) -> str:
+        return _sse("snapshot", self.etag, self.body.decode())
+
+
+class _LiveHub:
+    def __init__(self, poll: float):
+        self.poll = poll
+        self._topics: Dict[tuple, _LiveTopic] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def subscribe(
+        self, key: tuple, topic: _LiveTopic, last_event_id: Optional[str]
+    ) -> Tuple[_LiveTopic, asyncio.Queue]:
+        topic = self._topics.setdefault(key, topic)
+        queue: asyncio.Queue = asyncio.Queue(_STREAM_BACKLOG)
+        topic.subscribers.add(queue)
+        try:
+            if topic.body is None:
+                await self._refresh(topic, await db.run(_data_version.get))
+        except BaseException:
+            self.unsubscribe(key, topic, queue)
+            raise
+        if last_event_id != topic.etag:
+            queue.put_nowait(topic.snapshot())
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return topic, queue
+
+    def unsubscribe(self, key: tuple, topic: _LiveTopic, queue: asyncio.Queue) -> None:
+        topic.subscribers.discard(queue)
+        if not topic.subscribers and self._topics.get(key) is topic:
+            del self._topics[key]
+
+    async def _refresh(self, topic: _LiveTopic, version: Optional[int]) -> None:
+        async with topic.lock:
+            window = _live_window(*topic.query)
+            if topic.body is not None and (version, window) == (topic.version, topic.window):
+                return
+            etag, body = await db.run(
+                _live_cached, topic.guild_id, window, topic.scope, topic.filter_user, version
+            )
+            topic.version, topic.window = version, window
+            if etag == topic.etag:
+                return
+            payload = json.loads(body)
+            patch = _UNCHANGED if topic.payload is None else _merge_patch(topic.payload, payload)
+            topic.etag, topic.body, topic.payload = etag, body, payload
+            if patch is _UNCHANGED:
+                return
+            event = _sse("delta", etag, json.dumps(patch, separators=(",", ":")))
+            for queue in list(topic.subscribers):
+                try:
+                    queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # too far behind for deltas: start it over from the payload
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(topic.snapshot())
+
+    async def _run(self) -> None:
+        while self._topics:
+            await asyncio.sleep(self.poll)
+            version = await db.run(_data_version.get)
+            if version is None:
+                continue
+            for topic in list(self._topics.values()):
+                try:
+                    await self._refresh(topic, version)
+                except Exception:
+                    log.exception("activity stream refresh failed")
+
+
+_live_hub = _LiveHub(_STREAM_POLL)
+
+
+async def _stream_events(key: tuple, topic: _LiveTopic, queue: asyncio.Queue):
+    deadline = time.monotonic() + _STREAM_MAX_AGE
+    try:
+        yield f"retry: {int(_STREAM_POLL * 1000) + 1000}\n\n"
+        while time.monotonic() < deadline:
+            try:
+                yield await asyncio.wait_for(queue.get(), _STREAM_PING)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+    finally:
+        _live_hub.unsubscribe(key, topic, queue)
+
 
+@router.get("/{guild_id}/stream")
+async def live_stream(
+    request: Request,
+    guild_id: int,
+    days: int = 30,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    scope: str = "guild",
+    user_id: Optional[int] = None,
+):
+    """
+    Server-sent events for the /live payload: a ``snapshot`` event with the
+    whole body, then a ``delta`` (JSON merge patch) whenever it changes.
+    Event ids are the /live ETags.
+    """
+    filter_user = _live_scope(scope, user_id)
+    _live_window(days, start, end)
+    query = (None, start, end) if start else (days, None, None)
+    key = (guild_id, *query, scope, filter_user)
+    topic, queue = await _live_hub.subscribe(
+        key,
+        _LiveTopic(guild_id, *query, scope, filter_user),
+        request.headers.get("last-event-id"),
+    )
+    return StreamingResponse(
+        _stream_events(key, topic, queue),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---- active users (active_daily bitmaps; see analytics.bitmaps) ----
+# The bitmap endpoints build one row per day in memory, so the range and the
+# retention period are capped.
+_BITMAP_MAX_DAYS = int(os.getenv("ACTIVITY_BITMAP_MAX_DAYS") or 731)
+_RETENTION_MAX_PERIOD_DAYS = 366
+
+
+def _day_range(
+    days: int,
+    start: Optional[str],
+    end: Optional[str],
+    max_days: Optional[int] = None,
+) -> Tuple[str, str]:
+    if start and not end or end and not start:
+        raise HTTPException(status_code=400, detail="start and end must both be provided")
+    if start and end:
+        try:
+            start_date = dt.date.fromisoformat(start)
+            end_date = dt.date.fromisoformat(end)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start/end must be YYYY-MM-DD")
+        if start_date > end_date:
+            raise HTTPException(status_code=400, detail="start must be <= end")
+        if max_days is not None and (end_date - start_date).days + 1 > max_days:
+            raise HTTPException(status_code=400, detail=f"range must be <= {max_days} days")
+        return start_date.isoformat(), end_date.isoformat()
+    if days <= 0:
+        raise HTTPException(status_code=400, detail="days must be > 0")
+    if max_days is not None and days > max_days:
+        raise HTTPException(status_code=400, detail=f"days must be <= {max_days}")
+    start_day, end_day, _, _ = _bounds(days)
+    return start_day, end_day
+
+
+@router.get("/{guild_id}/users")
+async def active_users(
+    guild_id: int,
+    days: int = 30,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+):
+    """DAU / WAU / MAU (trailing 7 / 30 days) and stickiness per day."""
+    start_day, end_day = _day_range(days, start, end, _BITMAP_MAX_DAYS)
+    return await db.run(_active_users, guild_id, start_day, end_day)
+
+
+def _active_users(guild_id: int, start_day: str, end_day: str) -> JSONResponse:
+    # As activity_metrics.get_active_users: 29 lead-in days feed the MAU window.
+    lo, hi = analytics.day_num(start_day), analytics.day_num(end_day)
+    try:
+        bits = analytics.bitmaps.active_matrix(db.reader(), guild_id, lo - 29, hi)
+    except sqlite3.OperationalError:
+        bits = np.zeros((hi - lo + 30, 0), dtype=np.uint8)
+
+    dau = analytics.bitmaps.popcount(bits)[29:]
+    wau = analytics.bitmaps.popcount(analytics.bitmaps.rolling_union(bits, 7))[29:]
+    mau = analytics.bitmaps.popcount(analytics.bitmaps.rolling_union(bits, 30))[29:]
+    total = int(analytics.bitmaps.popcount(np.bitwise_or.reduce(bits[29:], axis=0)))
+    series = [
+        {
+            "day": analytics.day_str(lo + i),
+            "dau": int(dau[i]),
+            "wau": int(wau[i]),
+            "mau": int(mau[i]),
+            "stickiness": (int(dau[i]) / int(mau[i])) if mau[i] else 0.0,
+        }
+        for i in range(len(dau))
+    ]
+    return JSONResponse(
+        {
+            "range": {"start_day": start_day, "end_day": end_day},
+            "series": series,
+            "active_users": total,
+            "dau_mean": float(dau.mean()) if len(dau) else 0.0,
+        }
+    )
+
+
+@router.get("/{guild_id}/users/retention")
+async def user_retention(
+    guild_id: int,
+    days: int = 30,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    period_days: int = 7,
+    periods: int = 8,
+):
+    """
+    Cohorts of members first active in each ``period_days`` period of the
+    range, and how many were active again in each of the next ``periods``.
+    """
+    if not 0 < period_days <= _RETENTION_MAX_PERIOD_DAYS or not 0 < periods <= 52:
+        raise HTTPException(status_code=400, detail="invalid period_days/periods")
+    start_day, end_day = _day_range(days, start, end, _BITMAP_MAX_DAYS)
+    return await db.run(
+        _user_retention, guild_id, start_day, end_day, period_days, periods
+    )
+
+
+def _user_retention(
+    guild_id: int, start_day: str, end_day: str, period_days: int, periods: int
+) -> JSONResponse:
+    lo, end_n = analytics.day_num(start_day), analytics.day_num(end_day)
+    n_cohorts = (end_n - lo) // period_days + 1
+    n_total = n_cohorts + periods - 1
+    try:
+        con = db.reader()
+        bits = analytics.bitmaps.active_matrix(
+            con, guild_id, lo, lo + n_total * period_days - 1
+        )
+        seen = analytics.bitmaps.active_before(con, guild_id, lo)
+    except sqlite3.OperationalError:
+        bits, seen = np.zeros((n_total * period_days, 0), dtype=np.uint8), None
+
+    cohorts = []
+    for k, (size, retained) in enumerate(
+        analytics.bitmaps.retention(bits, seen, period_days, periods)
+    ):
+        cohorts.append(
+            {
+                "start": analytics.day_str(lo + k * period_days),
+                "size": size,
+                "retained": retained,
+                "rate": [(r / size) if size else 0.0 for r in retained],
+            }
+        )
     return JSONResponse(
         {
-            "range": {
-                "start_day": start_day,
-                "end_day": end_day,
-                "start_hour": start_hour,
-                "end_hour": end_hour,
-            },
-            "scope": scope,
-            "basic": basic,
-            "temporal": {
-                "heatmap_avg_per_hour": heat,
-                "burst_std_24h": burst,
-                "hourly_counts": hourly,
-                "silence_ratio": silence_ratio,
-            },
-            "latency": latency,
-            "content": content,
-            "rankings": rankings,
+            "range": {"start_day": start_day, "end_day": end_day},
+            "period_days": period_days,
+            "periods": periods,
+            "cohorts": cohorts,
         }
     )
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import html
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+import shared
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from .. import auth, db
+
+router = APIRouter(
+    prefix="/api/archive",
+    tags=["archive"],
+    dependencies=[Depends(auth.require_auth())],
+)
+
+MAX_LIMIT = 100
+
+# Private-use markers survive html.escape(); swapped for <mark> afterwards so
+# message content is escaped but highlights are not.
+_HL_OPEN, _HL_CLOSE = "\ue000", "\ue001"
+
+
+def _highlight(snippet: str) -> str:
+    return (
+        html.escape(snippet or "")
+        .replace(_HL_OPEN, "<mark>")
+        .replace(_HL_CLOSE, "</mark>")
+    )
+
+
+@router.get("/{guild_id}/search")
+async def search(
+    guild_id: int,
+    q: str = Query(..., min_length=1, max_length=200),
+    author_id: Optional[int] = None,
+    channel_id: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    before: Optional[int] = None,
+    limit: int = Query(25, ge=1, le=MAX_LIMIT),
+) -> Dict[str, Any]:
+    """
+    Newest-first full-text search. ``start``/``end`` are inclusive UTC days
+    and become snowflake bounds; page with ``before`` = previous
+    ``next_before``.
+    """
+    match = shared.fts_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="empty query")
+
+    conditions = ["message_archive_fts MATCH ?", "a.guild_id=?"]
+    params: List[Any] = [match, guild_id]
+    if author_id is not None:
+        conditions.append("a.author_id=?")
+        params.append(author_id)
+    if channel_id is not None:
+        conditions.append("a.channel_id=?")
+        params.append(channel_id)
+    try:
+        lo, hi = shared.snowflake_day_range(start, end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid date")
+    if start:
+        conditions.append("f.rowid>=?")
+        params.append(lo)
+    if hi is not None:
+        conditions.append("f.rowid<?")
+        params.append(hi)
+    if before is not None:
+        conditions.append("f.rowid<?")
+        params.append(before)
+
+    sql = (
+        "SELECT a.message_id, a.channel_id, a.author_id, a.created_at, "
+        "snippet(message_archive_fts, 0, ?, ?, '…', 24) AS snippet "
+        "FROM message_archive_fts f JOIN message_archive a ON a.message_id = f.rowid "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY f.rowid DESC LIMIT ?"
+    )
+    try:
+        rows = await db.run(
+            db.fetchall, sql, [_HL_OPEN, _HL_CLOSE, *params, limit + 1]
+        )
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e):
+            raise HTTPException(status_code=503, detail="search index not built yet")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "guild_id": guild_id,
+        "query": q,
+        "results": [
+            {
+                "message_id": str(r["message_id"]),
+                "channel_id": str(r["channel_id"]),
+                "author_id": str(r["author_id"]),
+                "created_at": r["created_at"],
+                "snippet_html": _highlight(r["snippet"]),
+                "url": f"https://discord.com/channels/{guild_id}/{r['channel_id']}/{r['message_id']}",
+            }
+            for r in rows
+        ],
+        "next_before": str(rows[-1]["message_id"]) if more and rows else None,
+    }
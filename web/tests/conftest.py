@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# app/ is imported as in the image (WORKDIR /app); analytics sits at the repo root
+WEB = Path(__file__).resolve().parents[1]
+for path in (WEB, WEB.parent):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import analytics
+from app import db
+from app.routes import activity
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "bot.sqlite3"
+    con = sqlite3.connect(path)
+    con.execute("CREATE TABLE active_daily(guild_id INTEGER, day INTEGER, bits BLOB)")
+    con.execute("CREATE TABLE active_ever(guild_id INTEGER, month INTEGER, bits BLOB)")
+    con.executemany(
+        "INSERT INTO active_daily VALUES (1, ?, ?)",
+        [
+            (analytics.day_num("2025-06-01"), analytics.bitmaps.from_indexes([0, 1])),
+            (analytics.day_num("2025-06-02"), analytics.bitmaps.from_indexes([1, 2])),
+        ],
+    )
+    con.commit()
+    con.close()
+    monkeypatch.setenv("BOT_DB_PATH", str(path))
+    db.close()
+    app = FastAPI()
+    app.include_router(activity.router)
+    with TestClient(app) as c:
+        yield c
+    db.close()
+
+
+def test_users_series(client):
+    r = client.get("/api/activity/1/users", params={"start": "2025-06-01", "end": "2025-06-02"})
+    assert r.status_code == 200
+    body = r.json()
+    assert [s["dau"] for s in body["series"]] == [2, 2]
+    assert [s["mau"] for s in body["series"]] == [2, 3]
+    assert body["active_users"] == 3
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"start": "0001-01-01", "end": "9999-12-31"},
+        {"days": activity._BITMAP_MAX_DAYS + 1},
+    ],
+)
+def test_users_range_is_capped(client, params):
+    assert client.get("/api/activity/1/users", params=params).status_code == 400
+
+
+def test_retention_period_is_capped(client):
+    r = client.get(
+        "/api/activity/1/users/retention",
+        params={"start": "2025-06-01", "end": "2025-06-02", "period_days": 20000000, "periods": 52},
+    )
+    assert r.status_code == 400
+
+
+def test_retention_range_is_capped(client):
+    r = client.get(
+        "/api/activity/1/users/retention",
+        params={"start": "0001-01-01", "end": "9999-12-31", "period_days": 1},
+    )
+    assert r.status_code == 400
+
+
+def test_retention_within_caps(client):
+    r = client.get(
+        "/api/activity/1/users/retention",
+        params={"start": "2025-06-01", "end": "2025-06-02", "period_days": 1, "periods": 2},
+    )
+    assert r.status_code == 200
+    cohorts = r.json()["cohorts"]
+    assert [c["size"] for c in cohorts] == [2, 1]
+    assert cohorts[0]["retained"] == [2, 1]
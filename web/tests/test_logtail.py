@@ -0,0 +1,89 @@
+import os
+
+from app import logtail
+
+
+def _rec(n, level="INFO", msg=None):
+    return f"2025-06-01 12:00:{n:02d} {level} yuribot: {msg or f'line {n}'}\n"
+
+
+def _append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _lines(records):
+    return [line for record in records for line in record]
+
+
+def test_tail_reads_from_the_end(tmp_path):
+    path = tmp_path / "bot.log"
+    path.write_text("".join(_rec(i) for i in range(50)))
+    lines, stopped = logtail.tail(str(path), 3, block=64)
+    assert lines == [_rec(47), _rec(48), _rec(49)]
+    assert not stopped
+
+
+def test_tail_filters_whole_records_and_continues_into_rotated(tmp_path):
+    path = tmp_path / "bot.log"
+    (tmp_path / "bot.log.1").write_text(
+        _rec(1, "ERROR", "boom") + "Traceback (most recent call last):\n" + _rec(2)
+    )
+    path.write_text(_rec(3) + _rec(4, "WARNING", "careful"))
+    lines, _ = logtail.tail(str(path), 10, logtail.RecordFilter(level="WARNING"), block=16)
+    assert lines == [
+        _rec(1, "ERROR", "boom"),
+        "Traceback (most recent call last):\n",
+        _rec(4, "WARNING", "careful"),
+    ]
+
+
+def test_follow_starts_at_the_end_and_reads_appends(tmp_path):
+    path = tmp_path / "bot.log"
+    path.write_text(_rec(1))
+    f = logtail.LogFollower(str(path))
+    assert f.poll() == []
+    _append(path, _rec(2) + _rec(3))
+    assert _lines(f.poll()) == [_rec(2).rstrip("\n"), _rec(3).rstrip("\n")]
+    f.close()
+
+
+def test_follow_handles_rotation(tmp_path):
+    path = tmp_path / "bot.log"
+    path.write_text(_rec(1))
+    f = logtail.LogFollower(str(path))
+    f.poll()
+    _append(path, _rec(2))
+    os.rename(path, tmp_path / "bot.log.1")
+    path.write_text(_rec(3))
+    assert _lines(f.poll()) == [_rec(2).rstrip("\n"), _rec(3).rstrip("\n")]
+    f.close()
+
+
+def test_follow_handles_truncation(tmp_path):
+    path = tmp_path / "bot.log"
+    path.write_text(_rec(1) + _rec(2))
+    f = logtail.LogFollower(str(path))
+    f.poll()
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(_rec(3))
+    assert _lines(f.poll()) == [_rec(3).rstrip("\n")]
+    f.close()
+
+
+def test_resume_rereads_a_partial_line(tmp_path):
+    path = tmp_path / "bot.log"
+    path.write_text(_rec(1))
+    f = logtail.LogFollower(str(path), logtail.RecordFilter(level="INFO"))
+    f.poll()
+    _append(path, _rec(2) + "2025-06-01 12:00:03 INFO yuribot: part")
+    assert _lines(f.poll()) == [_rec(2).rstrip("\n")]
+    position = f.position
+    f.close()
+
+    _append(path, "ial tail\n")
+    resumed = logtail.LogFollower(
+        str(path), logtail.RecordFilter(level="INFO"), position=position
+    )
+    assert _lines(resumed.poll()) == ["2025-06-01 12:00:03 INFO yuribot: partial tail"]
+    resumed.close()
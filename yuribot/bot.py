@@ -11,7 +11,8 @@ from typing import Iterable, List, Sequence
 import discord
 from discord.ext import commands
 
-from .db import ensure_db
+from .db import aio, close_pool, ensure_db, loop_lag
+from .models import activity_metrics, message_archive
 from .strings import _STRINGS  # noqa: F401  (force-load strings at startup)
 
 # -----------------------------------------------------------------------------
@@ -110,6 +111,7 @@ class YuriBot(commands.Bot):
     async def setup_hook(self) -> None:
         ensure_db()
         log.info("Database ensured/connected.")
+        self._bg_tasks.append(asyncio.create_task(loop_lag.run(), name="loop-lag"))
 
         clear_once = os.getenv("CLEAR_GLOBALS_ONCE") == "1"
         raw_guilds = os.getenv("SYNC_GUILDS") or os.getenv("DEV_GUILD_ID") or ""
@@ -231,6 +233,12 @@ class YuriBot(commands.Bot):
                 await asyncio.gather(*self._bg_tasks)
 
         await super().close()
+        # Cogs flush on unload; this catches anything buffered outside a cog.
+        for buf in (activity_metrics.ingest, message_archive.live_buffer):
+            with suppress(Exception):
+                await aio.run_write(buf.flush)
+        aio.shutdown()
+        close_pool()
 
 
 # -----------------------------------------------------------------------------
@@ -2,13 +2,22 @@ from __future__ import annotations
 
 import asyncio
 import datetime as dt
+import time
 from typing import Optional, List
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
+from ..db import aio
 from ..models import activity_metrics as am
+from ..models import crawl_checkpoints as cp
+from ..utils.crawler import (
+    DEFAULT_CONCURRENCY,
+    MAX_CONCURRENCY,
+    ChannelCrawler,
+    clamp_concurrency,
+)
 
 # Server opened on this date; default stats window uses days since this date.
 OPEN_DATE = dt.date(2025, 9, 16)
@@ -19,17 +28,35 @@ class ActivityMetricsCog(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        am.ensure_tables()
 
     async def cog_load(self) -> None:  # discord.py ≥ 2.4
-        am.ensure_tables()
+        self.flush_ingest.change_interval(seconds=am.ingest.max_delay_ms / 1000.0)
+        self.flush_ingest.start()
+
+    async def cog_unload(self) -> None:
+        self.flush_ingest.cancel()
+        await self._flush()
+
+    async def _flush(self) -> None:
+        try:
+            await aio.run_write(am.ingest.flush)
+        except Exception as e:
+            self._log(f"[activity_metrics] flush error: {e}", error=True)
+
+    @tasks.loop(seconds=2)
+    async def flush_ingest(self) -> None:
+        if am.ingest.pending():
+            await self._flush()
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
         try:
-            am.upsert_from_message(message, include_bots=False)
+            full = am.ingest.add_message(message, include_bots=False)
         except Exception as e:
-            self._log(f"[activity_metrics] upsert error: {e}", error=True)
+            self._log(f"[activity_metrics] ingest error: {e}", error=True)
+            return
+        if full:
+            await self._flush()
 
     def _log(self, msg: str, *, error: bool = False) -> None:
         logger = getattr(self.bot, "logger", None)
@@ -49,6 +76,8 @@ class ActivityMetricsCog(commands.Cog):
         days="Look back this many days (default 30).",
         channel="Optionally limit to one text or forum channel.",
         include_bots="Include bot-authored messages.",
+        concurrency=f"Channels fetched in parallel (default {DEFAULT_CONCURRENCY}, max {MAX_CONCURRENCY}).",
+        fresh="Ignore saved progress and rescan every channel.",
     )
     async def activity_rebuild(
         self,
@@ -56,6 +85,8 @@ class ActivityMetricsCog(commands.Cog):
         days: Optional[int] = 30,
         channel: Optional[discord.abc.GuildChannel] = None,
         include_bots: Optional[bool] = False,
+        concurrency: Optional[int] = None,
+        fresh: Optional[bool] = False,
     ) -> None:
         if inter.guild is None:
             await inter.response.send_message("Run this in a server.", ephemeral=True)
@@ -69,19 +100,53 @@ class ActivityMetricsCog(commands.Cog):
 
         guild = inter.guild
         since = None
+        since_id = 0
         if days and days > 0:
             since = dt.datetime.now(tz=dt.timezone.utc) - dt.timedelta(days=days)
+            since_id = discord.utils.time_snowflake(since)
+
+        # ---- resume from checkpoints ----
+        # A checkpoint only counts if its crawl window covers this one.
+        # Complete channels resume too, to pick up messages posted since.
+        if fresh:
+            await aio.run_write(cp.reset, cp.JOB_ACTIVITY, guild.id)
+        saved = await aio.run_read(cp.load, cp.JOB_ACTIVITY, guild.id)
+        windows: dict[int, int] = {}
+        resume: dict[int, int] = {}
+        for cid, c in saved.items():
+            if c.since_id > since_id:
+                continue
+            windows[cid] = c.since_id
+            if c.last_message_id > since_id:
+                resume[cid] = c.last_message_id
+
+        async def _checkpoint(marks: dict[int, int], completed: List[int]) -> None:
+            await aio.run_write(
+                cp.advance,
+                cp.JOB_ACTIVITY,
+                guild.id,
+                marks,
+                completed,
+                since_ids={
+                    c: windows.get(c, since_id) for c in (*marks, *completed)
+                },
+            )
 
-        progress = {
-            "phase": "starting",
-            "channel_index": 0,
-            "channel_total": 0,
-            "channel_name": "",
-            "msgs_this_channel": 0,
-            "msgs_total": 0,
-            "errors_count": 0,
-            "last_errors": [],  # type: List[str]
-        }
+        # fetch → parse (MessageFact) → batched writer on the DB writer thread
+        async def _write(facts: List[am.MessageFact]) -> int:
+            return await aio.run_write(am.write_batch, facts)
+
+        crawler: ChannelCrawler[am.MessageFact] = ChannelCrawler(
+            parse=lambda m: am.extract_fact(m, include_bots=bool(include_bots)),
+            write=_write,
+            concurrency=clamp_concurrency(concurrency),
+            batch_size=am.ingest.max_messages,
+            after=since,
+            resume=resume,
+            checkpoint=_checkpoint,
+        )
+        stats = crawler.stats
+        phase = "starting"
 
         # --- create a NORMAL channel message (bot token), not a followup webhook ---
         progress_msg: discord.Message | None = None
@@ -97,28 +162,41 @@ class ActivityMetricsCog(commands.Cog):
         used_interaction_edit = False
 
         async def _render_text() -> str:
-            phase = progress["phase"]
-            ch_i = progress["channel_index"]
-            ch_n = progress["channel_total"]
-            ch_name = progress["channel_name"]
-            msgs_ch = progress["msgs_this_channel"]
-            msgs_all = progress["msgs_total"]
-            errs = progress["errors_count"]
-            last_errs = progress["last_errors"][-3:]
+            errs = stats.errors
+            last_errs = stats.last_errors[-3:]
 
             lines = []
             if phase == "starting":
                 lines.append("⏳ Preparing activity rebuild…")
             elif phase == "scanning":
-                lines.append(f"🔎 Scanning channels ({ch_i}/{ch_n})")
-                lines.append(f"• Current: #{ch_name} — {msgs_ch} msgs")
-                lines.append(f"• Total processed: {msgs_all}")
+                lines.append(
+                    f"🔎 Scanning channels ({stats.channels_done}/{stats.channels_total}, "
+                    f"{len(stats.active)} active × {crawler.concurrency})"
+                )
+                lines.append(
+                    f"• Total processed: {stats.messages_fetched} ({stats.rate:.0f} msg/s) — "
+                    f"written {stats.items_written} in {stats.batches} batches"
+                )
+                for prog in sorted(
+                    stats.active.values(), key=lambda p: p.messages, reverse=True
+                )[:8]:
+                    lines.append(
+                        f"• #{prog.label} — {prog.messages} msgs ({prog.rate:.0f}/s)"
+                    )
             elif phase == "error":
                 lines.append("❌ Rebuild encountered an error. See logs.")
             elif phase == "done":
+                elapsed = max(time.monotonic() - stats.started, 1e-6)
                 lines.append("✅ Activity metrics rebuild complete.")
-                lines.append(f"• Channels: {ch_n}")
-                lines.append(f"• Messages processed: {msgs_all}")
+                lines.append(f"• Channels: {stats.channels_done}")
+                if stats.channels_skipped:
+                    lines.append(
+                        f"• Skipped (no history access): {stats.channels_skipped}"
+                    )
+                lines.append(
+                    f"• Messages processed: {stats.messages_fetched} in {elapsed:.0f}s "
+                    f"({stats.rate:.0f} msg/s)"
+                )
 
             if errs:
                 lines.append(f"⚠️ Errors so far: {errs}")
@@ -172,96 +250,24 @@ class ActivityMetricsCog(commands.Cog):
                     chans.append(ch)  # includes voice-attached text areas
             chans.extend(getattr(guild, "news_channels", []))
             chans.extend(getattr(guild, "forums", []))
-            return chans
-
-        channels = _list_channels()
-        progress["channel_total"] = len(channels)
-
-        async def _scan_textlike(ch: discord.TextChannel):
-            if not ch.permissions_for(guild.me).read_message_history:
-                msg_ = f"Skipping #{ch.name}: missing Read Message History"
-                progress["last_errors"].append(msg_)
-                progress["errors_count"] += 1
-                self._log(f"[activity_rebuild] {msg_}")
-                return
-
-            progress["channel_name"] = ch.name
-            progress["msgs_this_channel"] = 0
-
-            async for m in ch.history(limit=None, oldest_first=True, after=since):
-
-                def _work():
-                    try:
-                        am.upsert_from_message(m, include_bots=bool(include_bots))
-                    except Exception as e:
-                        err = f"{ch.name} / msg {m.id}: {e}"
-                        progress["last_errors"].append(err)
-                        if len(progress["last_errors"]) > 1000:
-                            del progress["last_errors"][:500]
-                        progress["errors_count"] += 1
-                        self._log(f"[activity_rebuild] {err}", error=True)
-
-                await asyncio.to_thread(_work)
-                progress["msgs_this_channel"] += 1
-                progress["msgs_total"] += 1
-                if (progress["msgs_this_channel"] % 250) == 0:
-                    await asyncio.sleep(0)
-
-            # Threads under this channel (active + archived)
-            try:
-                for th in ch.threads:
-                    await _scan_thread(th)
-                async for th in ch.archived_threads(limit=None):
-                    await _scan_thread(th)
-            except Exception:
-                pass
-
-        async def _scan_forum(forum: discord.ForumChannel):
-            progress["channel_name"] = forum.name
-            progress["msgs_this_channel"] = 0
-            for th in forum.threads:
-                await _scan_thread(th)
-            async for th in forum.archived_threads(limit=None):
-                await _scan_thread(th)
-
-        async def _scan_thread(th: discord.Thread):
-            progress["channel_name"] = (
-                f"{th.parent.name} → {th.name}" if th.parent else th.name
-            )
-            async for m in th.history(limit=None, oldest_first=True, after=since):
-
-                def _work():
-                    try:
-                        am.upsert_from_message(m, include_bots=bool(include_bots))
-                    except Exception as e:
-                        err = f"{th.name} / msg {m.id}: {e}"
-                        progress["last_errors"].append(err)
-                        if len(progress["last_errors"]) > 1000:
-                            del progress["last_errors"][:500]
-                        progress["errors_count"] += 1
-                        self._log(f"[activity_rebuild] {err}", error=True)
-
-                await asyncio.to_thread(_work)
-                progress["msgs_this_channel"] += 1
-                progress["msgs_total"] += 1
-                if (progress["msgs_this_channel"] % 250) == 0:
-                    await asyncio.sleep(0)
+            return [
+                ch
+                for ch in chans
+                if isinstance(ch, (discord.TextChannel, discord.ForumChannel))
+            ]
 
         try:
-            progress["phase"] = "scanning"
-            for idx, ch in enumerate(channels, start=1):
-                progress["channel_index"] = idx
-                if isinstance(ch, discord.StageChannel):
-                    continue
-                if isinstance(ch, discord.TextChannel):
-                    await _scan_textlike(ch)
-                elif isinstance(ch, discord.ForumChannel):
-                    await _scan_forum(ch)
-            progress["phase"] = "done"
+            phase = "scanning"
+            await crawler.run(_list_channels())
+            phase = "done"
+            self._log(
+                f"[activity_rebuild] guild={guild.id} channels={stats.channels_done} "
+                f"messages={stats.messages_fetched} written={stats.items_written} "
+                f"rate={stats.rate:.0f}/s errors={stats.errors}"
+            )
         except Exception as e:
-            progress["phase"] = "error"
-            progress["last_errors"].append(f"Top-level rebuild error: {e}")
-            progress["errors_count"] += 1
+            phase = "error"
+            stats.error(f"Top-level rebuild error: {e}")
             self._log(f"[activity_rebuild] Top-level rebuild error: {e}", error=True)
         finally:
             stop = True
@@ -282,6 +288,61 @@ class ActivityMetricsCog(commands.Cog):
             except Exception:
                 pass
 
+    # ---------------------------
+    # /activity_rebuild_archive (local, from message_archive — no Discord fetches)
+    # ---------------------------
+    @app_commands.command(
+        name="activity_rebuild_archive",
+        description="Rebuild activity metrics from the local message archive (no Discord fetches).",
+    )
+    @app_commands.describe(
+        days="Rebuild only the last N days; omit to rebuild all archived history.",
+    )
+    async def activity_rebuild_archive(
+        self,
+        inter: discord.Interaction,
+        days: Optional[int] = None,
+    ) -> None:
+        if inter.guild is None:
+            await inter.response.send_message("Run this in a server.", ephemeral=True)
+            return
+        if not inter.user.guild_permissions.manage_guild:
+            await inter.response.send_message("You need Manage Server.", ephemeral=True)
+            return
+
+        await inter.response.defer()
+        guild_id = inter.guild.id
+        start_day = None
+        if days and days > 0:
+            start_day = (
+                dt.datetime.now(tz=dt.timezone.utc).date() - dt.timedelta(days=days)
+            ).isoformat()
+
+        # Buffered live facts must land before the range is wiped.
+        await self._flush()
+        try:
+            # Its own thread, not the writer executor: each batch takes the
+            # writer lock briefly, so live ingest keeps flowing in between.
+            result = await asyncio.to_thread(
+                am.rebuild_from_archive, guild_id, start_day, None
+            )
+        except Exception as e:
+            self._log(f"[activity_rebuild_archive] failed: {e}", error=True)
+            await inter.edit_original_response(
+                content="❌ Rebuild from archive failed. See logs."
+            )
+            return
+
+        await inter.edit_original_response(
+            content=(
+                "✅ Activity metrics rebuilt from the archive.\n"
+                f"• Window: {start_day or 'all history'} → now\n"
+                f"• Messages: {result['scanned']:,} scanned, {result['written']:,} written "
+                f"in {result['batches']} batches ({result['seconds']}s)"
+            ),
+            allowed_mentions=discord.AllowedMentions.none(),
+        )
+
     # ---------------------------
     # /activity_stats (default to days since OPEN_DATE; optional public post)
     # ---------------------------
@@ -317,8 +378,10 @@ class ActivityMetricsCog(commands.Cog):
         start_day = (now.date() - dt.timedelta(days=window_days)).isoformat()
         end_day = now.date().isoformat()
 
-        totals = am.get_totals(inter.guild.id, start_day, end_day)
-        by_channel = am.get_totals_by_channel(inter.guild.id, start_day, end_day)
+        totals = await aio.run_read(am.get_totals, inter.guild.id, start_day, end_day)
+        by_channel = await aio.run_read(
+            am.get_totals_by_channel, inter.guild.id, start_day, end_day
+        )
 
         # format
         lines = []
@@ -352,7 +415,7 @@ class ActivityMetricsCog(commands.Cog):
     )
     @app_commands.describe(
         days="If set, purge only the last N days; omit to purge ALL data.",
-        include_index="Also clear dedupe index (message_index). Default: true.",
+        include_index="Also clear the dedupe index (message_facts). Default: true.",
         really="Safety flag. Must be true to actually purge.",
         post="Post the result publicly (default: false).",
     )
@@ -395,64 +458,11 @@ class ActivityMetricsCog(commands.Cog):
             start_day = (now.date() - dt.timedelta(days=days)).isoformat()
             end_day = now.date().isoformat()
 
-        def _purge() -> int:
-            con = am.connect()
-            try:
-                cur = con.cursor()
-                before = con.total_changes
-                # Daily tables
-                daily_tables = [
-                    "message_metrics_daily",
-                    "message_metrics_channel_daily",
-                    "reaction_hist_daily",
-                    "latency_hist_daily",
-                    "user_token_daily",
-                    "sentiment_daily",
-                ]
-                if start_day and end_day:
-                    for t in daily_tables:
-                        cur.execute(
-                            f"DELETE FROM {t} WHERE guild_id=? AND day BETWEEN ? AND ?",
-                            (gid, start_day, end_day),
-                        )
-                else:
-                    for t in daily_tables:
-                        cur.execute(
-                            f"DELETE FROM {t} WHERE guild_id=?",
-                            (gid,),
-                        )
-
-                # Hourly — stored as 'YYYY-MM-DDTHH' → compare by day prefix
-                if start_day and end_day:
-                    cur.execute(
-                        "DELETE FROM message_metrics_hourly "
-                        "WHERE guild_id=? AND substr(hour,1,10) BETWEEN ? AND ?",
-                        (gid, start_day, end_day),
-                    )
-                else:
-                    cur.execute(
-                        "DELETE FROM message_metrics_hourly WHERE guild_id=?",
-                        (gid,),
-                    )
-
-                # Channel last msg watermark
-                cur.execute("DELETE FROM channel_last_msg WHERE guild_id=?", (gid,))
-
-                # Optional dedupe index
-                if include_index:
-                    cur.execute("DELETE FROM message_index WHERE guild_id=?", (gid,))
-
-                con.commit()
-                after = con.total_changes
-                return max(0, after - before)
-            finally:
-                try:
-                    con.close()
-                except Exception:
-                    pass
-
         try:
-            deleted = await asyncio.to_thread(_purge)
+            await self._flush()  # so buffered facts don't land after the purge
+            deleted = await aio.run_write(
+                am.purge, gid, start_day, end_day, include_facts=bool(include_index)
+            )
             msg = (
                 f"🧹 Purge complete.\n"
                 f"• Scope: **{scope_str}**\n"
@@ -11,7 +11,8 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from ..db import connect
+from ..db import aio, connect, get_pool, loop_lag
+from ..models import activity_metrics, message_archive
 from ..strings import S
 from ..ui.admin import build_club_config_embed
 from ..ui.movebot import format_move_summary, format_pin_summary
@@ -526,6 +527,24 @@ class AdminCog(commands.GroupCog, name="admin", description="Admin tools"):
                             lines.append(f"/{cmd.name} {sub.name} {sub2.name}")
         await interaction.followup.send("\n".join(lines[:200]) or "(no commands registered locally)", ephemeral=True)
 
+    @app_commands.command(name="db_stats", description="Show event-loop lag and DB executor stats (debug).")
+    async def db_stats(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        lag = loop_lag.stats()
+        db = aio.stats()
+        pool = get_pool().stats()
+        ingest = activity_metrics.ingest.stats()
+        archive = message_archive.live_buffer.stats()
+        lines = [
+            f"**Loop lag** p50 {lag['p50_ms']} ms · p99 {lag['p99_ms']} ms · max {lag['max_ms']} ms · stalls {lag['stalls']} ({lag['samples']} samples)",
+            f"**DB writes** {db['write']['calls']} calls · avg wait {db['write']['avg_wait_ms']} ms · avg run {db['write']['avg_run_ms']} ms · max run {db['write']['max_run_ms']} ms · pending {db['pending_writes']}",
+            f"**DB reads** {db['read']['calls']} calls · avg wait {db['read']['avg_wait_ms']} ms · avg run {db['read']['avg_run_ms']} ms · max run {db['read']['max_run_ms']} ms",
+            f"**Pool** readers {pool['readers_open']} open / {pool['readers_idle']} idle (size {pool['read_pool_size']})",
+            f"**Activity ingest** {ingest['pending']} pending · {ingest['flushes']} flushes · {ingest['flushed']} facts · last flush {ingest['last_flush_ms']} ms",
+            f"**Archive buffer** {archive['pending']} pending · {archive['flushes']} flushes · {archive['flushed']} rows · last flush {archive['last_flush_ms']} ms",
+        ]
+        await interaction.followup.send("\n".join(lines), ephemeral=True)
+
     # ===== Voice log import / stats =====
 
     # ===== Cleanup (flattened) =====
@@ -2,18 +2,33 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from typing import List, Set
+import time
+from contextlib import suppress
+from datetime import timedelta
+from typing import List, Optional, Set
 
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
-from ..models import message_archive
+from ..db import aio
+from ..models import crawl_checkpoints, message_archive
 from ..strings import S
 from ..utils.archive import get_all_text_channels
+from ..utils.crawler import (
+    DEFAULT_CONCURRENCY,
+    MAX_CONCURRENCY,
+    ChannelCrawler,
+    clamp_concurrency,
+)
 
 log = logging.getLogger(__name__)
 
+JOB = crawl_checkpoints.JOB_ARCHIVE
+BACKFILL_BATCH = 500  # archive rows per transaction during backfill
+PROGRESS_EVERY = 10  # channels between progress follow-ups
+SEARCH_PAGE_SIZE = 10
+
 
 class ArchiveCog(
     commands.GroupCog, name="archive", description="Message archive tools"
@@ -22,6 +37,26 @@ class ArchiveCog(
         self.bot = bot
         self._is_running: Set[int] = set()  # Set of guild_ids currently archiving
 
+    async def cog_load(self) -> None:
+        buf = message_archive.live_buffer
+        self.flush_live.change_interval(seconds=buf.max_delay_ms / 1000.0)
+        self.flush_live.start()
+
+    async def cog_unload(self) -> None:
+        self.flush_live.cancel()
+        await self._flush()
+
+    async def _flush(self) -> None:
+        try:
+            await aio.run_write(message_archive.live_buffer.flush)
+        except Exception as e:
+            log.error(f"Failed to flush archive buffer: {e}", exc_info=e)
+
+    @tasks.loop(seconds=2)
+    async def flush_live(self) -> None:
+        if message_archive.live_buffer.pending():
+            await self._flush()
+
     # --- NEW: Automatic Listener ---
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
@@ -35,18 +70,20 @@ class ArchiveCog(
         try:
             # Convert the discord.Message to our database model
             archive_entry = message_archive.from_discord_message(message)
-            # Insert/update it in the database
-            message_archive.upsert_many([archive_entry])
         except ValueError:
             # Raised by from_discord_message if it's a DM or has no guild.
             # We already check for guild, but this is a safe fallback.
-            pass
+            return
         except Exception as e:
-            # Log any other DB errors but don't crash the bot
             log.error(
                 f"Failed to auto-archive message {message.id} in guild {message.guild.id}: {e}",
                 exc_info=e,
             )
+            return
+
+        # Buffered; written in batches on the DB writer thread
+        if message_archive.live_buffer.add(archive_entry):
+            await self._flush()
 
     # --- Backfill Command ---
 
@@ -54,8 +91,17 @@ class ArchiveCog(
         name="backfill",
         description="Run a full message archive backfill for this server.",
     )
+    @app_commands.describe(
+        fresh="Ignore saved progress and rescan every channel.",
+        concurrency=f"Channels fetched in parallel (default {DEFAULT_CONCURRENCY}, max {MAX_CONCURRENCY}).",
+    )
     @app_commands.checks.has_permissions(manage_guild=True)
-    async def archive_backfill(self, interaction: discord.Interaction):
+    async def archive_backfill(
+        self,
+        interaction: discord.Interaction,
+        fresh: bool = False,
+        concurrency: Optional[int] = None,
+    ):
         if not interaction.guild:
             return await interaction.response.send_message(
                 S("common.guild_only"), ephemeral=True
@@ -70,108 +116,214 @@ class ArchiveCog(
             S("archive.backfill.starting"), ephemeral=True
         )
         self._is_running.add(interaction.guild.id)
+        guild_id = interaction.guild.id
 
-        total_messages_archived = 0
-        total_channels_scanned = 0
+        async def _followup(text: str) -> None:
+            # The interaction token expires after 15 minutes; the crawl doesn't.
+            with suppress(discord.HTTPException):
+                await interaction.followup.send(
+                    text,
+                    ephemeral=True,
+                    allowed_mentions=discord.AllowedMentions.none(),
+                )
 
         try:
             # Use the imported utility function
-            channels_to_scan = await get_all_text_channels(interaction.guild)
+            channels_to_scan = [
+                ch
+                for ch in await get_all_text_channels(interaction.guild)
+                if isinstance(ch, discord.abc.Messageable)
+            ]
 
-            await interaction.followup.send(
-                S("archive.backfill.found_channels", count=len(channels_to_scan)),
-                ephemeral=True,
+            await _followup(
+                S("archive.backfill.found_channels", count=len(channels_to_scan))
             )
 
-            for i, channel in enumerate(channels_to_scan):
-                if not isinstance(channel, discord.abc.Messageable):
-                    continue
-
-                # Check for permissions
-                if not channel.permissions_for(
-                    interaction.guild.me
-                ).read_message_history:
-                    log.warning(
-                        f"Skipping channel {channel.name} ({channel.id}): Missing 'Read Message History' perms."
+            # Resume from per-channel checkpoints (newest committed snowflake).
+            # Unlike max(message_id), this is never ahead of a gap left by the
+            # live listener archiving newer messages. Complete channels resume
+            # too, so messages posted since the last run are caught up.
+            # Channels without a checkpoint start from the beginning;
+            # upsert_many dedupes rows the live listener already archived.
+            if fresh:
+                await aio.run_write(crawl_checkpoints.reset, JOB, guild_id)
+            saved = await aio.run_read(crawl_checkpoints.load, JOB, guild_id)
+            resume = {
+                cid: c.last_message_id
+                for cid, c in saved.items()
+                if c.last_message_id
+            }
+            if saved:
+                await _followup(
+                    S(
+                        "archive.backfill.resuming",
+                        complete=sum(1 for c in saved.values() if c.complete),
+                        partial=sum(1 for c in saved.values() if not c.complete),
                     )
-                    continue
-
-                total_channels_scanned += 1
-                channel_messages_archived = 0
+                )
 
+            def _parse(message: discord.Message):
+                if message.author.bot:
+                    return None  # Skip bots
                 try:
-                    # Find the last message ID we archived for this channel to resume
-                    after_id = message_archive.max_message_id(
-                        interaction.guild.id, channel.id
-                    )
-                    after_obj = discord.Object(id=after_id) if after_id else None
+                    return message_archive.from_discord_message(message)
+                except ValueError:
+                    # Skip messages that the model rejects (partials)
+                    return None
+
+            async def _write(rows: List[message_archive.ArchivedMessage]) -> int:
+                return await aio.run_write(message_archive.upsert_many, rows)
 
-                    async for message in channel.history(
-                        limit=None, after=after_obj, oldest_first=True
-                    ):
-                        if message.author.bot:
-                            continue  # Skip bots
+            async def _checkpoint(marks: dict[int, int], completed: List[int]) -> None:
+                await aio.run_write(
+                    crawl_checkpoints.advance, JOB, guild_id, marks, completed
+                )
 
-                        try:
-                            archive_entry = message_archive.from_discord_message(
-                                message
+            crawler: ChannelCrawler[message_archive.ArchivedMessage] = ChannelCrawler(
+                parse=_parse,
+                write=_write,
+                concurrency=clamp_concurrency(concurrency),
+                batch_size=BACKFILL_BATCH,
+                expand_threads=False,  # threads are already listed
+                resume=resume,
+                checkpoint=_checkpoint,
+            )
+            stats = crawler.stats
+
+            async def _report() -> None:
+                reported = 0
+                while True:
+                    await asyncio.sleep(5)
+                    if stats.channels_done // PROGRESS_EVERY > reported:
+                        reported = stats.channels_done // PROGRESS_EVERY
+                        await _followup(
+                            S(
+                                "archive.backfill.progress",
+                                done=stats.channels_done,
+                                total=stats.channels_total,
+                                messages=stats.items_written,
+                                rate=f"{stats.rate:.0f}",
                             )
-                            message_archive.upsert_many(
-                                [archive_entry]
-                            )  # Insert one by one
-                            total_messages_archived += 1
-                            channel_messages_archived += 1
-                        except ValueError:
-                            # Skip messages that the model rejects (partials)
-                            pass
-                        except Exception as e:
-                            log.error(f"Failed to archive message {message.id}: {e}")
-
-                    if channel_messages_archived > 0:
-                        log.info(
-                            f"Archived {channel_messages_archived} new messages from {channel.name} ({channel.id})"
                         )
-                        if (
-                            i > 0 and i % 10 == 0
-                        ):  # Send an update every 10 channels (but not on the first one)
-                            await interaction.followup.send(
-                                S(
-                                    "archive.backfill.progress_update",
-                                    count=channel_messages_archived,
-                                    channel=channel.mention,
-                                ),
-                                ephemeral=True,
-                                allowed_mentions=discord.AllowedMentions.none(),
-                            )
 
-                except discord.Forbidden:
-                    log.warning(
-                        f"Skipping channel {channel.name} ({channel.id}): Forbidden."
-                    )
-                except Exception as e:
-                    log.error(
-                        f"Failed to scan channel {channel.name} ({channel.id}): {e}"
-                    )
-
-                await asyncio.sleep(1)  # Be nice to the API
+            reporter = asyncio.create_task(_report())
+            try:
+                await crawler.run(channels_to_scan)
+            finally:
+                reporter.cancel()
+                with suppress(asyncio.CancelledError):
+                    await reporter
 
-            await interaction.followup.send(
+            log.info(
+                f"Archive backfill for guild {guild_id}: {stats.channels_done} channels "
+                f"({stats.channels_skipped} skipped), {stats.items_written} messages, "
+                f"{stats.batches} batches, {stats.retries} retries "
+                f"({stats.retry_wait_s:.0f}s waiting), {stats.errors} errors"
+            )
+            await _followup(
                 S(
                     "archive.backfill.complete",
-                    channels=total_channels_scanned,
-                    messages=total_messages_archived,
-                ),
-                ephemeral=True,
+                    channels=stats.channels_done - stats.channels_skipped,
+                    messages=stats.items_written,
+                )
             )
 
         except Exception as e:
-            await interaction.followup.send(
-                S("archive.backfill.error", err=str(e)), ephemeral=True
-            )
-            log.exception(f"Archive task failed for guild {interaction.guild.id}")
+            await _followup(S("archive.backfill.error", err=str(e)))
+            log.exception(f"Archive task failed for guild {guild_id}")
         finally:
-            if interaction.guild.id in self._is_running:
-                self._is_running.remove(interaction.guild.id)
+            if guild_id in self._is_running:
+                self._is_running.remove(guild_id)
+
+    # --- Search ---
+
+    @app_commands.command(
+        name="search",
+        description="Full-text search the message archive.",
+    )
+    @app_commands.describe(
+        query='Words to find; "quoted phrase" for exact, word* for prefix.',
+        author="Only messages by this member.",
+        channel="Only messages in this channel or thread.",
+        days="Only the last N days.",
+        page="Result page (10 per page).",
+    )
+    @app_commands.checks.has_permissions(manage_messages=True)
+    async def archive_search(
+        self,
+        interaction: discord.Interaction,
+        query: str,
+        author: Optional[discord.User] = None,
+        channel: Optional[discord.abc.GuildChannel] = None,
+        days: Optional[int] = None,
+        page: int = 1,
+    ):
+        if not interaction.guild:
+            return await interaction.response.send_message(
+                S("common.guild_only"), ephemeral=True
+            )
+        await interaction.response.defer(ephemeral=True)
+
+        page = max(1, page)
+        since = None
+        if days and days > 0:
+            since = discord.utils.utcnow() - timedelta(days=days)
+        try:
+            hits = await aio.run_read(
+                message_archive.search,
+                interaction.guild.id,
+                query,
+                author_id=author.id if author else None,
+                channel_id=channel.id if channel else None,
+                since=since,
+                limit=SEARCH_PAGE_SIZE,
+                offset=(page - 1) * SEARCH_PAGE_SIZE,
+            )
+        except Exception as e:
+            log.error(f"Archive search failed for {query!r}: {e}")
+            return await interaction.followup.send(
+                S("archive.search.error"), ephemeral=True
+            )
+
+        if not hits:
+            return await interaction.followup.send(
+                S("archive.search.no_results", query=query), ephemeral=True
+            )
+
+        gid = interaction.guild.id
+        lines = []
+        for h in hits:
+            snippet = h.snippet.replace("\n", " ")
+            if len(snippet) > 180:
+                snippet = snippet[:177] + "…"
+            url = f"https://discord.com/channels/{gid}/{h.channel_id}/{h.message_id}"
+            lines.append(
+                f"<@{h.author_id}> in <#{h.channel_id}> · <t:{int(h.created_ts)}:d> · [jump]({url})\n{snippet}"
+            )
+        embed = discord.Embed(
+            title=S("archive.search.title", query=query, page=page),
+            description="\n\n".join(lines)[:4000],
+        )
+        await interaction.followup.send(
+            embed=embed,
+            ephemeral=True,
+            allowed_mentions=discord.AllowedMentions.none(),
+        )
+
+    @app_commands.command(
+        name="reindex",
+        description="Rebuild the archive full-text search index.",
+    )
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def archive_reindex(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        started = time.perf_counter()
+        await self._flush()
+        await aio.run_write(message_archive.rebuild_search_index)
+        await interaction.followup.send(
+            S("archive.reindex.done", seconds=f"{time.perf_counter() - started:.1f}"),
+            ephemeral=True,
+        )
 
 
 async def setup(bot: commands.Bot):
@@ -51,7 +51,6 @@ class BirthdayCog(commands.GroupCog, name="birthday", description="Birthday remi
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        model.ensure_tables()
         self._svc = utils.BirthdayService(bot)
         self._svc.start()
 
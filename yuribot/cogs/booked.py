@@ -6,6 +6,7 @@ import discord
 from discord.ext import commands
 
 from discord.ext.commands import guild_only
+from ..db import aio
 from ..models import role_welcome
 from ..ui.booked import build_role_welcome_embed
 from ..utils.booked import TARGET_ROLE_ID, role_ids
@@ -104,8 +105,8 @@ class RoleWelcomeCog(commands.Cog):
         user_id = after.id
 
         try:
-            already = role_welcome.role_welcome_already_sent(
-                guild_id, user_id, TARGET_ROLE_ID
+            already = await aio.run_read(
+                role_welcome.role_welcome_already_sent, guild_id, user_id, TARGET_ROLE_ID
             )
         except Exception as exc:
             log.exception(
@@ -124,7 +125,9 @@ class RoleWelcomeCog(commands.Cog):
         embed = build_role_welcome_embed(after.guild.name)
         try:
             await after.send(embed=embed)
-            role_welcome.role_welcome_mark_sent(guild_id, user_id, TARGET_ROLE_ID)
+            await aio.run_write(
+                role_welcome.role_welcome_mark_sent, guild_id, user_id, TARGET_ROLE_ID
+            )
             log.info(
                 "rolewelcome.dm_sent",
                 extra={
@@ -135,7 +138,12 @@ class RoleWelcomeCog(commands.Cog):
             )
         except discord.Forbidden:
             try:
-                role_welcome.role_welcome_mark_sent(guild_id, user_id, TARGET_ROLE_ID)
+                await aio.run_write(
+                    role_welcome.role_welcome_mark_sent,
+                    guild_id,
+                    user_id,
+                    TARGET_ROLE_ID,
+                )
             except Exception:
                 pass
             log.warning(
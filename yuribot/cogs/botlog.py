@@ -23,7 +23,7 @@ class BotLogCog(commands.Cog):
         self._botlog_cache = BotLogCache(ttl_seconds=60.0)
 
     async def _post(self, guild: discord.Guild, embed: discord.Embed):
-        ch_id = self._botlog_cache.get_channel_id(guild.id)
+        ch_id = await self._botlog_cache.fetch_channel_id(guild.id)
         ch = channel_from_id(guild, ch_id)
         if not isinstance(ch, discord.TextChannel):
             log.debug(
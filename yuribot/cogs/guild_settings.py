@@ -13,13 +13,6 @@ class GuildSettings(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    @commands.Cog.listener()
-    async def on_ready(self):
-        try:
-            ms.ensure_table()
-        except Exception:
-            pass
-
     @app_commands.command(
         name="set_channel", description="Set a per-guild channel setting by key."
     )
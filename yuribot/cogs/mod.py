@@ -566,7 +566,7 @@ class ModCog(commands.GroupCog, name="mod", description="Moderation tools"):
                 ):
                     from ..db import connect as _db_connect
 
-                    with _db_connect() as con:
+                    with _db_connect(readonly=True) as con:
                         rows = [
                             r[0]
                             for r in con.execute(
@@ -719,7 +719,7 @@ class ModCog(commands.GroupCog, name="mod", description="Moderation tools"):
         fallback_scope = scope.value if scope else booly_model.SCOPE_MENTION_GENERAL
 
         lines: List[str] = []
-        with _db_connect() as con:
+        with _db_connect(readonly=True) as con:
             for uid in targets:
                 # Try personal first
                 cur = con.execute(
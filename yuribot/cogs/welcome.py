@@ -6,6 +6,7 @@ from typing import Optional
 import discord
 from discord.ext import commands
 
+from ..db import aio
 from ..models import settings
 from ..strings import S
 from ..ui.welcome import build_welcome_embed, welcome_content
@@ -31,7 +32,7 @@ class WelcomeCog(commands.Cog):
         cfg = cfg_cache.get(member.guild.id)
         if cfg is None:
             try:
-                cfg = settings.get_welcome_settings(member.guild.id)
+                cfg = await aio.run_read(settings.get_welcome_settings, member.guild.id)
             except Exception as exc:
                 log.exception(
                     "welcome.cfg.lookup_failed",
@@ -6,15 +6,23 @@ except Exception:
     import config
 
 import os
+import time
+import queue
+import asyncio
 import sqlite3
 import logging
-from typing import Optional, Iterable
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from typing import Callable, Deque, Generic, List, Optional, Iterable, Sequence, TypeVar
 from pathlib import Path
 
-from .data.booly_defaults import DEFAULT_BOOLY_ROWS
 
 log = logging.getLogger("yuribot.db")
 
+T = TypeVar("T")
+
 
 # ----------------------------
 # Path resolution
@@ -108,34 +116,600 @@ def _is_fresh_db(path: str) -> bool:
 
 
 # ----------------------------
-# Public: connect() / ensure_db()
+# Connection pool
 # ----------------------------
-def connect() -> sqlite3.Connection:
+# PRAGMAs are applied once, when a pooled connection is opened.
+_WRITER_PRAGMAS = (
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=3000",
+    "PRAGMA temp_store=MEMORY",
+)
+_READER_PRAGMAS = (
+    "PRAGMA foreign_keys=ON",
+    "PRAGMA busy_timeout=3000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA query_only=ON",
+)
+
+
+def _read_pool_size() -> int:
+    try:
+        return max(1, int(os.getenv("DB_READ_POOL_SIZE", "4")))
+    except ValueError:
+        return 4
+
+
+class Lease:
+    """
+    A borrowed pooled connection. Proxies the sqlite3.Connection API.
+
+    ``with connect() as con`` commits on success, rolls back on error and
+    returns the connection to the pool; a bare ``con.close()`` returns it
+    without committing (matching sqlite3 close semantics). Reader leases
+    dropped without either go back to the pool when collected; a writer
+    lease must be closed by the thread that took it.
+
+    A writer lease taken while the same thread already holds one is nested:
+    the outermost lease owns the transaction, so a nested lease's commit()
+    (and its ``with`` exit) is a no-op and its rollback() raises; errors
+    propagate to the outer lease, which rolls back.
+    """
+
+    __slots__ = ("_con", "_pool", "_readonly", "_nested", "_released")
+
+    def __init__(
+        self,
+        con: sqlite3.Connection,
+        pool: "ConnectionPool",
+        readonly: bool,
+        nested: bool = False,
+    ):
+        object.__setattr__(self, "_con", con)
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_readonly", readonly)
+        object.__setattr__(self, "_nested", nested)
+        object.__setattr__(self, "_released", False)
+
+    def __getattr__(self, name: str):
+        if self._released:
+            raise sqlite3.ProgrammingError("Cannot operate on a released connection.")
+        return getattr(self._con, name)
+
+    def __setattr__(self, name: str, value) -> None:
+        # row_factory / text_factory / isolation_level land on the real connection
+        # and are reset by the pool on release.
+        setattr(self._con, name, value)
+
+    def __enter__(self) -> "Lease":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if not self._released and not self._nested:
+                if exc_type is None:
+                    self._con.commit()
+                else:
+                    self._con.rollback()
+        finally:
+            self.close()
+        return False
+
+    def commit(self) -> None:
+        if self._released:
+            raise sqlite3.ProgrammingError("Cannot operate on a released connection.")
+        if not self._nested:
+            self._con.commit()
+
+    def rollback(self) -> None:
+        if self._released:
+            raise sqlite3.ProgrammingError("Cannot operate on a released connection.")
+        if self._nested:
+            raise sqlite3.OperationalError(
+                "cannot roll back a nested writer lease; let the error reach the outer one"
+            )
+        self._con.rollback()
+
+    def close(self) -> None:
+        if self._released:
+            return
+        object.__setattr__(self, "_released", True)
+        self._pool._release(self._con, self._readonly)
+
+    def __del__(self) -> None:  # safety net for leases dropped without close()
+        if self._released:
+            return
+        if not self._readonly:
+            # The writer lock belongs to the thread that took the lease, and
+            # this may run on any thread (a cycle, an abandoned generator), so
+            # unwinding here could roll back someone else's transaction.
+            log.error("Writer connection lease for %s was never closed", self._pool.path)
+            return
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def register_functions(con: sqlite3.Connection) -> None:
+    """
+    Install the SQL functions the models use (hll_merge / hll_count,
+    bits_or). Pooled connections get them once, when opened.
+    """
+    from .utils import bitmaps, hll  # NumPy-backed; loaded on first connect
+
+    hll.register(con)
+    bitmaps.register(con)
+
+
+class ConnectionPool:
+    """One long-lived writer connection plus a small pool of query-only readers."""
+
+    def __init__(self, path: str, read_size: int):
+        self.path = path
+        self.read_size = read_size
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers_open = 0
+        self._state_lock = threading.Lock()
+        self._closed = False
+
+    def _open(self, pragmas: Iterable[str]) -> sqlite3.Connection:
+        con = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        for pragma in pragmas:
+            con.execute(pragma)
+        register_functions(con)
+        return con
+
+    @staticmethod
+    def _reset(con: sqlite3.Connection) -> None:
+        if con.in_transaction:
+            con.rollback()
+        con.row_factory = None
+        con.text_factory = str
+        con.set_trace_callback(None)
+
+    def writer(self) -> Lease:
+        self._writer_lock.acquire()
+        try:
+            if self._closed:
+                raise RuntimeError(f"Connection pool for {self.path} is closed.")
+            if self._writer is None:
+                self._writer = self._open(_WRITER_PRAGMAS)
+            self._writer_depth += 1
+            return Lease(
+                self._writer, self, readonly=False, nested=self._writer_depth > 1
+            )
+        except BaseException:
+            self._writer_lock.release()
+            raise
+
+    def reader(self) -> Lease:
+        try:
+            con = self._readers.get_nowait()
+        except queue.Empty:
+            with self._state_lock:
+                if self._closed:
+                    raise RuntimeError(f"Connection pool for {self.path} is closed.")
+                self._readers_open += 1
+            try:
+                con = self._open(_READER_PRAGMAS)
+            except BaseException:
+                with self._state_lock:
+                    self._readers_open -= 1
+                raise
+        return Lease(con, self, readonly=True)
+
+    def _release(self, con: sqlite3.Connection, readonly: bool) -> None:
+        if not readonly:
+            try:
+                self._writer_depth -= 1
+                if self._writer_depth == 0:
+                    self._reset(con)
+            finally:
+                self._writer_lock.release()
+            return
+
+        keep = False
+        try:
+            self._reset(con)
+            with self._state_lock:
+                keep = not self._closed and self._readers.qsize() < self.read_size
+                if not keep:
+                    self._readers_open -= 1
+        except Exception:
+            with self._state_lock:
+                self._readers_open -= 1
+        if keep:
+            self._readers.put(con)
+        else:
+            with suppress(Exception):
+                con.close()
+
+    def close(self) -> None:
+        with self._state_lock:
+            self._closed = True
+        while True:
+            try:
+                con = self._readers.get_nowait()
+            except queue.Empty:
+                break
+            with suppress(Exception):
+                con.close()
+            with self._state_lock:
+                self._readers_open -= 1
+        with self._writer_lock:
+            if self._writer is not None:
+                with suppress(Exception):
+                    self._writer.commit()
+                    self._writer.close()
+                self._writer = None
+
+    def stats(self) -> dict:
+        with self._state_lock:
+            return {
+                "path": self.path,
+                "writer_open": self._writer is not None,
+                "readers_open": self._readers_open,
+                "readers_idle": self._readers.qsize(),
+                "read_pool_size": self.read_size,
+            }
+
+
+_POOLS: dict[str, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Return the pool for the current BOT_DB_PATH, creating it on first use."""
     path = _resolved_db_path()
-    if os.getenv("DB_REQUIRE_PERSISTENCE") == "1" and _is_fresh_db(path):
-        raise RuntimeError(
-            f"Refusing to start on fresh DB: {path}. "
-            "Set BOT_DB_PATH to a persistent location (e.g. a Docker volume) "
-            "or unset DB_REQUIRE_PERSISTENCE."
-        )
+    pool = _POOLS.get(path)
+    if pool is not None:
+        return pool
+    with _POOLS_LOCK:
+        pool = _POOLS.get(path)
+        if pool is None:
+            if os.getenv("DB_REQUIRE_PERSISTENCE") == "1" and _is_fresh_db(path):
+                raise RuntimeError(
+                    f"Refusing to start on fresh DB: {path}. "
+                    "Set BOT_DB_PATH to a persistent location (e.g. a Docker volume) "
+                    "or unset DB_REQUIRE_PERSISTENCE."
+                )
+            pool = ConnectionPool(path, _read_pool_size())
+            _POOLS[path] = pool
+    return pool
+
+
+def close_pool() -> None:
+    """Close every pooled connection (call on shutdown)."""
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        try:
+            pool.close()
+        except Exception as e:
+            log.warning("db.close path=%s failed: %s", pool.path, e)
+
+
+# ----------------------------
+# Public: connect() / ensure_db()
+# ----------------------------
+def connect(*, readonly: bool = False) -> Lease:
+    """
+    Lease a pooled connection.
+
+    The default lease is the shared writer (serialised per process, re-entrant
+    within a thread). Pass ``readonly=True`` for plain SELECTs so they run on
+    one of the query-only reader connections instead.
+    """
+    pool = get_pool()
+    return pool.reader() if readonly else pool.writer()
+
+
+# ----------------------------
+# Async facade (keeps SQLite off the event loop)
+# ----------------------------
+class _OpStats:
+    __slots__ = ("calls", "errors", "wait_ms", "run_ms", "max_wait_ms", "max_run_ms")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.wait_ms = 0.0
+        self.run_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.max_run_ms = 0.0
+
+    def record(self, wait_ms: float, run_ms: float, ok: bool) -> None:
+        self.calls += 1
+        self.errors += 0 if ok else 1
+        self.wait_ms += wait_ms
+        self.run_ms += run_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        self.max_run_ms = max(self.max_run_ms, run_ms)
+
+    def as_dict(self) -> dict:
+        n = max(1, self.calls)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_wait_ms": round(self.wait_ms / n, 3),
+            "avg_run_ms": round(self.run_ms / n, 3),
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "max_run_ms": round(self.max_run_ms, 3),
+        }
+
+
+class AsyncDB:
+    """
+    Awaitable DB access for cogs.
+
+    Writes are queued onto one dedicated writer thread (so they never contend
+    with each other for the SQLite lock); reads fan out over a small thread
+    pool backed by the reader connections. Model functions can be run as-is
+    via run_write()/run_read().
+    """
+
+    def __init__(self) -> None:
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._readers: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats = {"write": _OpStats(), "read": _OpStats()}
+        self._pending_writes = 0
+
+    def _executor(self, readonly: bool) -> ThreadPoolExecutor:
+        ex = self._readers if readonly else self._writer
+        if ex is not None:
+            return ex
+        with self._lock:
+            if readonly and self._readers is None:
+                self._readers = ThreadPoolExecutor(
+                    max_workers=_read_pool_size(), thread_name_prefix="db-read"
+                )
+            if not readonly and self._writer is None:
+                self._writer = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="db-write"
+                )
+            return self._readers if readonly else self._writer  # type: ignore[return-value]
+
+    async def _submit(self, readonly: bool, fn: Callable[..., T], *args, **kwargs) -> T:
+        stats = self._stats["read" if readonly else "write"]
+        queued = time.perf_counter()
+
+        def _run() -> T:
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                done = time.perf_counter()
+                stats.record((started - queued) * 1000.0, (done - started) * 1000.0, ok)
+
+        loop = asyncio.get_running_loop()
+        if not readonly:
+            self._pending_writes += 1
+        try:
+            return await loop.run_in_executor(self._executor(readonly), _run)
+        finally:
+            if not readonly:
+                self._pending_writes -= 1
+
+    async def run_write(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a (model) function on the writer thread."""
+        return await self._submit(False, fn, *args, **kwargs)
+
+    async def run_read(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Run a read-only (model) function on the reader pool."""
+        return await self._submit(True, fn, *args, **kwargs)
+
+    async def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Execute one write statement and commit. Returns rowcount."""
+
+        def _do() -> int:
+            with connect() as con:
+                return con.execute(sql, params).rowcount
+
+        return await self.run_write(_do)
+
+    async def executemany(self, sql: str, seq: Iterable[Sequence]) -> int:
+        """Execute a write statement for every parameter set in one commit."""
+        rows = list(seq)
 
-    con = sqlite3.connect(path, timeout=5)
-    con.execute("PRAGMA foreign_keys=ON")
-    con.execute("PRAGMA journal_mode=WAL")
-    con.execute("PRAGMA synchronous=NORMAL")
-    con.execute("PRAGMA busy_timeout=3000")
-    return con
+        def _do() -> int:
+            with connect() as con:
+                return con.executemany(sql, rows).rowcount
+
+        return await self.run_write(_do)
+
+    async def fetchall(self, sql: str, params: Sequence = ()) -> list:
+        def _do() -> list:
+            with connect(readonly=True) as con:
+                con.row_factory = sqlite3.Row
+                return con.execute(sql, params).fetchall()
+
+        return await self.run_read(_do)
+
+    async def fetchone(self, sql: str, params: Sequence = ()):
+        def _do():
+            with connect(readonly=True) as con:
+                con.row_factory = sqlite3.Row
+                return con.execute(sql, params).fetchone()
+
+        return await self.run_read(_do)
+
+    async def transaction(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run ``fn(con, *args, **kwargs)`` inside BEGIN IMMEDIATE … COMMIT on the
+        writer thread; any exception rolls the whole unit back.
+        """
+
+        def _do() -> T:
+            with connect() as con:
+                con.execute("BEGIN IMMEDIATE")
+                return fn(con, *args, **kwargs)
+
+        return await self.run_write(_do)
+
+    def stats(self) -> dict:
+        return {
+            "pending_writes": self._pending_writes,
+            "write": self._stats["write"].as_dict(),
+            "read": self._stats["read"].as_dict(),
+        }
+
+    def shutdown(self) -> None:
+        """Drain queued writes and stop the worker threads."""
+        with self._lock:
+            writer, readers = self._writer, self._readers
+            self._writer = self._readers = None
+        if writer is not None:
+            writer.shutdown(wait=True)
+        if readers is not None:
+            readers.shutdown(wait=True)
+
+
+aio = AsyncDB()
+
+
+class WriteBuffer(Generic[T]):
+    """
+    Write-behind buffer: collects items in memory and hands them to ``write``
+    as one batch (one transaction) per flush.
+
+    The owner calls add() per item and flush() when add() reports the batch
+    is full, on a timer (``max_delay_ms``), and on shutdown. flush() blocks on
+    SQLite, so run it on the writer thread (``aio.run_write(buf.flush)``). A
+    failed flush puts the batch back in front so nothing is lost; ``write``
+    must therefore be idempotent.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[T]], int],
+        *,
+        max_items: int = 500,
+        max_delay_ms: int = 2000,
+    ):
+        self._write = write
+        self.max_items = max(1, int(max_items))
+        self.max_delay_ms = max(1, int(max_delay_ms))
+        self._pending: List[T] = []
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.flushed = 0
+        self.last_flush_ms = 0.0
+
+    def add(self, item: T) -> bool:
+        """Queue an item. Returns True once the batch should be flushed."""
+        with self._lock:
+            self._pending.append(item)
+            return len(self._pending) >= self.max_items
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Write everything pending in one batch. Returns ``write``'s count."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        try:
+            n = self._write(batch)
+        except Exception:
+            with self._lock:
+                self._pending[:0] = batch
+            raise
+        self.flushes += 1
+        self.flushed += int(n or 0)
+        self.last_flush_ms = (time.perf_counter() - started) * 1000.0
+        return n
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending(),
+            "flushes": self.flushes,
+            "flushed": self.flushed,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+        }
+
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop stalls: sleeps for ``interval`` and records how late it
+    wakes up. Anything above ``warn_ms`` is logged with the DB executor stats
+    so DB-induced stalls are visible.
+    """
+
+    def __init__(self, interval: float = 0.5, warn_ms: float = 250.0, window: int = 1200):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.max_ms = 0.0
+        self.stalls = 0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - start - self.interval) * 1000.0)
+            self._samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            if lag_ms >= self.warn_ms:
+                self.stalls += 1
+                log.warning(
+                    "loop.stall lag_ms=%.1f db=%s", lag_ms, aio.stats()
+                )
+
+    def stats(self) -> dict:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0, "stalls": 0}
+        return {
+            "samples": len(samples),
+            "p50_ms": round(samples[len(samples) // 2], 3),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+            "max_ms": round(self.max_ms, 3),
+            "stalls": self.stalls,
+        }
+
+
+loop_lag = LoopLagMonitor(
+    warn_ms=float(os.getenv("LOOP_LAG_WARN_MS", "250") or 250),
+)
 
 
 def ensure_db() -> None:
     """
-    Idempotently create/upgrade the tables actually used by the bot
-    and drop known-unused legacy tables. Also fixes guild_settings schema.
+    Bring the database up to the latest schema (see yuribot.migrations).
+
+    An up-to-date database costs one indexed read of schema_migrations;
+    otherwise every pending migration is applied in order.
     """
+    from .migrations import migrate
+
     path = _resolved_db_path()
     os.makedirs(os.path.dirname(path), exist_ok=True)
 
-    with sqlite3.connect(path, timeout=5) as con:
+    started = time.perf_counter()
+    con = sqlite3.connect(path, timeout=5, isolation_level=None)
+    try:
         cur = con.cursor()
         cur.execute("PRAGMA journal_mode=WAL")
         journal = cur.execute("PRAGMA journal_mode").fetchone()[0]
@@ -149,348 +723,11 @@ def ensure_db() -> None:
             size = 0
         log.info("db.open path=%s size=%d journal=%s", path, size, journal)
 
-        # ========== FIX guild_settings schema conflict ==========
-        # If an old key/value table is sitting under the name 'guild_settings',
-        # rename it to 'guild_kv' first.
-        if _table_exists(con, "guild_settings"):
-            cols = set(_columns(con, "guild_settings"))
-            if {"key", "value"}.issubset(cols) and "mod_logs_channel_id" not in cols:
-                # This is the KV table misnamed as guild_settings -> rename.
-                cur.execute("ALTER TABLE guild_settings RENAME TO guild_kv")
-
-        # Ensure proper columnized guild_settings
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS guild_settings (
-                guild_id INTEGER PRIMARY KEY,
-                mod_logs_channel_id INTEGER,
-                bot_logs_channel_id INTEGER,
-                welcome_channel_id INTEGER,
-                welcome_image_filename TEXT,
-                mu_forum_channel_id INTEGER
-            )
-            """
-        )
-        _ensure_column(con, "guild_settings", "welcome_channel_id", "INTEGER")
-        _ensure_column(con, "guild_settings", "welcome_image_filename", "TEXT")
-        _ensure_column(con, "guild_settings", "mu_forum_channel_id", "INTEGER")
-
-        # Ensure proper key/value store as guild_kv
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS guild_kv (
-                guild_id INTEGER NOT NULL,
-                key      TEXT    NOT NULL,
-                value    TEXT,
-                PRIMARY KEY (guild_id, key)
-            )
-            """
-        )
-
-        # ========== clubs ==========
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS clubs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                club_type TEXT NOT NULL,
-                announcements_channel_id INTEGER,
-                planning_forum_id INTEGER,
-                polls_channel_id INTEGER,
-                discussion_forum_id INTEGER,
-                UNIQUE(guild_id, club_type)
-            )
-            """
-        )
-        # Drop any historical CHECK constraint variant
-        sql = _table_sql(con, "clubs")
-        if sql and "CHECK" in sql.upper():
-            cur.execute("ALTER TABLE clubs RENAME TO clubs_old")
-            cur.execute(
-                """
-                CREATE TABLE clubs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER NOT NULL,
-                    club_type TEXT NOT NULL,
-                    announcements_channel_id INTEGER,
-                    planning_forum_id INTEGER,
-                    polls_channel_id INTEGER,
-                    discussion_forum_id INTEGER,
-                    UNIQUE(guild_id, club_type)
-                )
-                """
-            )
-            cur.execute(
-                """
-                INSERT OR IGNORE INTO clubs (id, guild_id, club_type, announcements_channel_id, planning_forum_id, polls_channel_id, discussion_forum_id)
-                SELECT id, guild_id, club_type, announcements_channel_id, planning_forum_id, polls_channel_id, discussion_forum_id
-                FROM clubs_old
-                """
-            )
-            cur.execute("DROP TABLE clubs_old")
-
-        # ========== booly_messages ==========
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS booly_messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                scope TEXT NOT NULL,
-                user_id INTEGER,
-                content TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (datetime('now')),
-                updated_at TEXT NOT NULL DEFAULT (datetime('now'))
-            )
-            """
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_booly_scope ON booly_messages (scope, user_id)"
-        )
-        existing_booly = cur.execute("SELECT COUNT(1) FROM booly_messages").fetchone()[
-            0
-        ]
-        if not existing_booly:
-            cur.executemany(
-                "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, ?, ?)",
-                DEFAULT_BOOLY_ROWS,
-            )
-
-        # ========== mod_actions ==========
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mod_actions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                guild_id INTEGER NOT NULL,
-                target_user_id INTEGER NOT NULL,
-                target_username TEXT,
-                rule TEXT NOT NULL,
-                offense INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                details TEXT,
-                evidence_url TEXT,
-                actor_user_id INTEGER NOT NULL,
-                created_at TEXT NOT NULL
-            )
-            """
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_mod_actions_lookup ON mod_actions (guild_id, target_user_id, id DESC)"
-        )
-
-        # ========== message_archive ==========
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS message_archive (
-            message_id  INTEGER PRIMARY KEY,
-            guild_id    INTEGER NOT NULL,
-            channel_id  INTEGER NOT NULL,
-            author_id   INTEGER NOT NULL,
-            message_type TEXT    NOT NULL,
-            created_at  TEXT    NOT NULL,
-            content     TEXT,
-            edited_at   TEXT,
-            -- existing JSON blobs
-            attachments_json TEXT,
-            embeds_json      TEXT,
-            reactions        TEXT,
-            reply_to_id      INTEGER,
-            -- NEW detail blobs for content analytics
-            emojis_json      TEXT,   -- list[ {emoji, emoji_id, emoji_name, emoji_animated, count} ]
-            stickers_json    TEXT,   -- list[ {id, name, format} ]
-            gif_urls_json    TEXT    -- list[str]
-        )
-        """
-        )
-        _ensure_column(con, "message_archive", "emojis_json", "TEXT")
-        _ensure_column(con, "message_archive", "stickers_json", "TEXT")
-        _ensure_column(con, "message_archive", "gif_urls_json", "TEXT")
-        _ensure_column(con, "message_archive", "reactions", "TEXT")
-        _ensure_column(con, "message_archive", "reply_to_id", "INTEGER")
-        _ensure_column(con, "message_archive", "attachments_json", "TEXT")
-        _ensure_column(con, "message_archive", "embeds_json", "TEXT")
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_message_archive_guild_channel ON message_archive (guild_id, channel_id, created_at)"
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_message_archive_author ON message_archive (guild_id, author_id, created_at)"
-        )
-        # per-user/day message + content metrics (for stats.html cards)
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS message_metrics_daily (
-        guild_id      INTEGER NOT NULL,
-        user_id       INTEGER NOT NULL,
-        day           TEXT    NOT NULL,          -- 'YYYY-MM-DD' (UTC)
-        messages      INTEGER NOT NULL DEFAULT 0,
-        words         INTEGER NOT NULL DEFAULT 0,
-        replies       INTEGER NOT NULL DEFAULT 0,
-        mentions      INTEGER NOT NULL DEFAULT 0,
-        gifs          INTEGER NOT NULL DEFAULT 0,
-        reactions_rx  INTEGER NOT NULL DEFAULT 0, -- sum of counts on that user's messages
-        PRIMARY KEY (guild_id, user_id, day)
-        )"""
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_msg_metrics_gud ON message_metrics_daily(guild_id, user_id, day)"
-        )
-
-        # per-user/day emoji & sticker usage (one row per unique token & source)
-        cur.execute(
-            """
-        CREATE TABLE IF NOT EXISTS reaction_emoji_daily (
-        guild_id      INTEGER NOT NULL,
-        user_id       INTEGER NOT NULL,
-        day           TEXT    NOT NULL,
-        kind          TEXT    NOT NULL,          -- 'text_emoji' | 'custom_emoji' | 'reaction' | 'sticker' | 'gif'
-        key           TEXT    NOT NULL,          -- e.g. '🥲' or 'henyaHeart:1432...' or sticker_id or gif host
-        count         INTEGER NOT NULL DEFAULT 0,
-        PRIMARY KEY (guild_id, user_id, day, kind, key)
-        )"""
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_re_agg_gd ON reaction_emoji_daily(guild_id, day)"
-        )
-
-        # ========== role_welcome_sent ==========
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS role_welcome_sent (
-                guild_id INTEGER NOT NULL,
-                user_id  INTEGER NOT NULL,
-                role_id  INTEGER NOT NULL,
-                sent_at  TEXT    NOT NULL,
-                PRIMARY KEY (guild_id, user_id, role_id)
-            )
-            """
-        )
-
-        # ========== MU tables ==========
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mu_series (
-                series_id TEXT PRIMARY KEY,
-                title     TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT (datetime('now'))
-            )
-            """
-        )
-
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mu_releases (
-                series_id   TEXT    NOT NULL,
-                release_id  INTEGER NOT NULL,
-                title       TEXT,
-                raw_title   TEXT,
-                description TEXT,
-                volume      TEXT,
-                chapter     TEXT,
-                subchapter  TEXT,
-                group_name  TEXT,
-                url         TEXT,
-                release_ts  INTEGER NOT NULL DEFAULT -1,
-                created_at  TEXT    NOT NULL DEFAULT (datetime('now')),
-                PRIMARY KEY (series_id, release_id)
-            )
-            """
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_mu_releases_series_ts ON mu_releases (series_id, release_ts DESC)"
-        )
-
-        # historical migration guard
-        sql = _table_sql(con, "mu_releases")
-        if sql and "PRIMARY KEY" not in sql.upper():
-            cur.execute("ALTER TABLE mu_releases RENAME TO mu_releases_old")
-            cur.execute(
-                """
-                CREATE TABLE mu_releases (
-                    series_id   TEXT    NOT NULL,
-                    release_id  INTEGER NOT NULL,
-                    title       TEXT,
-                    raw_title   TEXT,
-                    description TEXT,
-                    volume      TEXT,
-                    chapter     TEXT,
-                    subchapter  TEXT,
-                    group_name  TEXT,
-                    url         TEXT,
-                    release_ts  INTEGER NOT NULL DEFAULT -1,
-                    created_at  TEXT    NOT NULL DEFAULT (datetime('now')),
-                    PRIMARY KEY (series_id, release_id)
-                )
-                """
-            )
-            cur.execute(
-                """
-                INSERT OR IGNORE INTO mu_releases
-                (series_id, release_id, title, raw_title, description, volume, chapter, subchapter, group_name, url, release_ts, created_at)
-                SELECT series_id, release_id, title, raw_title, description, volume, chapter, subchapter, group_name, url, release_ts,
-                       COALESCE(created_at, datetime('now'))
-                FROM mu_releases_old
-                """
-            )
-            cur.execute("DROP TABLE mu_releases_old")
-            cur.execute(
-                "CREATE INDEX IF NOT EXISTS idx_mu_releases_series_ts ON mu_releases (series_id, release_ts DESC)"
-            )
-
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mu_thread_series (
-                guild_id  INTEGER NOT NULL,
-                thread_id INTEGER NOT NULL,
-                series_id TEXT    NOT NULL,
-                PRIMARY KEY (guild_id, thread_id)
-            )
-            """
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_mu_thread_series_series ON mu_thread_series (series_id)"
-        )
-
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS mu_thread_posts (
-                guild_id   INTEGER NOT NULL,
-                thread_id  INTEGER NOT NULL,
-                series_id  TEXT    NOT NULL,
-                release_id INTEGER NOT NULL,
-                posted_at  TEXT    NOT NULL DEFAULT (datetime('now')),
-                PRIMARY KEY (guild_id, thread_id, release_id)
-            )
-            """
-        )
-        cur.execute(
-            "CREATE INDEX IF NOT EXISTS idx_mu_thread_posts_series ON mu_thread_posts (series_id)"
-        )
-
-        # ========== DROP unused legacy tables ==========
-        _drop_if_exists(
-            con,
-            (
-                # analytics / legacy we don't read
-                "collections",
-                "emoji_usage_monthly",
-                "gif_usage_monthly",
-                "sticker_usage_monthly",
-                "member_activity_apps_daily",
-                "member_activity_monthly",
-                "member_activity_total",
-                "member_channel_totals",
-                "member_hour_hist",
-                "member_metrics_daily",
-                "member_metrics_total",
-                "member_rpg_progress",
-                "movie_events",
-                "voice_minutes_day",
-                "voice_sessions",
-                "series",
-                "submissions",
-                # old polls stack (unused by current code)
-                "poll_votes",
-                "poll_options",
-                "polls",
-            ),
-        )
-
-        con.commit()
+        applied = migrate(con)
+    finally:
+        con.close()
+    log.info(
+        "db.ensure applied=%d ms=%.1f",
+        applied,
+        (time.perf_counter() - started) * 1000.0,
+    )
@@ -0,0 +1,1346 @@
+"""
+Schema migrations.
+
+Each migration is numbered and applied once, in order, inside its own
+transaction; applied versions are recorded in ``schema_migrations`` together
+with a fingerprint of the registry (version + name of each migration) up to
+that version. ``migrate()`` first compares the newest recorded row against
+the registry, so booting against an up-to-date database is a single
+primary-key read.
+
+To change the schema, append a new Migration to MIGRATIONS. Never edit or
+reorder one that has shipped. Renumbering, renaming or reordering shipped
+migrations changes the fingerprint and logs ``schema.fingerprint_mismatch``
+at boot (a warning; nothing is re-run). Edits to a migration's body are not
+detected at all: a database that already applied it keeps the old schema. A
+migration spells out the DDL and backfill SQL it applies rather than
+reading the models' current constants or calling their helpers, which move
+on. Only the on-disk encoders in ``analytics`` (bitmaps, sketches, slot
+blobs) are shared, since those formats cannot change under existing rows.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Callable, List, Optional, Tuple
+
+import analytics
+
+from .data.booly_defaults import DEFAULT_BOOLY_ROWS
+from .db import _columns, _drop_if_exists, _ensure_column, _table_exists, _table_sql
+
+log = logging.getLogger("yuribot.migrations")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Connection], None]
+
+
+def exec_script(con: sqlite3.Connection, script: str) -> None:
+    """
+    Run a multi-statement DDL string inside the current transaction.
+
+    sqlite3's executescript() would COMMIT first, which breaks per-migration
+    atomicity, so statements are split on complete-statement boundaries.
+    """
+    buf = ""
+    for piece in script.split(";"):
+        buf += piece + ";"
+        if sqlite3.complete_statement(buf):
+            if buf.strip(" \t\r\n;"):
+                con.execute(buf)
+            buf = ""
+    if buf.strip(" \t\r\n;"):
+        con.execute(buf)
+
+
+# ----------------------------
+# Migrations
+# ----------------------------
+def _m001_baseline(con: sqlite3.Connection) -> None:
+    """The schema ensure_db() used to (re)build on every boot."""
+    cur = con.cursor()
+
+    # ========== FIX guild_settings schema conflict ==========
+    # If an old key/value table is sitting under the name 'guild_settings',
+    # rename it to 'guild_kv' first.
+    if _table_exists(con, "guild_settings"):
+        cols = set(_columns(con, "guild_settings"))
+        if {"key", "value"}.issubset(cols) and "mod_logs_channel_id" not in cols:
+            # This is the KV table misnamed as guild_settings -> rename.
+            cur.execute("ALTER TABLE guild_settings RENAME TO guild_kv")
+
+    # Ensure proper columnized guild_settings
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS guild_settings (
+            guild_id INTEGER PRIMARY KEY,
+            mod_logs_channel_id INTEGER,
+            bot_logs_channel_id INTEGER,
+            welcome_channel_id INTEGER,
+            welcome_image_filename TEXT,
+            mu_forum_channel_id INTEGER
+        )
+        """
+    )
+    _ensure_column(con, "guild_settings", "welcome_channel_id", "INTEGER")
+    _ensure_column(con, "guild_settings", "welcome_image_filename", "TEXT")
+    _ensure_column(con, "guild_settings", "mu_forum_channel_id", "INTEGER")
+
+    # Ensure proper key/value store as guild_kv
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS guild_kv (
+            guild_id INTEGER NOT NULL,
+            key      TEXT    NOT NULL,
+            value    TEXT,
+            PRIMARY KEY (guild_id, key)
+        )
+        """
+    )
+
+    # ========== clubs ==========
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS clubs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            club_type TEXT NOT NULL,
+            announcements_channel_id INTEGER,
+            planning_forum_id INTEGER,
+            polls_channel_id INTEGER,
+            discussion_forum_id INTEGER,
+            UNIQUE(guild_id, club_type)
+        )
+        """
+    )
+    # Drop any historical CHECK constraint variant
+    sql = _table_sql(con, "clubs")
+    if sql and "CHECK" in sql.upper():
+        cur.execute("ALTER TABLE clubs RENAME TO clubs_old")
+        cur.execute(
+            """
+            CREATE TABLE clubs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id INTEGER NOT NULL,
+                club_type TEXT NOT NULL,
+                announcements_channel_id INTEGER,
+                planning_forum_id INTEGER,
+                polls_channel_id INTEGER,
+                discussion_forum_id INTEGER,
+                UNIQUE(guild_id, club_type)
+            )
+            """
+        )
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO clubs (id, guild_id, club_type, announcements_channel_id, planning_forum_id, polls_channel_id, discussion_forum_id)
+            SELECT id, guild_id, club_type, announcements_channel_id, planning_forum_id, polls_channel_id, discussion_forum_id
+            FROM clubs_old
+            """
+        )
+        cur.execute("DROP TABLE clubs_old")
+
+    # ========== booly_messages ==========
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS booly_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT NOT NULL,
+            user_id INTEGER,
+            content TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now')),
+            updated_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_booly_scope ON booly_messages (scope, user_id)"
+    )
+    existing_booly = cur.execute("SELECT COUNT(1) FROM booly_messages").fetchone()[
+        0
+    ]
+    if not existing_booly:
+        cur.executemany(
+            "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, ?, ?)",
+            DEFAULT_BOOLY_ROWS,
+        )
+
+    # ========== mod_actions ==========
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mod_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            target_user_id INTEGER NOT NULL,
+            target_username TEXT,
+            rule TEXT NOT NULL,
+            offense INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            details TEXT,
+            evidence_url TEXT,
+            actor_user_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mod_actions_lookup ON mod_actions (guild_id, target_user_id, id DESC)"
+    )
+
+    # ========== message_archive ==========
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS message_archive (
+        message_id  INTEGER PRIMARY KEY,
+        guild_id    INTEGER NOT NULL,
+        channel_id  INTEGER NOT NULL,
+        author_id   INTEGER NOT NULL,
+        message_type TEXT    NOT NULL,
+        created_at  TEXT    NOT NULL,
+        content     TEXT,
+        edited_at   TEXT,
+        -- existing JSON blobs
+        attachments_json TEXT,
+        embeds_json      TEXT,
+        reactions        TEXT,
+        reply_to_id      INTEGER,
+        -- NEW detail blobs for content analytics
+        emojis_json      TEXT,   -- list[ {emoji, emoji_id, emoji_name, emoji_animated, count} ]
+        stickers_json    TEXT,   -- list[ {id, name, format} ]
+        gif_urls_json    TEXT    -- list[str]
+    )
+    """
+    )
+    _ensure_column(con, "message_archive", "emojis_json", "TEXT")
+    _ensure_column(con, "message_archive", "stickers_json", "TEXT")
+    _ensure_column(con, "message_archive", "gif_urls_json", "TEXT")
+    _ensure_column(con, "message_archive", "reactions", "TEXT")
+    _ensure_column(con, "message_archive", "reply_to_id", "INTEGER")
+    _ensure_column(con, "message_archive", "attachments_json", "TEXT")
+    _ensure_column(con, "message_archive", "embeds_json", "TEXT")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_message_archive_guild_channel ON message_archive (guild_id, channel_id, created_at)"
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_message_archive_author ON message_archive (guild_id, author_id, created_at)"
+    )
+    # per-user/day message + content metrics (for stats.html cards)
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS message_metrics_daily (
+    guild_id      INTEGER NOT NULL,
+    user_id       INTEGER NOT NULL,
+    day           TEXT    NOT NULL,          -- 'YYYY-MM-DD' (UTC)
+    messages      INTEGER NOT NULL DEFAULT 0,
+    words         INTEGER NOT NULL DEFAULT 0,
+    replies       INTEGER NOT NULL DEFAULT 0,
+    mentions      INTEGER NOT NULL DEFAULT 0,
+    gifs          INTEGER NOT NULL DEFAULT 0,
+    reactions_rx  INTEGER NOT NULL DEFAULT 0, -- sum of counts on that user's messages
+    PRIMARY KEY (guild_id, user_id, day)
+    )"""
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_msg_metrics_gud ON message_metrics_daily(guild_id, user_id, day)"
+    )
+
+    # per-user/day emoji & sticker usage (one row per unique token & source)
+    cur.execute(
+        """
+    CREATE TABLE IF NOT EXISTS reaction_emoji_daily (
+    guild_id      INTEGER NOT NULL,
+    user_id       INTEGER NOT NULL,
+    day           TEXT    NOT NULL,
+    kind          TEXT    NOT NULL,          -- 'text_emoji' | 'custom_emoji' | 'reaction' | 'sticker' | 'gif'
+    key           TEXT    NOT NULL,          -- e.g. '🥲' or 'henyaHeart:1432...' or sticker_id or gif host
+    count         INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, user_id, day, kind, key)
+    )"""
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_re_agg_gd ON reaction_emoji_daily(guild_id, day)"
+    )
+
+    # ========== role_welcome_sent ==========
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS role_welcome_sent (
+            guild_id INTEGER NOT NULL,
+            user_id  INTEGER NOT NULL,
+            role_id  INTEGER NOT NULL,
+            sent_at  TEXT    NOT NULL,
+            PRIMARY KEY (guild_id, user_id, role_id)
+        )
+        """
+    )
+
+    # ========== MU tables ==========
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mu_series (
+            series_id TEXT PRIMARY KEY,
+            title     TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+        """
+    )
+
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mu_releases (
+            series_id   TEXT    NOT NULL,
+            release_id  INTEGER NOT NULL,
+            title       TEXT,
+            raw_title   TEXT,
+            description TEXT,
+            volume      TEXT,
+            chapter     TEXT,
+            subchapter  TEXT,
+            group_name  TEXT,
+            url         TEXT,
+            release_ts  INTEGER NOT NULL DEFAULT -1,
+            created_at  TEXT    NOT NULL DEFAULT (datetime('now')),
+            PRIMARY KEY (series_id, release_id)
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mu_releases_series_ts ON mu_releases (series_id, release_ts DESC)"
+    )
+
+    # historical migration guard
+    sql = _table_sql(con, "mu_releases")
+    if sql and "PRIMARY KEY" not in sql.upper():
+        cur.execute("ALTER TABLE mu_releases RENAME TO mu_releases_old")
+        cur.execute(
+            """
+            CREATE TABLE mu_releases (
+                series_id   TEXT    NOT NULL,
+                release_id  INTEGER NOT NULL,
+                title       TEXT,
+                raw_title   TEXT,
+                description TEXT,
+                volume      TEXT,
+                chapter     TEXT,
+                subchapter  TEXT,
+                group_name  TEXT,
+                url         TEXT,
+                release_ts  INTEGER NOT NULL DEFAULT -1,
+                created_at  TEXT    NOT NULL DEFAULT (datetime('now')),
+                PRIMARY KEY (series_id, release_id)
+            )
+            """
+        )
+        cur.execute(
+            """
+            INSERT OR IGNORE INTO mu_releases
+            (series_id, release_id, title, raw_title, description, volume, chapter, subchapter, group_name, url, release_ts, created_at)
+            SELECT series_id, release_id, title, raw_title, description, volume, chapter, subchapter, group_name, url, release_ts,
+                   COALESCE(created_at, datetime('now'))
+            FROM mu_releases_old
+            """
+        )
+        cur.execute("DROP TABLE mu_releases_old")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mu_releases_series_ts ON mu_releases (series_id, release_ts DESC)"
+        )
+
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mu_thread_series (
+            guild_id  INTEGER NOT NULL,
+            thread_id INTEGER NOT NULL,
+            series_id TEXT    NOT NULL,
+            PRIMARY KEY (guild_id, thread_id)
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mu_thread_series_series ON mu_thread_series (series_id)"
+    )
+
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS mu_thread_posts (
+            guild_id   INTEGER NOT NULL,
+            thread_id  INTEGER NOT NULL,
+            series_id  TEXT    NOT NULL,
+            release_id INTEGER NOT NULL,
+            posted_at  TEXT    NOT NULL DEFAULT (datetime('now')),
+            PRIMARY KEY (guild_id, thread_id, release_id)
+        )
+        """
+    )
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_mu_thread_posts_series ON mu_thread_posts (series_id)"
+    )
+
+    # ========== DROP unused legacy tables ==========
+    _drop_if_exists(
+        con,
+        (
+            # analytics / legacy we don't read
+            "collections",
+            "emoji_usage_monthly",
+            "gif_usage_monthly",
+            "sticker_usage_monthly",
+            "member_activity_apps_daily",
+            "member_activity_monthly",
+            "member_activity_total",
+            "member_channel_totals",
+            "member_hour_hist",
+            "member_metrics_daily",
+            "member_metrics_total",
+            "member_rpg_progress",
+            "movie_events",
+            "voice_minutes_day",
+            "voice_sessions",
+            "series",
+            "submissions",
+            # old polls stack (unused by current code)
+            "poll_votes",
+            "poll_options",
+            "polls",
+        ),
+    )
+
+
+# Each migration below applies its own copy of the schema as it shipped
+# (NAME_V<version>). The models' DDL keeps moving; pointing a shipped
+# migration at it would give a database that stopped partway through the
+# sequence today's tables early, and the later steps would then rewrite them.
+_MESSAGE_FACTS_V2 = """
+CREATE TABLE IF NOT EXISTS message_facts(
+  message_id  INTEGER PRIMARY KEY,
+  guild_id    INTEGER NOT NULL,
+  channel_id  INTEGER NOT NULL,
+  user_id     INTEGER NOT NULL,
+  created_utc TEXT    NOT NULL,          -- ISO8601 UTC
+  day         TEXT    NOT NULL,          -- 'YYYY-MM-DD' UTC
+  hour        TEXT    NOT NULL,          -- 'YYYY-MM-DDTHH' UTC
+  words       INTEGER NOT NULL DEFAULT 0,
+  is_reply    INTEGER NOT NULL DEFAULT 0,
+  mentions    INTEGER NOT NULL DEFAULT 0,
+  gifs        INTEGER NOT NULL DEFAULT 0,
+  rx_total    INTEGER NOT NULL DEFAULT 0,
+  rx_div      INTEGER NOT NULL DEFAULT 0,
+  url_msgs    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_msgfacts_gd ON message_facts(guild_id, day);
+CREATE INDEX IF NOT EXISTS idx_msgfacts_hour ON message_facts(guild_id, hour);
+CREATE INDEX IF NOT EXISTS idx_msgfacts_user_day ON message_facts(guild_id, user_id, day);
+CREATE INDEX IF NOT EXISTS idx_msgfacts_chan_day ON message_facts(guild_id, channel_id, day);
+"""
+
+_MESSAGE_DAILY_V2 = """
+CREATE TABLE IF NOT EXISTS message_metrics_daily(
+  guild_id     INTEGER NOT NULL,
+  user_id      INTEGER NOT NULL,
+  day          TEXT    NOT NULL,              -- 'YYYY-MM-DD' UTC
+  messages     INTEGER NOT NULL DEFAULT 0,
+  words        INTEGER NOT NULL DEFAULT 0,
+  replies      INTEGER NOT NULL DEFAULT 0,
+  mentions     INTEGER NOT NULL DEFAULT 0,
+  gifs         INTEGER NOT NULL DEFAULT 0,
+  reactions_rx INTEGER NOT NULL DEFAULT 0,
+  url_msgs     INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, user_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_msg_daily_gd ON message_metrics_daily(guild_id, day);
+"""
+
+_MESSAGE_CHANNEL_DAILY_V2 = """
+CREATE TABLE IF NOT EXISTS message_metrics_channel_daily(
+  guild_id   INTEGER NOT NULL,
+  channel_id INTEGER NOT NULL,
+  day        TEXT    NOT NULL,              -- 'YYYY-MM-DD' UTC
+  messages   INTEGER NOT NULL DEFAULT 0,
+  words      INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, channel_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_msg_ch_daily_gd ON message_metrics_channel_daily(guild_id, day);
+"""
+
+_MESSAGE_HOURLY_V2 = """
+CREATE TABLE IF NOT EXISTS message_metrics_hourly(
+  guild_id INTEGER NOT NULL,
+  hour     TEXT    NOT NULL,
+  messages INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, hour)
+);
+"""
+
+_USER_TOKEN_DAILY_V2 = """
+CREATE TABLE IF NOT EXISTS user_token_daily(
+  guild_id INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  day      TEXT    NOT NULL,
+  token    TEXT    NOT NULL,
+  PRIMARY KEY (guild_id, user_id, day, token)
+);
+CREATE INDEX IF NOT EXISTS idx_utd_gud ON user_token_daily(guild_id, user_id, day);
+"""
+
+_REACTION_HIST_DAILY_V2 = """
+CREATE TABLE IF NOT EXISTS reaction_hist_daily(
+  guild_id INTEGER NOT NULL,
+  day      TEXT    NOT NULL,
+  kind     TEXT    NOT NULL,      -- 'count' | 'diversity'
+  bucket   INTEGER NOT NULL,      -- 0..9 (9 means 9+)
+  n        INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, day, kind, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_rx_hist_gd ON reaction_hist_daily(guild_id, day);
+"""
+
+_CHANNEL_LAST_V2 = """
+CREATE TABLE IF NOT EXISTS channel_last_msg(
+  guild_id     INTEGER NOT NULL,
+  channel_id   INTEGER NOT NULL,
+  last_ts_utc  TEXT,
+  last_msg_id  INTEGER,
+  last_author  INTEGER,
+  PRIMARY KEY (guild_id, channel_id)
+);
+"""
+
+_LATENCY_HIST_DAILY_V2 = """
+CREATE TABLE IF NOT EXISTS latency_hist_daily(
+  guild_id   INTEGER NOT NULL,
+  channel_id INTEGER NOT NULL,
+  day        TEXT    NOT NULL,
+  bucket     INTEGER NOT NULL,
+  n          INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, channel_id, day, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_lat_hist_gd ON latency_hist_daily(guild_id, day);
+"""
+
+_THREAD_INDEX_V2 = """
+CREATE TABLE IF NOT EXISTS thread_index(
+  guild_id    INTEGER NOT NULL,
+  root_id     INTEGER NOT NULL,
+  started_utc TEXT    NOT NULL,
+  last_utc    TEXT    NOT NULL,
+  max_depth   INTEGER NOT NULL DEFAULT 0,
+  messages    INTEGER NOT NULL DEFAULT 1,
+  PRIMARY KEY (guild_id, root_id)
+);
+CREATE INDEX IF NOT EXISTS idx_thread_g ON thread_index(guild_id);
+"""
+
+_MESSAGE_THREAD_V2 = """
+CREATE TABLE IF NOT EXISTS message_thread(
+  guild_id    INTEGER NOT NULL,
+  message_id  INTEGER NOT NULL,
+  root_id     INTEGER NOT NULL,
+  parent_id   INTEGER,
+  depth       INTEGER NOT NULL,
+  created_utc TEXT NOT NULL,
+  channel_id  INTEGER NOT NULL,
+  PRIMARY KEY (guild_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_msgthread_root ON message_thread(guild_id, root_id);
+CREATE INDEX IF NOT EXISTS idx_msgthread_parent ON message_thread(guild_id, parent_id);
+"""
+
+_SENTIMENT_DAILY_V2 = """
+CREATE TABLE IF NOT EXISTS sentiment_daily(
+  guild_id INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  day      TEXT    NOT NULL,
+  n           INTEGER NOT NULL DEFAULT 0,
+  sum_compound REAL NOT NULL DEFAULT 0.0,
+  sum_pos      REAL NOT NULL DEFAULT 0.0,
+  sum_neg      REAL NOT NULL DEFAULT 0.0,
+  sum_neu      REAL NOT NULL DEFAULT 0.0,
+  PRIMARY KEY (guild_id, user_id, day)
+);
+CREATE INDEX IF NOT EXISTS idx_sent_gd ON sentiment_daily(guild_id, day);
+"""
+
+
+def _m002_activity_metrics(con: sqlite3.Connection) -> None:
+    for ddl in (
+        _MESSAGE_FACTS_V2,
+        _MESSAGE_DAILY_V2,
+        _MESSAGE_CHANNEL_DAILY_V2,
+        _MESSAGE_HOURLY_V2,
+        _USER_TOKEN_DAILY_V2,
+        _REACTION_HIST_DAILY_V2,
+        _CHANNEL_LAST_V2,
+        _LATENCY_HIST_DAILY_V2,
+        _THREAD_INDEX_V2,
+        _MESSAGE_THREAD_V2,
+        _SENTIMENT_DAILY_V2,
+    ):
+        exec_script(con, ddl)
+    # baseline created message_metrics_daily without url_msgs
+    _ensure_column(
+        con, "message_metrics_daily", "url_msgs", "INTEGER NOT NULL DEFAULT 0"
+    )
+
+
+_BIRTHDAYS_V3 = """
+CREATE TABLE IF NOT EXISTS birthdays (
+    guild_id            INTEGER NOT NULL,
+    user_id             INTEGER NOT NULL,
+    month               INTEGER NOT NULL CHECK (month BETWEEN 1 AND 12),
+    day                 INTEGER NOT NULL CHECK (day BETWEEN 1 AND 31),
+    tz                  TEXT NOT NULL,
+    last_congrats_year  INTEGER,
+    closeness_level     INTEGER,  -- 1..5; NULL -> default handling
+    PRIMARY KEY (guild_id, user_id)
+);
+"""
+
+_BIRTHDAYS_INDEX_V3 = """
+CREATE INDEX IF NOT EXISTS idx_birthdays_guild_month_day ON birthdays (guild_id, month, day);
+"""
+
+
+def _m003_birthdays(con: sqlite3.Connection) -> None:
+    exec_script(con, _BIRTHDAYS_V3)
+    exec_script(con, _BIRTHDAYS_INDEX_V3)
+    _ensure_column(con, "birthdays", "closeness_level", "INTEGER")
+
+
+_VOICE_SESSIONS_V4 = """
+CREATE TABLE IF NOT EXISTS voice_sessions (
+    session_id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id            INTEGER NOT NULL,
+    user_id             INTEGER NOT NULL,
+    channel_id          INTEGER NOT NULL,
+    join_time           TEXT NOT NULL,
+    leave_time          TEXT,
+    duration_seconds    INTEGER,
+    -- For backfilled data
+    join_message_id     INTEGER UNIQUE,
+    leave_message_id    INTEGER UNIQUE
+)
+"""
+
+_VOICE_SESSIONS_INDEX_V4 = """
+CREATE INDEX IF NOT EXISTS idx_voice_sessions_user ON
+voice_sessions (guild_id, user_id, join_time)
+"""
+
+
+def _m004_voice_sessions(con: sqlite3.Connection) -> None:
+    # The legacy voice_sessions table was dropped by the baseline; this is
+    # the current model's schema.
+    exec_script(con, _VOICE_SESSIONS_V4)
+    exec_script(con, _VOICE_SESSIONS_INDEX_V4)
+
+
+_CRAWL_CHECKPOINTS_V5 = """
+CREATE TABLE IF NOT EXISTS crawl_checkpoints (
+    job             TEXT    NOT NULL,   -- 'activity' | 'archive'
+    guild_id        INTEGER NOT NULL,
+    channel_id      INTEGER NOT NULL,   -- channel or thread
+    last_message_id INTEGER NOT NULL DEFAULT 0,  -- newest snowflake committed
+    since_id        INTEGER NOT NULL DEFAULT 0,  -- lower bound the crawl started from
+    complete        INTEGER NOT NULL DEFAULT 0,
+    updated_at      TEXT    NOT NULL,
+    PRIMARY KEY (job, guild_id, channel_id)
+) WITHOUT ROWID
+"""
+
+
+def _m005_crawl_checkpoints(con: sqlite3.Connection) -> None:
+    exec_script(con, _CRAWL_CHECKPOINTS_V5)
+
+
+_MESSAGE_ARCHIVE_FTS_V6 = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_archive_fts USING fts5(
+    content,
+    content='message_archive',
+    content_rowid='message_id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS message_archive_fts_ai AFTER INSERT ON message_archive BEGIN
+    INSERT INTO message_archive_fts(rowid, content) VALUES (new.message_id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS message_archive_fts_ad AFTER DELETE ON message_archive BEGIN
+    INSERT INTO message_archive_fts(message_archive_fts, rowid, content)
+    VALUES ('delete', old.message_id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS message_archive_fts_au AFTER UPDATE OF content ON message_archive
+WHEN old.content IS NOT new.content BEGIN
+    INSERT INTO message_archive_fts(message_archive_fts, rowid, content)
+    VALUES ('delete', old.message_id, old.content);
+    INSERT INTO message_archive_fts(rowid, content) VALUES (new.message_id, new.content);
+END;
+"""
+
+
+def _m006_message_archive_fts(con: sqlite3.Connection) -> None:
+    exec_script(con, _MESSAGE_ARCHIVE_FTS_V6)
+    # index what is already archived
+    con.execute(
+        "INSERT INTO message_archive_fts(message_archive_fts) VALUES ('rebuild')"
+    )
+
+
+# message_id is the INTEGER PRIMARY KEY, so every index entry already ends in
+# the snowflake: "guild/channel/author = ? AND message_id BETWEEN <snowflake
+# bounds>" is a range scan, with no copy of created_at in the index.
+_MESSAGE_ARCHIVE_INDEX_V7 = """
+CREATE INDEX IF NOT EXISTS idx_message_archive_guild ON message_archive (guild_id);
+CREATE INDEX IF NOT EXISTS idx_message_archive_channel ON message_archive (guild_id, channel_id);
+CREATE INDEX IF NOT EXISTS idx_message_archive_author_id ON message_archive (guild_id, author_id);
+"""
+
+_MESSAGE_FACTS_V7 = """
+CREATE TABLE IF NOT EXISTS message_facts(
+  message_id  INTEGER PRIMARY KEY,
+  guild_id    INTEGER NOT NULL,
+  channel_id  INTEGER NOT NULL,
+  user_id     INTEGER NOT NULL,
+  words       INTEGER NOT NULL DEFAULT 0,
+  is_reply    INTEGER NOT NULL DEFAULT 0,
+  mentions    INTEGER NOT NULL DEFAULT 0,
+  gifs        INTEGER NOT NULL DEFAULT 0,
+  rx_total    INTEGER NOT NULL DEFAULT 0,
+  rx_div      INTEGER NOT NULL DEFAULT 0,
+  url_msgs    INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_msgfacts_guild ON message_facts(guild_id);
+"""
+
+
+def _m007_snowflake_time_keys(con: sqlite3.Connection) -> None:
+    # message_archive: message_id (the rowid) is the time key; the old indexes
+    # carried a TEXT copy of created_at in every entry.
+    for name in (
+        "idx_message_archive_guild_channel",
+        "idx_message_archive_author",
+    ):
+        con.execute(f"DROP INDEX IF EXISTS {name}")
+    exec_script(con, _MESSAGE_ARCHIVE_INDEX_V7)
+
+    # message_facts: drop created_utc/day/hour (and their four indexes);
+    # day and hour are derived from the snowflake.
+    if "created_utc" in _columns(con, "message_facts"):
+        con.execute("ALTER TABLE message_facts RENAME TO message_facts_old")
+        for name in (
+            "idx_msgfacts_gd",
+            "idx_msgfacts_hour",
+            "idx_msgfacts_user_day",
+            "idx_msgfacts_chan_day",
+        ):
+            con.execute(f"DROP INDEX IF EXISTS {name}")
+        exec_script(con, _MESSAGE_FACTS_V7)
+        con.execute(
+            """
+            INSERT INTO message_facts
+              (message_id, guild_id, channel_id, user_id, words, is_reply,
+               mentions, gifs, rx_total, rx_div, url_msgs)
+            SELECT message_id, guild_id, channel_id, user_id, words, is_reply,
+                   mentions, gifs, rx_total, rx_div, url_msgs
+            FROM message_facts_old ORDER BY message_id
+            """
+        )
+        con.execute("DROP TABLE message_facts_old")
+    else:
+        exec_script(con, _MESSAGE_FACTS_V7)
+
+
+def _rebuild_table(
+    con: sqlite3.Connection, table: str, ddl: str, select_sql: str
+) -> None:
+    """
+    Recreate ``table`` from ``ddl`` and refill it with ``select_sql``, which
+    reads the old rows from ``{src}``. The old table's indexes are dropped.
+    """
+    src = f"{table}_old"
+    con.execute(f"ALTER TABLE {table} RENAME TO {src}")
+    for (name,) in con.execute(
+        "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+        (src,),
+    ).fetchall():
+        con.execute(f'DROP INDEX "{name}"')
+    exec_script(con, ddl)
+    con.execute(f"INSERT INTO {table} {select_sql.format(src=src)}")
+    con.execute(f"DROP TABLE {src}")
+
+
+# TEXT 'YYYY-MM-DD' / 'YYYY-MM-DDTHH' keys -> days / hours since the epoch
+_DAY_INT = "CAST(strftime('%s', day) AS INTEGER) / 86400"
+_HOUR_INT = "CAST(strftime('%s', hour || ':00') AS INTEGER) / 3600"
+_DAY_OK = "strftime('%s', day) IS NOT NULL"
+_HOUR_OK = "strftime('%s', hour || ':00') IS NOT NULL"
+
+
+# user_token_daily as migration 8 left it (migration 9 swaps token for token_id)
+_USER_TOKEN_DAILY_V8 = """
+CREATE TABLE IF NOT EXISTS user_token_daily(
+  guild_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  token    TEXT    NOT NULL,
+  PRIMARY KEY (guild_id, day, user_id, token)
+) WITHOUT ROWID;
+"""
+
+
+_MESSAGE_DAILY_V8 = """
+CREATE TABLE IF NOT EXISTS message_metrics_daily(
+  guild_id     INTEGER NOT NULL,
+  day          INTEGER NOT NULL,
+  user_id      INTEGER NOT NULL,
+  messages     INTEGER NOT NULL DEFAULT 0,
+  words        INTEGER NOT NULL DEFAULT 0,
+  replies      INTEGER NOT NULL DEFAULT 0,
+  mentions     INTEGER NOT NULL DEFAULT 0,
+  gifs         INTEGER NOT NULL DEFAULT 0,
+  reactions_rx INTEGER NOT NULL DEFAULT 0,
+  url_msgs     INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, day, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_msg_daily_user ON message_metrics_daily(guild_id, user_id, day);
+"""
+
+_MESSAGE_CHANNEL_DAILY_V8 = """
+CREATE TABLE IF NOT EXISTS message_metrics_channel_daily(
+  guild_id   INTEGER NOT NULL,
+  day        INTEGER NOT NULL,
+  channel_id INTEGER NOT NULL,
+  messages   INTEGER NOT NULL DEFAULT 0,
+  words      INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, day, channel_id)
+) WITHOUT ROWID;
+"""
+
+_MESSAGE_HOURLY_V8 = """
+CREATE TABLE IF NOT EXISTS message_metrics_hourly(
+  guild_id INTEGER NOT NULL,
+  hour     INTEGER NOT NULL,
+  messages INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, hour)
+) WITHOUT ROWID;
+"""
+
+_REACTION_HIST_DAILY_V8 = """
+CREATE TABLE IF NOT EXISTS reaction_hist_daily(
+  guild_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  kind     TEXT    NOT NULL,      -- 'count' | 'diversity'
+  bucket   INTEGER NOT NULL,      -- 0..9 (9 means 9+)
+  n        INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, day, kind, bucket)
+) WITHOUT ROWID;
+"""
+
+_LATENCY_HIST_DAILY_V8 = """
+CREATE TABLE IF NOT EXISTS latency_hist_daily(
+  guild_id   INTEGER NOT NULL,
+  day        INTEGER NOT NULL,
+  channel_id INTEGER NOT NULL,
+  bucket     INTEGER NOT NULL,
+  n          INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, day, channel_id, bucket)
+) WITHOUT ROWID;
+"""
+
+_SENTIMENT_DAILY_V8 = """
+CREATE TABLE IF NOT EXISTS sentiment_daily(
+  guild_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  n           INTEGER NOT NULL DEFAULT 0,
+  sum_compound REAL NOT NULL DEFAULT 0.0,
+  sum_pos      REAL NOT NULL DEFAULT 0.0,
+  sum_neg      REAL NOT NULL DEFAULT 0.0,
+  sum_neu      REAL NOT NULL DEFAULT 0.0,
+  PRIMARY KEY (guild_id, day, user_id)
+) WITHOUT ROWID;
+"""
+
+
+def _m008_compact_rollups(con: sqlite3.Connection) -> None:
+    tables = (
+        (
+            "message_metrics_daily",
+            _MESSAGE_DAILY_V8,
+            f"SELECT guild_id, {_DAY_INT}, user_id, messages, words, replies, mentions, "
+            f"gifs, reactions_rx, url_msgs FROM {{src}} WHERE {_DAY_OK} ORDER BY 1, 2, 3",
+        ),
+        (
+            "message_metrics_channel_daily",
+            _MESSAGE_CHANNEL_DAILY_V8,
+            f"SELECT guild_id, {_DAY_INT}, channel_id, messages, words "
+            f"FROM {{src}} WHERE {_DAY_OK} ORDER BY 1, 2, 3",
+        ),
+        (
+            "message_metrics_hourly",
+            _MESSAGE_HOURLY_V8,
+            f"SELECT guild_id, {_HOUR_INT}, messages FROM {{src}} WHERE {_HOUR_OK} ORDER BY 1, 2",
+        ),
+        (
+            "user_token_daily",
+            _USER_TOKEN_DAILY_V8,
+            f"SELECT guild_id, {_DAY_INT}, user_id, token FROM {{src}} "
+            f"WHERE {_DAY_OK} ORDER BY 1, 2, 3, 4",
+        ),
+        (
+            "reaction_hist_daily",
+            _REACTION_HIST_DAILY_V8,
+            f"SELECT guild_id, {_DAY_INT}, kind, bucket, n FROM {{src}} "
+            f"WHERE {_DAY_OK} ORDER BY 1, 2, 3, 4",
+        ),
+        (
+            "latency_hist_daily",
+            _LATENCY_HIST_DAILY_V8,
+            f"SELECT guild_id, {_DAY_INT}, channel_id, bucket, n FROM {{src}} "
+            f"WHERE {_DAY_OK} ORDER BY 1, 2, 3, 4",
+        ),
+        (
+            "sentiment_daily",
+            _SENTIMENT_DAILY_V8,
+            f"SELECT guild_id, {_DAY_INT}, user_id, n, sum_compound, sum_pos, sum_neg, "
+            f"sum_neu FROM {{src}} WHERE {_DAY_OK} ORDER BY 1, 2, 3",
+        ),
+    )
+    for table, ddl, select_sql in tables:
+        sql = _table_sql(con, table)
+        if sql is None:
+            exec_script(con, ddl)
+        elif "WITHOUT ROWID" not in sql.upper():
+            _rebuild_table(con, table, ddl, select_sql)
+    # baseline duplicate of the message_metrics_daily primary key
+    con.execute("DROP INDEX IF EXISTS idx_msg_metrics_gud")
+
+
+_TOKENS_V9 = """
+CREATE TABLE IF NOT EXISTS tokens (
+    id   INTEGER PRIMARY KEY,
+    text TEXT    NOT NULL UNIQUE
+)
+"""
+
+_USER_TOKEN_DAILY_V9 = """
+CREATE TABLE IF NOT EXISTS user_token_daily(
+  guild_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  token_id INTEGER NOT NULL,
+  PRIMARY KEY (guild_id, day, user_id, token_id)
+) WITHOUT ROWID;
+"""
+
+
+def _m009_token_dictionary(con: sqlite3.Connection) -> None:
+    exec_script(con, _TOKENS_V9)
+    if "token" not in _columns(con, "user_token_daily"):
+        return
+    # intern every distinct token once, then swap the text for its id
+    con.execute(
+        "INSERT OR IGNORE INTO tokens(text) "
+        "SELECT DISTINCT token FROM user_token_daily ORDER BY token"
+    )
+    _rebuild_table(
+        con,
+        "user_token_daily",
+        _USER_TOKEN_DAILY_V9,
+        "SELECT u.guild_id, u.day, u.user_id, t.id FROM {src} u "
+        "JOIN tokens t ON t.text = u.token ORDER BY 1, 2, 3, 4",
+    )
+
+
+_USER_TOKEN_HLL_V10 = """
+CREATE TABLE IF NOT EXISTS user_token_hll(
+  guild_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  regs     BLOB    NOT NULL,
+  PRIMARY KEY (guild_id, day, user_id)
+) WITHOUT ROWID;
+"""
+
+
+def _m010_token_sketches(con: sqlite3.Connection) -> None:
+    exec_script(con, _USER_TOKEN_HLL_V10)
+    if con.execute("SELECT 1 FROM user_token_hll LIMIT 1").fetchone():
+        return
+    # seed the sketches from the exact vocabulary so either TTR mode works
+    # on existing history
+    rows = con.execute(
+        "SELECT u.guild_id, u.day, u.user_id, t.text FROM user_token_daily u "
+        "JOIN tokens t ON t.id = u.token_id ORDER BY 1, 2, 3"
+    )
+    con.executemany(
+        "INSERT INTO user_token_hll(guild_id, day, user_id, regs) VALUES (?, ?, ?, ?)",
+        (
+            (*key, analytics.hll.encode(analytics.hll.registers(r[3] for r in group)))
+            for key, group in groupby(rows.fetchall(), key=lambda r: r[:3])
+        ),
+    )
+
+
+_MEMBER_INDEX_V11 = """
+CREATE TABLE IF NOT EXISTS member_index(
+  guild_id INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  idx      INTEGER NOT NULL,
+  PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_member_index_idx ON member_index(guild_id, idx);
+"""
+
+_ACTIVE_DAILY_V11 = """
+CREATE TABLE IF NOT EXISTS active_daily(
+  guild_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  bits     BLOB    NOT NULL,
+  PRIMARY KEY (guild_id, day)
+) WITHOUT ROWID;
+"""
+
+
+def _m011_active_bitmaps(con: sqlite3.Connection) -> None:
+    exec_script(con, _MEMBER_INDEX_V11)
+    exec_script(con, _ACTIVE_DAILY_V11)
+    if con.execute("SELECT 1 FROM active_daily LIMIT 1").fetchone():
+        return
+    # indexes in order of first activity, then one bitmap per (guild, day)
+    con.execute(
+        """
+        INSERT INTO member_index(guild_id, user_id, idx)
+        SELECT guild_id, user_id,
+               ROW_NUMBER() OVER (PARTITION BY guild_id ORDER BY first_day, user_id) - 1
+        FROM (
+          SELECT guild_id, user_id, MIN(day) AS first_day
+          FROM message_metrics_daily WHERE messages > 0
+          GROUP BY guild_id, user_id
+        )
+        """
+    )
+    rows = con.execute(
+        """
+        SELECT d.guild_id, d.day, m.idx
+        FROM message_metrics_daily d
+        JOIN member_index m ON m.guild_id = d.guild_id AND m.user_id = d.user_id
+        WHERE d.messages > 0
+        ORDER BY 1, 2
+        """
+    ).fetchall()
+    con.executemany(
+        "INSERT INTO active_daily(guild_id, day, bits) VALUES (?, ?, ?)",
+        (
+            (*key, analytics.bitmaps.from_indexes(r[2] for r in group))
+            for key, group in groupby(rows, key=lambda r: r[:2])
+        ),
+    )
+
+
+_THREAD_INDEX_V12 = """
+CREATE TABLE IF NOT EXISTS thread_index(
+  guild_id  INTEGER NOT NULL,
+  root_id   INTEGER NOT NULL,
+  last_id   INTEGER NOT NULL,
+  max_depth INTEGER NOT NULL,
+  replies   INTEGER NOT NULL,
+  PRIMARY KEY (guild_id, root_id)
+) WITHOUT ROWID;
+"""
+
+_MESSAGE_THREAD_V12 = """
+CREATE TABLE IF NOT EXISTS message_thread(
+  guild_id   INTEGER NOT NULL,
+  message_id INTEGER NOT NULL,
+  root_id    INTEGER NOT NULL,
+  parent_id  INTEGER NOT NULL,
+  depth      INTEGER NOT NULL,
+  PRIMARY KEY (guild_id, message_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_msgthread_root ON message_thread(guild_id, root_id);
+"""
+
+
+def _m012_reply_threads(con: sqlite3.Connection) -> None:
+    # The old thread tables (text timestamps) were created but never written;
+    # replace them with the snowflake-keyed layout. Backfill is
+    # yuribot.tools.rebuild_metrics --threads (or any archive rebuild).
+    if "started_utc" in _columns(con, "thread_index"):
+        con.execute("DROP TABLE thread_index")
+    if "created_utc" in _columns(con, "message_thread"):
+        con.execute("DROP TABLE message_thread")
+    exec_script(con, _THREAD_INDEX_V12)
+    exec_script(con, _MESSAGE_THREAD_V12)
+
+
+_MESSAGE_GUILD_DAILY_V13 = """
+CREATE TABLE IF NOT EXISTS message_metrics_guild_daily(
+  guild_id     INTEGER NOT NULL,
+  day          INTEGER NOT NULL,
+  messages     INTEGER NOT NULL DEFAULT 0,
+  words        INTEGER NOT NULL DEFAULT 0,
+  active_hours INTEGER NOT NULL DEFAULT 0,
+  hour_sq      INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, day)
+) WITHOUT ROWID;
+"""
+
+_MESSAGE_DOWHOUR_MONTHLY_V13 = """
+CREATE TABLE IF NOT EXISTS message_metrics_dowhour_monthly(
+  guild_id INTEGER NOT NULL,
+  month    INTEGER NOT NULL,
+  slots    BLOB    NOT NULL,
+  PRIMARY KEY (guild_id, month)
+) WITHOUT ROWID;
+"""
+
+
+def _m013_rollup_tiers(con: sqlite3.Connection) -> None:
+    exec_script(con, _MESSAGE_GUILD_DAILY_V13)
+    exec_script(con, _MESSAGE_DOWHOUR_MONTHLY_V13)
+    # backfill both tiers from the hourly and daily rollups, as
+    # activity_metrics._refresh_tiers did over all days
+    for (gid,) in con.execute(
+        "SELECT DISTINCT guild_id FROM message_metrics_hourly"
+    ).fetchall():
+        con.execute("DELETE FROM message_metrics_guild_daily WHERE guild_id=?", (gid,))
+        con.execute(
+            """
+            INSERT INTO message_metrics_guild_daily
+              (guild_id, day, messages, words, active_hours, hour_sq)
+            SELECT d.guild_id, d.day, d.m, d.w, COALESCE(h.n, 0), COALESCE(h.sq, 0)
+            FROM (
+              SELECT guild_id, day, SUM(messages) AS m, SUM(words) AS w
+              FROM message_metrics_daily
+              WHERE guild_id = ?1
+              GROUP BY guild_id, day
+            ) d
+            LEFT JOIN (
+              SELECT hour / 24 AS day, COUNT(*) AS n, SUM(messages * messages) AS sq
+              FROM message_metrics_hourly
+              WHERE guild_id = ?1
+              GROUP BY hour / 24
+            ) h ON h.day = d.day
+            """,
+            (gid,),
+        )
+        con.execute("DELETE FROM message_metrics_dowhour_monthly WHERE guild_id=?", (gid,))
+        rows = con.execute(
+            "SELECT hour, messages FROM message_metrics_hourly WHERE guild_id=?", (gid,)
+        ).fetchall()
+        if rows:
+            hours, counts = zip(*rows)
+            con.executemany(
+                "INSERT INTO message_metrics_dowhour_monthly(guild_id, month, slots) VALUES(?,?,?)",
+                [
+                    (gid, month, analytics.encode_slots(slots))
+                    for month, slots in analytics.month_slot_totals(hours, counts).items()
+                ],
+            )
+
+
+_USER_TOTALS_V14 = """
+CREATE TABLE IF NOT EXISTS user_totals(
+  guild_id     INTEGER NOT NULL,
+  user_id      INTEGER NOT NULL,
+  messages     INTEGER NOT NULL DEFAULT 0,
+  words        INTEGER NOT NULL DEFAULT 0,
+  replies      INTEGER NOT NULL DEFAULT 0,
+  mentions     INTEGER NOT NULL DEFAULT 0,
+  gifs         INTEGER NOT NULL DEFAULT 0,
+  reactions_rx INTEGER NOT NULL DEFAULT 0,
+  url_msgs     INTEGER NOT NULL DEFAULT 0,
+  active_days  INTEGER NOT NULL DEFAULT 0,
+  first_day    INTEGER,
+  last_day     INTEGER,
+  PRIMARY KEY (guild_id, user_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_user_totals_messages ON user_totals(guild_id, messages);
+CREATE INDEX IF NOT EXISTS idx_user_totals_words ON user_totals(guild_id, words);
+CREATE INDEX IF NOT EXISTS idx_user_totals_replies ON user_totals(guild_id, replies);
+CREATE INDEX IF NOT EXISTS idx_user_totals_mentions ON user_totals(guild_id, mentions);
+CREATE INDEX IF NOT EXISTS idx_user_totals_gifs ON user_totals(guild_id, gifs);
+CREATE INDEX IF NOT EXISTS idx_user_totals_reactions_rx ON user_totals(guild_id, reactions_rx);
+CREATE INDEX IF NOT EXISTS idx_user_totals_url_msgs ON user_totals(guild_id, url_msgs);
+CREATE INDEX IF NOT EXISTS idx_user_totals_active_days ON user_totals(guild_id, active_days);
+"""
+
+
+def _m014_user_totals(con: sqlite3.Connection) -> None:
+    exec_script(con, _USER_TOTALS_V14)
+    # lifetime sums of message_metrics_daily, as activity_metrics._refresh_user_totals
+    con.execute("DELETE FROM user_totals")
+    con.execute(
+        """
+        INSERT INTO user_totals
+          (guild_id,user_id,messages,words,replies,mentions,gifs,reactions_rx,url_msgs,
+           active_days,first_day,last_day)
+        SELECT guild_id, user_id, SUM(messages), SUM(words), SUM(replies), SUM(mentions),
+               SUM(gifs), SUM(reactions_rx), SUM(url_msgs), COUNT(*), MIN(day), MAX(day)
+        FROM message_metrics_daily
+        GROUP BY guild_id, user_id
+        """
+    )
+
+
+_MESSAGE_USER_HOURLY_V15 = """
+CREATE TABLE IF NOT EXISTS message_metrics_user_hourly(
+  guild_id INTEGER NOT NULL,
+  user_id  INTEGER NOT NULL,
+  hour     INTEGER NOT NULL,
+  messages INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (guild_id, user_id, hour)
+) WITHOUT ROWID;
+"""
+
+
+def _m015_user_hourly(con: sqlite3.Connection) -> None:
+    exec_script(con, _MESSAGE_USER_HOURLY_V15)
+    # hour from the snowflake, as activity_metrics.FACT_HOUR_SQL was
+    con.execute(
+        """
+        INSERT OR IGNORE INTO message_metrics_user_hourly(guild_id, user_id, hour, messages)
+        SELECT guild_id, user_id, (((message_id >> 22) + 1420070400000) / 3600000) AS hour, COUNT(*)
+        FROM message_facts
+        GROUP BY guild_id, user_id, hour
+        """
+    )
+
+
+_ACTIVE_EVER_V16 = """
+CREATE TABLE IF NOT EXISTS active_ever(
+  guild_id INTEGER NOT NULL,
+  month    INTEGER NOT NULL,
+  bits     BLOB    NOT NULL,
+  PRIMARY KEY (guild_id, month)
+) WITHOUT ROWID;
+"""
+
+
+def _m016_active_ever(con: sqlite3.Connection) -> None:
+    exec_script(con, _ACTIVE_EVER_V16)
+    # running OR of each guild's active_daily rows, sampled at month ends
+    for (gid,) in con.execute("SELECT DISTINCT guild_id FROM active_daily").fetchall():
+        con.execute("DELETE FROM active_ever WHERE guild_id=?", (gid,))
+        rows = con.execute(
+            "SELECT day, bits FROM active_daily WHERE guild_id=? ORDER BY day", (gid,)
+        ).fetchall()
+        days, blobs = zip(*rows)
+        con.executemany(
+            "INSERT INTO active_ever(guild_id, month, bits) VALUES (?, ?, ?)",
+            [(gid, m, b) for m, b in analytics.bitmaps.month_unions(days, blobs).items()],
+        )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "baseline", _m001_baseline),
+    Migration(2, "activity_metrics", _m002_activity_metrics),
+    Migration(3, "birthdays", _m003_birthdays),
+    Migration(4, "voice_sessions", _m004_voice_sessions),
+    Migration(5, "crawl_checkpoints", _m005_crawl_checkpoints),
+    Migration(6, "message_archive_fts", _m006_message_archive_fts),
+    Migration(7, "snowflake_time_keys", _m007_snowflake_time_keys),
+    Migration(8, "compact_rollups", _m008_compact_rollups),
+    Migration(9, "token_dictionary", _m009_token_dictionary),
+    Migration(10, "token_sketches", _m010_token_sketches),
+    Migration(11, "active_bitmaps", _m011_active_bitmaps),
+    Migration(12, "reply_threads", _m012_reply_threads),
+    Migration(13, "rollup_tiers", _m013_rollup_tiers),
+    Migration(14, "user_totals", _m014_user_totals),
+    Migration(15, "user_hourly", _m015_user_hourly),
+    Migration(16, "active_ever", _m016_active_ever),
+]
+
+
+# ----------------------------
+# Runner
+# ----------------------------
+_DDL_SCHEMA_MIGRATIONS = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version     INTEGER PRIMARY KEY,
+    name        TEXT    NOT NULL,
+    fingerprint TEXT    NOT NULL,
+    applied_at  TEXT    NOT NULL,
+    duration_ms REAL    NOT NULL DEFAULT 0
+)
+"""
+
+
+def fingerprint(upto: Optional[int] = None) -> str:
+    """Hash of the registry (version + name) up to and including ``upto``."""
+    h = hashlib.sha256()
+    for m in MIGRATIONS:
+        if upto is not None and m.version > upto:
+            break
+        h.update(f"{m.version}:{m.name}\n".encode())
+    return h.hexdigest()[:16]
+
+
+def _head(con: sqlite3.Connection) -> Tuple[int, Optional[str]]:
+    try:
+        row = con.execute(
+            "SELECT version, fingerprint FROM schema_migrations ORDER BY version DESC LIMIT 1"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0, None  # table not created yet
+    return (int(row[0]), row[1]) if row else (0, None)
+
+
+def migrate(con: sqlite3.Connection) -> int:
+    """
+    Apply pending migrations. ``con`` must be in autocommit mode
+    (``isolation_level=None``). Returns the number of migrations applied.
+    """
+    latest = MIGRATIONS[-1].version
+    version, fp = _head(con)
+    if version == latest and fp == fingerprint(latest):
+        return 0  # fast path: schema is current
+    if version > latest:
+        log.warning(
+            "schema.ahead db_version=%d code_version=%d", version, latest
+        )
+        return 0
+    if version and fp != fingerprint(version):
+        log.warning(
+            "schema.fingerprint_mismatch version=%d recorded=%s expected=%s",
+            version,
+            fp,
+            fingerprint(version),
+        )
+
+    con.execute(_DDL_SCHEMA_MIGRATIONS)
+    applied = 0
+    for m in MIGRATIONS:
+        if m.version <= version:
+            continue
+        started = time.perf_counter()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            m.apply(con)
+            ms = (time.perf_counter() - started) * 1000.0
+            con.execute(
+                "INSERT OR REPLACE INTO schema_migrations (version, name, fingerprint, applied_at, duration_ms) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    m.version,
+                    m.name,
+                    fingerprint(m.version),
+                    datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    ms,
+                ),
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            log.exception("schema.migration_failed version=%d name=%s", m.version, m.name)
+            raise
+        applied += 1
+        log.info("schema.migrated version=%d name=%s ms=%.1f", m.version, m.name, ms)
+    return applied
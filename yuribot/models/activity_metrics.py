@@ -2,20 +2,39 @@ from __future__ import annotations
 
 import datetime as dt
 import json
+import logging
 import math
 import os
 import re
 import sqlite3
-from collections import defaultdict
+import threading
+import time
+from collections import OrderedDict, defaultdict
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import analytics
+import numpy as np
+from analytics.keys import day_num, day_str, hour_num, hour_str
+from shared.schema import TOP_STATS
+
+log = logging.getLogger(__name__)
 
 # Prefer project's DB connector if available; otherwise fall back to local sqlite.
 try:
-    from .db import connect as _project_connect  # type: ignore
+    from ..db import connect as _project_connect  # type: ignore
 except Exception:  # pragma: no cover
     _project_connect = None
 
+from ..db import WriteBuffer, env_int, register_functions
+from ..utils import bitmaps, hll
+from . import tokens as _tokens
+from .common import (
+    DISCORD_EPOCH_MS,
+    snowflake_day_range,
+    snowflake_time_ms,
+)
+
 
 def _fallback_connect() -> sqlite3.Connection:
     db_path = os.getenv("BOT_DB_PATH") or os.path.join(
@@ -24,11 +43,14 @@ def _fallback_connect() -> sqlite3.Connection:
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
     con = sqlite3.connect(db_path, isolation_level=None)
     con.row_factory = sqlite3.Row
+    register_functions(con)
     return con
 
 
-def connect() -> sqlite3.Connection:
-    con = _project_connect() if _project_connect else _fallback_connect()
+def connect(*, readonly: bool = False) -> sqlite3.Connection:
+    con = (
+        _project_connect(readonly=readonly) if _project_connect else _fallback_connect()
+    )
     try:
         con.row_factory = (
             sqlite3.Row
@@ -48,201 +70,44 @@ if os.getenv("DEBUG_SQL") == "1":
 # ────────────────────────────────
 # Schema (compact, append/upsert-friendly)
 # ────────────────────────────────
-DDL_MESSAGE_FACTS = """
-CREATE TABLE IF NOT EXISTS message_facts(
-  message_id  INTEGER PRIMARY KEY,
-  guild_id    INTEGER NOT NULL,
-  channel_id  INTEGER NOT NULL,
-  user_id     INTEGER NOT NULL,
-  created_utc TEXT    NOT NULL,          -- ISO8601 UTC
-  day         TEXT    NOT NULL,          -- 'YYYY-MM-DD' UTC
-  hour        TEXT    NOT NULL,          -- 'YYYY-MM-DDTHH' UTC
-  words       INTEGER NOT NULL DEFAULT 0,
-  is_reply    INTEGER NOT NULL DEFAULT 0,
-  mentions    INTEGER NOT NULL DEFAULT 0,
-  gifs        INTEGER NOT NULL DEFAULT 0,
-  rx_total    INTEGER NOT NULL DEFAULT 0,
-  rx_div      INTEGER NOT NULL DEFAULT 0,
-  url_msgs    INTEGER NOT NULL DEFAULT 0
-);
-CREATE INDEX IF NOT EXISTS idx_msgfacts_gd ON message_facts(guild_id, day);
-CREATE INDEX IF NOT EXISTS idx_msgfacts_hour ON message_facts(guild_id, hour);
-CREATE INDEX IF NOT EXISTS idx_msgfacts_user_day ON message_facts(guild_id, user_id, day);
-CREATE INDEX IF NOT EXISTS idx_msgfacts_chan_day ON message_facts(guild_id, channel_id, day);
-"""
-
-DDL_MESSAGE_DAILY = """
-CREATE TABLE IF NOT EXISTS message_metrics_daily(
-  guild_id     INTEGER NOT NULL,
-  user_id      INTEGER NOT NULL,
-  day          TEXT    NOT NULL,              -- 'YYYY-MM-DD' UTC
-  messages     INTEGER NOT NULL DEFAULT 0,
-  words        INTEGER NOT NULL DEFAULT 0,
-  replies      INTEGER NOT NULL DEFAULT 0,
-  mentions     INTEGER NOT NULL DEFAULT 0,
-  gifs         INTEGER NOT NULL DEFAULT 0,
-  reactions_rx INTEGER NOT NULL DEFAULT 0,
-  url_msgs     INTEGER NOT NULL DEFAULT 0,
-  PRIMARY KEY (guild_id, user_id, day)
-);
-CREATE INDEX IF NOT EXISTS idx_msg_daily_gd ON message_metrics_daily(guild_id, day);
-"""
-DDL_MESSAGE_CHANNEL_DAILY = """
-CREATE TABLE IF NOT EXISTS message_metrics_channel_daily(
-  guild_id   INTEGER NOT NULL,
-  channel_id INTEGER NOT NULL,
-  day        TEXT    NOT NULL,              -- 'YYYY-MM-DD' UTC
-  messages   INTEGER NOT NULL DEFAULT 0,
-  words      INTEGER NOT NULL DEFAULT 0,
-  PRIMARY KEY (guild_id, channel_id, day)
-);
-CREATE INDEX IF NOT EXISTS idx_msg_ch_daily_gd ON message_metrics_channel_daily(guild_id, day);
-"""
-# Hourly message count per guild for heatmap/bursts/silence ratio
-# hour is truncated UTC hour: 'YYYY-MM-DDTHH'
-DDL_MESSAGE_HOURLY = """
-CREATE TABLE IF NOT EXISTS message_metrics_hourly(
-  guild_id INTEGER NOT NULL,
-  hour     TEXT    NOT NULL,
-  messages INTEGER NOT NULL DEFAULT 0,
-  PRIMARY KEY (guild_id, hour)
-);
-"""
-
-# Per-user/day vocabulary (type set) for lexical diversity
-DDL_USER_TOKEN_DAILY = """
-CREATE TABLE IF NOT EXISTS user_token_daily(
-  guild_id INTEGER NOT NULL,
-  user_id  INTEGER NOT NULL,
-  day      TEXT    NOT NULL,
-  token    TEXT    NOT NULL,
-  PRIMARY KEY (guild_id, user_id, day, token)
-);
-CREATE INDEX IF NOT EXISTS idx_utd_gud ON user_token_daily(guild_id, user_id, day);
-"""
-
-# Reaction histograms (bucketed) per day (kind = 'count' | 'diversity')
-# Buckets 0..9 where 9 == 9+
-DDL_REACTION_HIST_DAILY = """
-CREATE TABLE IF NOT EXISTS reaction_hist_daily(
-  guild_id INTEGER NOT NULL,
-  day      TEXT    NOT NULL,
-  kind     TEXT    NOT NULL,      -- 'count' | 'diversity'
-  bucket   INTEGER NOT NULL,      -- 0..9 (9 means 9+)
-  n        INTEGER NOT NULL DEFAULT 0,
-  PRIMARY KEY (guild_id, day, kind, bucket)
-);
-CREATE INDEX IF NOT EXISTS idx_rx_hist_gd ON reaction_hist_daily(guild_id, day);
-"""
-
-# Per-channel last message timestamp for online response-gap
-DDL_CHANNEL_LAST = """
-CREATE TABLE IF NOT EXISTS channel_last_msg(
-  guild_id     INTEGER NOT NULL,
-  channel_id   INTEGER NOT NULL,
-  last_ts_utc  TEXT,
-  last_msg_id  INTEGER,
-  last_author  INTEGER,
-  PRIMARY KEY (guild_id, channel_id)
-);
-"""
-
-# Response latency histogram per day per channel (log2-bucketed milliseconds)
-# bucket 0: <1ms..1ms, 1:[1,2), 2:[2,4), … 20: >= 2^20 ms
-DDL_LATENCY_HIST_DAILY = """
-CREATE TABLE IF NOT EXISTS latency_hist_daily(
-  guild_id   INTEGER NOT NULL,
-  channel_id INTEGER NOT NULL,
-  day        TEXT    NOT NULL,
-  bucket     INTEGER NOT NULL,
-  n          INTEGER NOT NULL DEFAULT 0,
-  PRIMARY KEY (guild_id, channel_id, day, bucket)
-);
-CREATE INDEX IF NOT EXISTS idx_lat_hist_gd ON latency_hist_daily(guild_id, day);
-"""
-
-# Reply-chain index for thread lifespan/depth
-DDL_THREAD_INDEX = """
-CREATE TABLE IF NOT EXISTS thread_index(
-  guild_id    INTEGER NOT NULL,
-  root_id     INTEGER NOT NULL,
-  started_utc TEXT    NOT NULL,
-  last_utc    TEXT    NOT NULL,
-  max_depth   INTEGER NOT NULL DEFAULT 0,
-  messages    INTEGER NOT NULL DEFAULT 1,
-  PRIMARY KEY (guild_id, root_id)
-);
-CREATE INDEX IF NOT EXISTS idx_thread_g ON thread_index(guild_id);
-"""
-
-# Map each message to its thread root & depth
-DDL_MESSAGE_THREAD = """
-CREATE TABLE IF NOT EXISTS message_thread(
-  guild_id    INTEGER NOT NULL,
-  message_id  INTEGER NOT NULL,
-  root_id     INTEGER NOT NULL,
-  parent_id   INTEGER,
-  depth       INTEGER NOT NULL,
-  created_utc TEXT NOT NULL,
-  channel_id  INTEGER NOT NULL,
-  PRIMARY KEY (guild_id, message_id)
-);
-CREATE INDEX IF NOT EXISTS idx_msgthread_root ON message_thread(guild_id, root_id);
-CREATE INDEX IF NOT EXISTS idx_msgthread_parent ON message_thread(guild_id, parent_id);
-"""
-
-# Optional: per-user/day sentiment aggregates (VADER)
-DDL_SENTIMENT_DAILY = """
-CREATE TABLE IF NOT EXISTS sentiment_daily(
-  guild_id INTEGER NOT NULL,
-  user_id  INTEGER NOT NULL,
-  day      TEXT    NOT NULL,
-  n           INTEGER NOT NULL DEFAULT 0,
-  sum_compound REAL NOT NULL DEFAULT 0.0,
-  sum_pos      REAL NOT NULL DEFAULT 0.0,
-  sum_neg      REAL NOT NULL DEFAULT 0.0,
-  sum_neu      REAL NOT NULL DEFAULT 0.0,
-  PRIMARY KEY (guild_id, user_id, day)
-);
-CREATE INDEX IF NOT EXISTS idx_sent_gd ON sentiment_daily(guild_id, day);
-"""
-
-
-def ensure_tables() -> None:
-    con = connect()
-    try:
-        cur = con.cursor()
-        for ddl in (
-            DDL_MESSAGE_FACTS,
-            DDL_MESSAGE_DAILY,
-            DDL_MESSAGE_CHANNEL_DAILY,
-            DDL_MESSAGE_HOURLY,
-            DDL_USER_TOKEN_DAILY,
-            DDL_REACTION_HIST_DAILY,
-            DDL_CHANNEL_LAST,
-            DDL_LATENCY_HIST_DAILY,
-            DDL_THREAD_INDEX,
-            DDL_MESSAGE_THREAD,
-            DDL_SENTIMENT_DAILY,
-        ):
-            cur.executescript(ddl)
-
-        # --- migrations ---
-        # 1) message_metrics_daily.url_msgs
-        cols = {
-            row[1]
-            for row in cur.execute(
-                "PRAGMA table_info(message_metrics_daily)"
-            ).fetchall()
-        }
-        if "url_msgs" not in cols:
-            cur.execute(
-                "ALTER TABLE message_metrics_daily ADD COLUMN url_msgs INTEGER NOT NULL DEFAULT 0"
-            )
-
-        con.commit()
-    finally:
-        con.close()
+# The DDL lives in yuribot.migrations; the newest migration that touches a
+# table has its current shape. Layout notes:
+#
+# message_facts: message_id is the Discord snowflake and the rowid. It orders
+#   facts by time and every index entry ends in it, so "guild_id=? AND
+#   message_id BETWEEN <snowflake bounds>" is a pure range scan. Day/hour
+#   keys are derived from it (FACT_DAY_SQL / FACT_HOUR_SQL), not stored.
+# Rollups are WITHOUT ROWID tables clustered on their primary key, with
+#   integer time keys: ``day`` counts UTC days since 1970-01-01 and ``hour``
+#   UTC hours since the epoch (see day_num / hour_num). Keys lead with
+#   (guild_id, day) so a window is one contiguous range of the table itself.
+# message_metrics_user_hourly: user before hour, so one member's window is a
+#   single range (personal-scope temporal stats).
+# user_totals: lifetime per-user sums of message_metrics_daily, kept at
+#   ingest for leaderboards; one (guild_id, stat) index per TOP_STATS column
+#   makes a top-K a short reverse index walk.
+# message_metrics_guild_daily / message_metrics_dowhour_monthly: coarser
+#   tiers kept in step by write_facts and re-derived by _refresh_tiers. Guild
+#   totals per day carry the hours with messages and the sum of squared
+#   hourly counts (silence and within-day std need no hourly rows); months
+#   hold a weekday x hour blob (analytics.tiers).
+# user_token_daily: per-user/day vocabulary, token_id -> tokens.id.
+#   user_token_hll holds the same vocabulary as HyperLogLog sketches,
+#   written in every TTR mode so switching to hll serves complete history.
+# member_index: stable per-guild user -> dense bit index, handed out in order
+#   of first sight and never reused, so an active_daily bitmap stays valid
+#   however old it is. active_ever holds everyone active up to the end of
+#   each month, so "seen before day X" is one row plus at most a month of
+#   active_daily.
+# reaction_hist_daily: buckets 0..9 (9 means 9+), kind 'count' | 'diversity'.
+# latency_hist_daily: log2-bucketed milliseconds per channel and day;
+#   bucket 0: <=1ms, 1: [1,2), 2: [2,4), ... 20: >= 2^20 ms.
+# thread_index: one row per reply-chain root spanning root_id..last_id;
+#   always message_thread (each reply's root and depth >= 1) grouped by root.
+
+_FACT_MS_SQL = f"((message_id >> 22) + {DISCORD_EPOCH_MS})"
+FACT_DAY_SQL = f"({_FACT_MS_SQL} / 86400000)"
+FACT_HOUR_SQL = f"({_FACT_MS_SQL} / 3600000)"
 
 
 # ────────────────────────────────
@@ -261,27 +126,26 @@ def _tokenize(text: str) -> List[str]:
     return [m.group(0).lower() for m in WORD_RE.finditer(text)]
 
 
-def _hour_key(ts: dt.datetime) -> str:
-    utc = ts if ts.tzinfo is not None else ts.replace(tzinfo=dt.timezone.utc)
-    utc = utc.astimezone(dt.timezone.utc).replace(minute=0, second=0, microsecond=0)
-    return utc.strftime("%Y-%m-%dT%H")
-
+# Lexical diversity source: "exact" (user_token_daily) or "hll" (user_token_hll,
+# and ingest stops writing the exact rows). The sketches are written in every
+# mode, which is what the old "both" mode opted into.
+TTR_MODES = ("exact", "hll")
+TTR_MODE = (os.getenv("ACTIVITY_TTR_MODE") or "exact").strip().lower()
+if TTR_MODE == "both":
+    log.warning("activity.ttr_mode.deprecated 'both' is now 'exact'")
+    TTR_MODE = "exact"
+elif TTR_MODE not in TTR_MODES:
+    log.warning("activity.ttr_mode.invalid %r, using exact", TTR_MODE)
+    TTR_MODE = "exact"
 
-def _day_key(ts: dt.datetime) -> str:
-    utc = ts if ts.tzinfo is not None else ts.replace(tzinfo=dt.timezone.utc)
-    return utc.astimezone(dt.timezone.utc).date().toordinal().__str__()
-
-
-def _iso(ts: dt.datetime) -> str:
-    if ts.tzinfo is None:
-        ts = ts.replace(tzinfo=dt.timezone.utc)
-    return ts.astimezone(dt.timezone.utc).isoformat()
+DAY_MS = 86_400_000
+HOUR_MS = 3_600_000
 
 
 def _log2_bucket_millis(ms: float, max_bucket: int = 20) -> int:
     if ms <= 1:
         return 0
-    b = int(math.log(ms, 2))
+    b = int(math.log2(ms))
     return b if b < max_bucket else max_bucket
 
 
@@ -361,225 +225,690 @@ def _reaction_count_and_diversity(message) -> Tuple[int, int]:
     return total, len(kinds)
 
 
-def upsert_from_message(message, *, include_bots: bool = False) -> None:
+@dataclass(slots=True)
+class MessageFact:
+    """Everything the rollups need from one message, computed once at ingest."""
+
+    message_id: int
+    guild_id: int
+    channel_id: int
+    user_id: int
+    created_at: dt.datetime  # aware UTC
+    day: int  # day_num()
+    hour: int  # hour_num()
+    words: int
+    is_reply: int
+    mentions: int
+    gifs: int
+    rx_total: int
+    rx_div: int
+    url_msgs: int
+    tokens: Tuple[str, ...]
+    sentiment: Optional[Tuple[float, float, float, float]]  # compound,pos,neg,neu
+    reply_to: Optional[int] = None  # parent message_id
+
+
+def extract_fact(message, *, include_bots: bool = False) -> Optional[MessageFact]:
+    """Compute a MessageFact from a discord.Message (None for DMs / skipped bots)."""
     guild = getattr(message, "guild", None)
     if guild is None:
-        return
+        return None
     if not include_bots and getattr(getattr(message, "author", None), "bot", False):
-        return
-
-    ensure_tables()
+        return None
 
-    guild_id = int(guild.id)
     channel = getattr(message, "channel", None)
-    channel_id = int(channel.id) if channel is not None else 0
     author = getattr(message, "author", None)
-    author_id = int(author.id) if author is not None else 0
 
     created_at: dt.datetime = getattr(message, "created_at")
     if created_at.tzinfo is None:
         created_at = created_at.replace(tzinfo=dt.timezone.utc)
+    created_at = created_at.astimezone(dt.timezone.utc)
 
-    day = created_at.astimezone(dt.timezone.utc).date().isoformat()  # 'YYYY-MM-DD'
-    hour_key = _hour_key(created_at)  # 'YYYY-MM-DDTHH'
+    # rollup keys come from the snowflake, like FACT_DAY_SQL / FACT_HOUR_SQL
+    ts_ms = snowflake_time_ms(message.id)
 
     content = getattr(message, "content", "") or ""
-    words = sum(1 for _ in WORD_RE.finditer(content))
+    tokens = _tokenize(content)
     mentions = len(MENTION_RE.findall(content)) + len(
         getattr(message, "mentions", []) or []
     )
-    gifs = _count_gifs(message)
     rx_total, rx_div = _reaction_count_and_diversity(message)
-    url_msgs = 1 if URL_RE.search(content) else 0
-    is_reply = (
-        1
-        if (
-            getattr(getattr(message, "reference", None), "message_id", None) is not None
+    reply_to = getattr(getattr(message, "reference", None), "message_id", None)
+
+    sentiment = None
+    sia = _get_sia()
+    if sia and content:
+        s = sia.polarity_scores(content)
+        sentiment = (
+            float(s.get("compound", 0.0)),
+            float(s.get("pos", 0.0)),
+            float(s.get("neg", 0.0)),
+            float(s.get("neu", 0.0)),
         )
-        else 0
+
+    return MessageFact(
+        message_id=int(message.id),
+        guild_id=int(guild.id),
+        channel_id=int(channel.id) if channel is not None else 0,
+        user_id=int(author.id) if author is not None else 0,
+        created_at=created_at,
+        day=ts_ms // DAY_MS,
+        hour=ts_ms // HOUR_MS,
+        words=len(tokens),
+        is_reply=1 if reply_to is not None else 0,
+        mentions=mentions,
+        gifs=_count_gifs(message),
+        rx_total=rx_total,
+        rx_div=rx_div,
+        url_msgs=1 if URL_RE.search(content) else 0,
+        tokens=tuple(set(tokens)),
+        sentiment=sentiment,
+        reply_to=int(reply_to) if reply_to is not None else None,
     )
 
-    con = connect()
-    try:
-        cur = con.cursor()
-        cur.execute("BEGIN IMMEDIATE")  # prevent races across processes
 
-        # 0) Insert immutable fact; idempotency gate
+def _b9(v: int) -> int:
+    return v if v < 9 else 9
+
+
+def write_facts(con: sqlite3.Connection, facts: List[MessageFact]) -> int:
+    """
+    Apply a batch of facts inside the caller's transaction.
+
+    message_facts is the idempotency gate: only facts whose row was actually
+    inserted contribute to the rollups. Counter deltas are pre-aggregated in
+    memory so each rollup row is touched once per batch. Returns the number
+    of new facts.
+    """
+    cur = con.cursor()
+    new: List[MessageFact] = []
+    for f in facts:
         cur.execute(
             """
             INSERT OR IGNORE INTO message_facts
-            (message_id,guild_id,channel_id,user_id,created_utc,day,hour,words,is_reply,mentions,gifs,rx_total,rx_div,url_msgs)
-            VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            (message_id,guild_id,channel_id,user_id,words,is_reply,mentions,gifs,rx_total,rx_div,url_msgs)
+            VALUES(?,?,?,?,?,?,?,?,?,?,?)
             """,
             (
-                int(message.id),
-                guild_id,
-                channel_id,
-                author_id,
-                created_at.astimezone(dt.timezone.utc).isoformat(),
-                day,
-                hour_key,
-                words,
-                is_reply,
-                mentions,
-                gifs,
-                rx_total,
-                rx_div,
-                url_msgs,
+                f.message_id,
+                f.guild_id,
+                f.channel_id,
+                f.user_id,
+                f.words,
+                f.is_reply,
+                f.mentions,
+                f.gifs,
+                f.rx_total,
+                f.rx_div,
+                f.url_msgs,
             ),
         )
-        if cur.rowcount == 0:
-            con.commit()
-            return  # already processed elsewhere; idempotent exit
+        if cur.rowcount:
+            new.append(f)
+    if not new:
+        return 0
 
-        # 1) per-user daily metrics
-        cur.execute(
+    # ---- pre-aggregate deltas (keys in primary-key order) ----
+    daily: Dict[Tuple[int, int, int], List[int]] = defaultdict(lambda: [0] * 7)
+    chan_daily: Dict[Tuple[int, int, int], List[int]] = defaultdict(lambda: [0, 0])
+    hourly: Dict[Tuple[int, int], int] = defaultdict(int)
+    user_hourly: Dict[Tuple[int, int, int], int] = defaultdict(int)
+    guild_daily: Dict[Tuple[int, int], List[int]] = defaultdict(lambda: [0, 0])
+    rx_hist: Dict[Tuple[int, int, str, int], int] = defaultdict(int)
+    vocab: Dict[Tuple[int, int, int], set[str]] = defaultdict(set)
+    active: Dict[Tuple[int, int], set[int]] = defaultdict(set)
+    sentiment: Dict[Tuple[int, int, int], List[float]] = defaultdict(
+        lambda: [0, 0.0, 0.0, 0.0, 0.0]
+    )
+    for f in new:
+        d = daily[(f.guild_id, f.day, f.user_id)]
+        d[0] += 1
+        d[1] += f.words
+        d[2] += f.is_reply
+        d[3] += f.mentions
+        d[4] += f.gifs
+        d[5] += f.rx_total
+        d[6] += f.url_msgs
+        active[(f.guild_id, f.day)].add(f.user_id)
+        c = chan_daily[(f.guild_id, f.day, f.channel_id)]
+        c[0] += 1
+        c[1] += f.words
+        hourly[(f.guild_id, f.hour)] += 1
+        user_hourly[(f.guild_id, f.user_id, f.hour)] += 1
+        g = guild_daily[(f.guild_id, f.day)]
+        g[0] += 1
+        g[1] += f.words
+        if f.rx_total:
+            rx_hist[(f.guild_id, f.day, "count", _b9(f.rx_total))] += 1
+        if f.rx_div:
+            rx_hist[(f.guild_id, f.day, "diversity", _b9(f.rx_div))] += 1
+        if f.tokens:
+            vocab[(f.guild_id, f.day, f.user_id)].update(f.tokens)
+        if f.sentiment is not None:
+            s = sentiment[(f.guild_id, f.day, f.user_id)]
+            s[0] += 1
+            for i, v in enumerate(f.sentiment, start=1):
+                s[i] += v
+
+    # ---- response latency: walk each channel in arrival order ----
+    # Gaps come from the snowflakes (epoch ms), not from parsed timestamps.
+    last: Dict[Tuple[int, int], Optional[int]] = {}
+    for key in {(f.guild_id, f.channel_id) for f in new}:
+        row = cur.execute(
+            "SELECT last_msg_id FROM channel_last_msg WHERE guild_id=? AND channel_id=?",
+            key,
+        ).fetchone()
+        last[key] = snowflake_time_ms(row[0]) if row and row[0] else None
+    latency: Dict[Tuple[int, int, int, int], int] = defaultdict(int)
+    markers: Dict[Tuple[int, int], Tuple[str, int, int]] = {}
+    for f in new:
+        key = (f.guild_id, f.channel_id)
+        ts_ms = snowflake_time_ms(f.message_id)
+        prev = last.get(key)
+        if prev is not None:
+            gap_ms = ts_ms - prev
+            if 0 <= gap_ms <= 24 * 60 * 60 * 1000:
+                latency[(f.guild_id, f.day, f.channel_id, _log2_bucket_millis(gap_ms))] += 1
+        last[key] = ts_ms
+        markers[key] = (f.created_at.isoformat(), f.message_id, f.user_id)
+
+    # ---- one upsert per touched rollup row ----
+    _write_user_totals(cur, daily)  # before the daily upsert: it spots new days
+    cur.executemany(
+        """
+        INSERT INTO message_metrics_daily
+          (guild_id,day,user_id,messages,words,replies,mentions,gifs,reactions_rx,url_msgs)
+        VALUES(?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(guild_id,day,user_id) DO UPDATE SET
+          messages     = messages + excluded.messages,
+          words        = words    + excluded.words,
+          replies      = replies  + excluded.replies,
+          mentions     = mentions + excluded.mentions,
+          gifs         = gifs     + excluded.gifs,
+          reactions_rx = reactions_rx + excluded.reactions_rx,
+          url_msgs     = url_msgs + excluded.url_msgs
+        """,
+        [(*k, *v) for k, v in daily.items()],
+    )
+    cur.executemany(
+        """
+        INSERT INTO message_metrics_channel_daily
+          (guild_id,day,channel_id,messages,words)
+        VALUES(?,?,?,?,?)
+        ON CONFLICT(guild_id,day,channel_id) DO UPDATE SET
+          messages = messages + excluded.messages,
+          words    = words    + excluded.words
+        """,
+        [(*k, *v) for k, v in chan_daily.items()],
+    )
+    cur.executemany(
+        """
+        INSERT INTO message_metrics_hourly(guild_id, hour, messages)
+        VALUES(?,?,?)
+        ON CONFLICT(guild_id, hour) DO UPDATE SET messages = messages + excluded.messages
+        """,
+        [(*k, v) for k, v in hourly.items()],
+    )
+    cur.executemany(
+        """
+        INSERT INTO message_metrics_user_hourly(guild_id, user_id, hour, messages)
+        VALUES(?,?,?,?)
+        ON CONFLICT(guild_id, user_id, hour) DO UPDATE SET
+          messages = messages + excluded.messages
+        """,
+        [(*k, v) for k, v in user_hourly.items()],
+    )
+    _write_tiers(cur, guild_daily, hourly)
+    if rx_hist:
+        cur.executemany(
             """
-            INSERT INTO message_metrics_daily
-              (guild_id,user_id,day,messages,words,replies,mentions,gifs,reactions_rx,url_msgs)
-            VALUES(?,?,?,?,?,?,?,?,?,?)
-            ON CONFLICT(guild_id,user_id,day) DO UPDATE SET
-              messages     = messages + excluded.messages,
-              words        = words    + excluded.words,
-              replies      = replies  + excluded.replies,
-              mentions     = mentions + excluded.mentions,
-              gifs         = gifs     + excluded.gifs,
-              reactions_rx = reactions_rx + excluded.reactions_rx,
-              url_msgs     = url_msgs + excluded.url_msgs
+            INSERT INTO reaction_hist_daily(guild_id,day,kind,bucket,n)
+            VALUES(?,?,?,?,?)
+            ON CONFLICT(guild_id,day,kind,bucket) DO UPDATE SET n = n + excluded.n
             """,
-            (
-                guild_id,
-                author_id,
-                day,
-                1,
-                words,
-                is_reply,
-                mentions,
-                gifs,
-                rx_total,
-                url_msgs,
-            ),
+            [(*k, v) for k, v in rx_hist.items()],
         )
-
-        # 1b) per-channel daily
-        cur.execute(
+    if latency:
+        cur.executemany(
             """
-            INSERT INTO message_metrics_channel_daily
-              (guild_id,channel_id,day,messages,words)
+            INSERT INTO latency_hist_daily(guild_id,day,channel_id,bucket,n)
             VALUES(?,?,?,?,?)
-            ON CONFLICT(guild_id,channel_id,day) DO UPDATE SET
-              messages = messages + excluded.messages,
-              words    = words    + excluded.words
+            ON CONFLICT(guild_id,day,channel_id,bucket) DO UPDATE SET n = n + excluded.n
             """,
-            (guild_id, channel_id, day, 1, words),
+            [(*k, v) for k, v in latency.items()],
         )
-
-        # 2) hourly guild counter
-        cur.execute(
+    cur.executemany(
+        """
+        INSERT INTO channel_last_msg(guild_id,channel_id,last_ts_utc,last_msg_id,last_author)
+        VALUES(?,?,?,?,?)
+        ON CONFLICT(guild_id,channel_id) DO UPDATE SET
+          last_ts_utc = excluded.last_ts_utc,
+          last_msg_id = excluded.last_msg_id,
+          last_author = excluded.last_author
+        """,
+        [(*k, *v) for k, v in markers.items()],
+    )
+    _write_active(cur, active)
+    replies = sorted((f.guild_id, f.message_id, f.reply_to) for f in new if f.reply_to)
+    if replies:
+        _index_replies(cur, replies)
+    if vocab and TTR_MODE != "hll":
+        ids = _tokens.dictionary.ids(cur, set().union(*vocab.values()))
+        cur.executemany(
+            "INSERT OR IGNORE INTO user_token_daily(guild_id,day,user_id,token_id) VALUES(?,?,?,?)",
+            sorted((*k, ids[t]) for k, ts in vocab.items() for t in ts),
+        )
+    if vocab:
+        cur.executemany(
+            """
+            INSERT INTO user_token_hll(guild_id,day,user_id,regs) VALUES(?,?,?,?)
+            ON CONFLICT(guild_id,day,user_id) DO UPDATE SET
+              regs = hll_merge(regs, excluded.regs)
+            """,
+            [(*k, hll.encode(hll.registers(ts))) for k, ts in sorted(vocab.items())],
+        )
+    if sentiment:
+        cur.executemany(
             """
-            INSERT INTO message_metrics_hourly(guild_id, hour, messages)
-            VALUES(?,?,1)
-            ON CONFLICT(guild_id, hour) DO UPDATE SET messages = messages + 1
+            INSERT INTO sentiment_daily(guild_id,day,user_id,n,sum_compound,sum_pos,sum_neg,sum_neu)
+            VALUES(?,?,?,?,?,?,?,?)
+            ON CONFLICT(guild_id,day,user_id) DO UPDATE SET
+              n = n + excluded.n,
+              sum_compound = sum_compound + excluded.sum_compound,
+              sum_pos      = sum_pos + excluded.sum_pos,
+              sum_neg      = sum_neg + excluded.sum_neg,
+              sum_neu      = sum_neu + excluded.sum_neu
             """,
-            (guild_id, hour_key),
+            [(*k, *v) for k, v in sentiment.items()],
         )
+    return len(new)
 
-        # 3) reaction histograms (0..9 buckets)
-        def _b9(v: int) -> int:
-            return v if v < 9 else 9
 
-        if rx_total:
+def _write_user_totals(cur, daily: Dict[Tuple[int, int, int], List[int]]) -> None:
+    """Fold a batch's per-(guild, day, user) deltas into user_totals."""
+    totals: Dict[Tuple[int, int], List[int]] = {}
+    for (gid, day, uid), d in daily.items():
+        new_day = not cur.execute(
+            "SELECT 1 FROM message_metrics_daily WHERE guild_id=? AND day=? AND user_id=?",
+            (gid, day, uid),
+        ).fetchone()
+        t = totals.get((gid, uid))
+        if t is None:
+            totals[(gid, uid)] = [*d, int(new_day), day, day]
+        else:
+            for i, v in enumerate(d):
+                t[i] += v
+            t[7] += new_day
+            t[8], t[9] = min(t[8], day), max(t[9], day)
+    cur.executemany(
+        """
+        INSERT INTO user_totals
+          (guild_id,user_id,messages,words,replies,mentions,gifs,reactions_rx,url_msgs,
+           active_days,first_day,last_day)
+        VALUES(?,?,?,?,?,?,?,?,?,?,?,?)
+        ON CONFLICT(guild_id,user_id) DO UPDATE SET
+          messages     = messages + excluded.messages,
+          words        = words    + excluded.words,
+          replies      = replies  + excluded.replies,
+          mentions     = mentions + excluded.mentions,
+          gifs         = gifs     + excluded.gifs,
+          reactions_rx = reactions_rx + excluded.reactions_rx,
+          url_msgs     = url_msgs + excluded.url_msgs,
+          active_days  = active_days + excluded.active_days,
+          first_day    = MIN(COALESCE(first_day, excluded.first_day), excluded.first_day),
+          last_day     = MAX(COALESCE(last_day, excluded.last_day), excluded.last_day)
+        """,
+        [(*k, *v) for k, v in sorted(totals.items())],
+    )
+
+
+def _refresh_user_totals(cur, guild_id: int) -> None:
+    """Re-derive a guild's user_totals from message_metrics_daily."""
+    cur.execute("DELETE FROM user_totals WHERE guild_id=?", (guild_id,))
+    cur.execute(
+        """
+        INSERT INTO user_totals
+          (guild_id,user_id,messages,words,replies,mentions,gifs,reactions_rx,url_msgs,
+           active_days,first_day,last_day)
+        SELECT guild_id, user_id, SUM(messages), SUM(words), SUM(replies), SUM(mentions),
+               SUM(gifs), SUM(reactions_rx), SUM(url_msgs), COUNT(*), MIN(day), MAX(day)
+        FROM message_metrics_daily
+        WHERE guild_id=?
+        GROUP BY guild_id, user_id
+        """,
+        (guild_id,),
+    )
+
+
+_GUILD_DAY_HOURS_SQL = """
+UPDATE message_metrics_guild_daily SET (active_hours, hour_sq) = (
+  SELECT COUNT(*), COALESCE(SUM(messages * messages), 0)
+  FROM message_metrics_hourly
+  WHERE guild_id = ?1 AND hour BETWEEN ?2 * 24 AND ?2 * 24 + 23
+)
+WHERE guild_id = ?1 AND day = ?2
+"""
+
+
+def _write_tiers(
+    cur,
+    guild_daily: Dict[Tuple[int, int], List[int]],
+    hourly: Dict[Tuple[int, int], int],
+) -> None:
+    """Fold a batch into the day and month tiers (after the hourly upsert)."""
+    cur.executemany(
+        """
+        INSERT INTO message_metrics_guild_daily(guild_id, day, messages, words)
+        VALUES(?,?,?,?)
+        ON CONFLICT(guild_id, day) DO UPDATE SET
+          messages = messages + excluded.messages,
+          words    = words    + excluded.words
+        """,
+        [(*k, *v) for k, v in guild_daily.items()],
+    )
+    # a day's hour stats are not additive; re-read its <= 24 hourly rows
+    cur.executemany(_GUILD_DAY_HOURS_SQL, sorted(guild_daily))
+
+    by_guild: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for (gid, hour), n in hourly.items():
+        by_guild[gid].append((hour, n))
+    for gid, rows in by_guild.items():
+        hours, counts = zip(*rows)
+        for month, delta in analytics.month_slot_totals(hours, counts).items():
+            row = cur.execute(
+                "SELECT slots FROM message_metrics_dowhour_monthly WHERE guild_id=? AND month=?",
+                (gid, month),
+            ).fetchone()
+            slots = analytics.decode_slots(row[0] if row else None) + delta
             cur.execute(
                 """
-                INSERT INTO reaction_hist_daily(guild_id,day,kind,bucket,n)
-                VALUES(?,?,?,?,1)
-                ON CONFLICT(guild_id,day,kind,bucket) DO UPDATE SET n = n + 1
+                INSERT INTO message_metrics_dowhour_monthly(guild_id, month, slots)
+                VALUES(?,?,?)
+                ON CONFLICT(guild_id, month) DO UPDATE SET slots = excluded.slots
                 """,
-                (guild_id, day, "count", _b9(rx_total)),
+                (gid, month, analytics.encode_slots(slots)),
             )
-        if rx_div:
+
+
+def _refresh_tiers(
+    cur, guild_id: int, start_day: Optional[str], end_day: Optional[str]
+) -> None:
+    """
+    Re-derive the day and month tiers over UTC days start..end from the
+    hourly and daily rollups (whole months, as a month row cannot be split).
+    """
+    lo, hi = _key_bounds("day", start_day, end_day)
+    cur.execute(
+        "DELETE FROM message_metrics_guild_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
+        (guild_id, lo, hi),
+    )
+    cur.execute(
+        """
+        INSERT INTO message_metrics_guild_daily
+          (guild_id, day, messages, words, active_hours, hour_sq)
+        SELECT d.guild_id, d.day, d.m, d.w, COALESCE(h.n, 0), COALESCE(h.sq, 0)
+        FROM (
+          SELECT guild_id, day, SUM(messages) AS m, SUM(words) AS w
+          FROM message_metrics_daily
+          WHERE guild_id = ?1 AND day BETWEEN ?2 AND ?3
+          GROUP BY guild_id, day
+        ) d
+        LEFT JOIN (
+          SELECT hour / 24 AS day, COUNT(*) AS n, SUM(messages * messages) AS sq
+          FROM message_metrics_hourly
+          WHERE guild_id = ?1 AND hour BETWEEN ?2 * 24 AND ?3 * 24 + 23
+          GROUP BY hour / 24
+        ) h ON h.day = d.day
+        """,
+        (guild_id, lo, hi),
+    )
+
+    m_lo, m_hi = analytics.month_of_day(lo), analytics.month_of_day(hi)
+    cur.execute(
+        "DELETE FROM message_metrics_dowhour_monthly WHERE guild_id=? AND month BETWEEN ? AND ?",
+        (guild_id, m_lo, m_hi),
+    )
+    rows = cur.execute(
+        "SELECT hour, messages FROM message_metrics_hourly WHERE guild_id=? AND hour BETWEEN ? AND ?",
+        (
+            guild_id,
+            analytics.month_first_day(m_lo) * 24,
+            analytics.month_first_day(m_hi + 1) * 24 - 1,
+        ),
+    ).fetchall()
+    if rows:
+        hours, counts = zip(*rows)
+        cur.executemany(
+            "INSERT INTO message_metrics_dowhour_monthly(guild_id, month, slots) VALUES(?,?,?)",
+            [
+                (guild_id, month, analytics.encode_slots(slots))
+                for month, slots in analytics.month_slot_totals(hours, counts).items()
+            ],
+        )
+
+
+def member_indexes(cur, guild_id: int, user_ids) -> Dict[int, int]:
+    """Dense member_index ids for ``user_ids``, assigning new ones (caller commits)."""
+    user_ids = sorted(set(user_ids))
+    out: Dict[int, int] = {}
+    for i in range(0, len(user_ids), 500):
+        chunk = user_ids[i : i + 500]
+        marks = ",".join("?" * len(chunk))
+        out.update(
             cur.execute(
-                """
-                INSERT INTO reaction_hist_daily(guild_id,day,kind,bucket,n)
-                VALUES(?,?,?,?,1)
-                ON CONFLICT(guild_id,day,kind,bucket) DO UPDATE SET n = n + 1
-                """,
-                (guild_id, day, "diversity", _b9(rx_div)),
-            )
+                f"SELECT user_id, idx FROM member_index WHERE guild_id=? AND user_id IN ({marks})",
+                (guild_id, *chunk),
+            ).fetchall()
+        )
+    missing = [u for u in user_ids if u not in out]
+    if missing:
+        (top,) = cur.execute(
+            "SELECT COALESCE(MAX(idx), -1) FROM member_index WHERE guild_id=?",
+            (guild_id,),
+        ).fetchone()
+        new = {u: int(top) + 1 + i for i, u in enumerate(missing)}
+        cur.executemany(
+            "INSERT INTO member_index(guild_id,user_id,idx) VALUES(?,?,?)",
+            [(guild_id, u, i) for u, i in new.items()],
+        )
+        out.update(new)
+    return out
 
-        # 4) latency + last marker (unchanged logic)
-        cur.execute(
-            "SELECT last_ts_utc FROM channel_last_msg WHERE guild_id=? AND channel_id=?",
-            (guild_id, channel_id),
+
+def _write_active(cur, active: Dict[Tuple[int, int], set[int]]) -> None:
+    """OR each (guild, day)'s users into active_daily."""
+    if not active:
+        return
+    rows = []
+    for guild_id in {g for g, _ in active}:
+        idx = member_indexes(
+            cur, guild_id, set().union(*(u for (g, _), u in active.items() if g == guild_id))
         )
-        prev = cur.fetchone()
-        if prev and prev["last_ts_utc"]:
-            try:
-                prev_dt = dt.datetime.fromisoformat(
-                    str(prev["last_ts_utc"]).replace("Z", "+00:00")
-                )
-                gap_ms = (created_at - prev_dt).total_seconds() * 1000.0
-                if 0 <= gap_ms <= 24 * 60 * 60 * 1000:
-                    b = _log2_bucket_millis(gap_ms)
-                    cur.execute(
-                        """
-                        INSERT INTO latency_hist_daily(guild_id,channel_id,day,bucket,n)
-                        VALUES(?,?,?,?,1)
-                        ON CONFLICT(guild_id,channel_id,day,bucket) DO UPDATE SET n = n + 1
-                        """,
-                        (guild_id, channel_id, day, b),
-                    )
-            except Exception:
-                pass
+        rows.extend(
+            (g, d, bitmaps.from_indexes(idx[u] for u in users))
+            for (g, d), users in active.items()
+            if g == guild_id
+        )
+    cur.executemany(
+        """
+        INSERT INTO active_daily(guild_id,day,bits) VALUES(?,?,?)
+        ON CONFLICT(guild_id,day) DO UPDATE SET bits = bits_or(bits, excluded.bits)
+        """,
+        sorted(rows),
+    )
+    for guild_id in {g for g, _ in active}:
+        _refresh_active_ever(cur, guild_id, min(d for g, d in active if g == guild_id))
+
 
+def _refresh_active_ever(cur, guild_id: int, from_day: int) -> None:
+    """
+    Re-derive active_ever from the month of ``from_day`` on (live writes only
+    touch the current month, so this reads at most a month of active_daily).
+    """
+    month = analytics.month_of_day(from_day)
+    row = cur.execute(
+        "SELECT bits FROM active_ever WHERE guild_id=? AND month<? ORDER BY month DESC LIMIT 1",
+        (guild_id, month),
+    ).fetchone()
+    rows = cur.execute(
+        "SELECT day, bits FROM active_daily WHERE guild_id=? AND day>=? ORDER BY day",
+        (guild_id, analytics.month_first_day(month)),
+    ).fetchall()
+    cur.execute(
+        "DELETE FROM active_ever WHERE guild_id=? AND month>=?", (guild_id, month)
+    )
+    if not rows:
+        return
+    days, blobs = zip(*rows)
+    if row:
+        blobs = (bitmaps.union(row[0], blobs[0]), *blobs[1:])
+    cur.executemany(
+        "INSERT INTO active_ever(guild_id,month,bits) VALUES(?,?,?)",
+        [(guild_id, m, b) for m, b in bitmaps.month_unions(days, blobs).items()],
+    )
+
+
+class _ThreadCache:
+    """LRU of message_id -> (root_id, depth) in front of message_thread."""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, int(capacity))
+        self._lru: OrderedDict[int, Tuple[int, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, message_id: int) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            hit = self._lru.get(message_id)
+            if hit is not None:
+                self._lru.move_to_end(message_id)
+            return hit
+
+    def update(self, items: Dict[int, Tuple[int, int]]) -> None:
+        with self._lock:
+            self._lru.update(items)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+
+_thread_cache = _ThreadCache(env_int("THREAD_CACHE_SIZE", 100_000))
+
+
+def _index_replies(cur, replies: List[Tuple[int, int, int]]) -> int:
+    """
+    Place (guild_id, message_id, parent_id) replies, in snowflake order, into
+    their reply chains: root and depth come from the parent (LRU, then
+    message_thread; an unknown parent is a root at depth 0). New
+    message_thread rows are folded into thread_index. Returns rows added.
+
+    A chain position never changes once known, so the cache needs no
+    rollback handling: a replayed batch resolves to the same values.
+    """
+    known: Dict[int, Tuple[int, int]] = {}
+    lookups: Dict[int, set[int]] = defaultdict(set)
+    for g, _, parent in replies:
+        hit = _thread_cache.get(parent)
+        if hit is None:
+            lookups[g].add(parent)
+        else:
+            known[parent] = hit
+    for g, parents in lookups.items():
+        ordered = sorted(parents)
+        for i in range(0, len(ordered), 500):
+            chunk = ordered[i : i + 500]
+            marks = ",".join("?" * len(chunk))
+            for mid, root, depth in cur.execute(
+                f"SELECT message_id, root_id, depth FROM message_thread "
+                f"WHERE guild_id=? AND message_id IN ({marks})",
+                (g, *chunk),
+            ).fetchall():
+                known[int(mid)] = (int(root), int(depth))
+
+    threads: Dict[Tuple[int, int], List[int]] = {}
+    added = 0
+    for g, mid, parent in replies:
+        root, depth = known.get(parent, (parent, 0))
+        depth += 1
+        known[mid] = (root, depth)
         cur.execute(
-            """
-            INSERT INTO channel_last_msg(guild_id,channel_id,last_ts_utc,last_msg_id,last_author)
-            VALUES(?,?,?,?,?)
-            ON CONFLICT(guild_id,channel_id) DO UPDATE SET
-              last_ts_utc = excluded.last_ts_utc,
-              last_msg_id = excluded.last_msg_id,
-              last_author = excluded.last_author
+            "INSERT OR IGNORE INTO message_thread(guild_id,message_id,root_id,parent_id,depth) "
+            "VALUES(?,?,?,?,?)",
+            (g, mid, root, parent, depth),
+        )
+        if cur.rowcount != 1:
+            continue
+        added += 1
+        t = threads.setdefault((g, root), [mid, depth, 0])
+        t[0] = max(t[0], mid)
+        t[1] = max(t[1], depth)
+        t[2] += 1
+    cur.executemany(
+        """
+        INSERT INTO thread_index(guild_id,root_id,last_id,max_depth,replies)
+        VALUES(?,?,?,?,?)
+        ON CONFLICT(guild_id,root_id) DO UPDATE SET
+          last_id   = MAX(last_id, excluded.last_id),
+          max_depth = MAX(max_depth, excluded.max_depth),
+          replies   = replies + excluded.replies
+        """,
+        [(*k, *v) for k, v in sorted(threads.items())],
+    )
+    _thread_cache.update(known)
+    return added
+
+
+def _wipe_threads(cur, guild_id: int, lo_id: int, hi_id: int) -> None:
+    """Drop replies with lo_id <= message_id < hi_id and re-total their threads."""
+    roots = [
+        r
+        for (r,) in cur.execute(
+            "SELECT DISTINCT root_id FROM message_thread "
+            "WHERE guild_id=? AND message_id>=? AND message_id<?",
+            (guild_id, lo_id, hi_id),
+        ).fetchall()
+    ]
+    cur.execute(
+        "DELETE FROM message_thread WHERE guild_id=? AND message_id>=? AND message_id<?",
+        (guild_id, lo_id, hi_id),
+    )
+    for i in range(0, len(roots), 500):
+        chunk = roots[i : i + 500]
+        marks = ",".join("?" * len(chunk))
+        cur.execute(
+            f"DELETE FROM thread_index WHERE guild_id=? AND root_id IN ({marks})",
+            (guild_id, *chunk),
+        )
+        cur.execute(
+            f"""
+            INSERT INTO thread_index(guild_id,root_id,last_id,max_depth,replies)
+            SELECT guild_id, root_id, MAX(message_id), MAX(depth), COUNT(*)
+            FROM message_thread WHERE guild_id=? AND root_id IN ({marks})
+            GROUP BY guild_id, root_id
             """,
-            (guild_id, channel_id, created_at.isoformat(), int(message.id), author_id),
+            (guild_id, *chunk),
         )
+    _thread_cache.clear()
 
-        # 5) lexical diversity (same)
-        if words:
-            tokens = set(m.group(0).lower() for m in WORD_RE.finditer(content))
-            cur.executemany(
-                "INSERT OR IGNORE INTO user_token_daily(guild_id,user_id,day,token) VALUES(?,?,?,?)",
-                [(guild_id, author_id, day, t) for t in tokens],
-            )
 
-        # 6) optional sentiment (same)
-        sia = _get_sia()
-        if sia and content:
-            s = sia.polarity_scores(content)
-            cur.execute(
-                """
-                INSERT INTO sentiment_daily(guild_id,user_id,day,n,sum_compound,sum_pos,sum_neg,sum_neu)
-                VALUES(?,?,?,?,?,?,?,?)
-                ON CONFLICT(guild_id,user_id,day) DO UPDATE SET
-                  n = n + excluded.n,
-                  sum_compound = sum_compound + excluded.sum_compound,
-                  sum_pos      = sum_pos + excluded.sum_pos,
-                  sum_neg      = sum_neg + excluded.sum_neg,
-                  sum_neu      = sum_neu + excluded.sum_neu
-                """,
-                (
-                    guild_id,
-                    author_id,
-                    day,
-                    1,
-                    float(s.get("compound", 0.0)),
-                    float(s.get("pos", 0.0)),
-                    float(s.get("neg", 0.0)),
-                    float(s.get("neu", 0.0)),
-                ),
-            )
-
-        con.commit()
+def write_batch(facts: List[MessageFact]) -> int:
+    """Write ``facts`` in one transaction. Returns the number of new facts."""
+    if not facts:
+        return 0
+    con = connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")  # prevent races across processes
+        try:
+            n = write_facts(con, facts)
+            con.commit()
+        except BaseException:
+            con.rollback()
+            _tokens.dictionary.rollback()
+            raise
+        _tokens.dictionary.commit()
+        return n
     finally:
         try:
             con.close()
@@ -587,121 +916,259 @@ def upsert_from_message(message, *, include_bots: bool = False) -> None:
             pass
 
 
+def upsert_from_message(message, *, include_bots: bool = False) -> None:
+    """Ingest a single message immediately (unbuffered)."""
+    fact = extract_fact(message, include_bots=include_bots)
+    if fact is None:
+        return
+    write_batch([fact])
+
+
+# ────────────────────────────────
+# Write-behind ingest buffer
+# ────────────────────────────────
+
+
+class IngestBuffer(WriteBuffer[MessageFact]):
+    """
+    Write-behind buffer of MessageFacts for live ingest; message_facts makes
+    replays of a requeued batch idempotent.
+    """
+
+    def __init__(self, max_messages: int = 500, max_delay_ms: int = 2000):
+        super().__init__(
+            write_batch, max_items=max_messages, max_delay_ms=max_delay_ms
+        )
+
+    @property
+    def max_messages(self) -> int:
+        return self.max_items
+
+    def add_message(self, message, *, include_bots: bool = False) -> bool:
+        fact = extract_fact(message, include_bots=include_bots)
+        if fact is None:
+            return False
+        return self.add(fact)
+
+
+ingest = IngestBuffer(
+    max_messages=env_int("ACTIVITY_FLUSH_MESSAGES", 500),
+    max_delay_ms=env_int("ACTIVITY_FLUSH_MS", 2000),
+)
+
+# ────────────────────────────────
+# Range maintenance (purge / rebuild)
+# ────────────────────────────────
+
+_MAX_SNOWFLAKE = (1 << 63) - 1
+
+# Every rollup derived from message facts, with its time key column.
+_ROLLUP_KEYS = (
+    ("message_metrics_daily", "day"),
+    ("message_metrics_channel_daily", "day"),
+    ("message_metrics_hourly", "hour"),
+    ("message_metrics_user_hourly", "hour"),
+    ("reaction_hist_daily", "day"),
+    ("latency_hist_daily", "day"),
+    ("user_token_daily", "day"),
+    ("user_token_hll", "day"),
+    ("active_daily", "day"),
+    ("sentiment_daily", "day"),
+)
+
+
+def _key_bounds(
+    col: str, start_day: Optional[str], end_day: Optional[str]
+) -> Tuple[int, int]:
+    """Inclusive integer bounds on a day or hour key for UTC days start..end."""
+    lo = day_num(start_day) if start_day else 0
+    hi = day_num(end_day) if end_day else 1 << 40
+    if col == "hour":
+        return lo * 24, hi * 24 + 23
+    return lo, hi
+
+
+# The rollups rebuild_aggregates_from_facts can regenerate: latency needs
+# per-channel state and tokens / sentiment need the message text, none of
+# which message_facts keeps (rebuild_from_archive restores those).
+_FACT_ROLLUPS = frozenset(
+    {
+        "message_metrics_daily",
+        "message_metrics_channel_daily",
+        "message_metrics_hourly",
+        "message_metrics_user_hourly",
+        "reaction_hist_daily",
+        "active_daily",
+    }
+)
+
+
+def _wipe_range(
+    cur,
+    guild_id: int,
+    start_day: Optional[str],
+    end_day: Optional[str],
+    *,
+    facts: bool,
+    tables: Optional[frozenset] = None,
+) -> None:
+    """
+    Delete rollup rows in the range (only ``tables``, if given). With
+    ``facts``, also the message_facts and message_thread rows, so the range
+    can be ingested again.
+    """
+    for table, col in _ROLLUP_KEYS:
+        if tables is not None and table not in tables:
+            continue
+        cur.execute(
+            f"DELETE FROM {table} WHERE guild_id=? AND {col} BETWEEN ? AND ?",
+            (guild_id, *_key_bounds(col, start_day, end_day)),
+        )
+    _refresh_tiers(cur, guild_id, start_day, end_day)
+    _refresh_user_totals(cur, guild_id)
+    _refresh_active_ever(cur, guild_id, _key_bounds("day", start_day, end_day)[0])
+    if facts:
+        lo_id, hi_id = snowflake_day_range(start_day, end_day)
+        hi_id = hi_id if hi_id is not None else _MAX_SNOWFLAKE
+        cur.execute(
+            "DELETE FROM message_facts WHERE guild_id=? AND message_id>=? AND message_id<?",
+            (guild_id, lo_id, hi_id),
+        )
+        _wipe_threads(cur, guild_id, lo_id, hi_id)
+
+
 def rebuild_aggregates_from_facts(guild_id: int, start_day: str, end_day: str) -> None:
+    """
+    Regenerate the _FACT_ROLLUPS (and the tiers derived from them) over
+    [start_day, end_day] from message_facts. Latency, token and sentiment
+    rollups are left as they are; use rebuild_from_archive for those.
+    """
+    lo_id, hi_id = snowflake_day_range(start_day, end_day)
+    facts = "FROM message_facts WHERE guild_id=? AND message_id>=? AND message_id<?"
+    fact_args = (guild_id, lo_id, hi_id)
     con = connect()
     try:
         cur = con.cursor()
         cur.execute("BEGIN IMMEDIATE")
 
         # wipe ranges
-        cur.execute(
-            "DELETE FROM message_metrics_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
-        cur.execute(
-            "DELETE FROM message_metrics_channel_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
-        cur.execute(
-            "DELETE FROM message_metrics_hourly WHERE guild_id=? AND substr(hour,1,10) BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
-        cur.execute(
-            "DELETE FROM reaction_hist_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
-        cur.execute(
-            "DELETE FROM latency_hist_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
-        cur.execute(
-            "DELETE FROM user_token_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
-        cur.execute(
-            "DELETE FROM sentiment_daily WHERE guild_id=? AND day BETWEEN ? AND ?",
-            (guild_id, start_day, end_day),
-        )
+        _wipe_range(cur, guild_id, start_day, end_day, facts=False, tables=_FACT_ROLLUPS)
 
         # daily per-user
         cur.execute(
-            """
+            f"""
             INSERT INTO message_metrics_daily
             (guild_id,user_id,day,messages,words,replies,mentions,gifs,reactions_rx,url_msgs)
-            SELECT guild_id,user_id,day,
+            SELECT guild_id,user_id,{FACT_DAY_SQL} AS day,
                    COUNT(*) AS messages,
                    SUM(words), SUM(is_reply), SUM(mentions), SUM(gifs), SUM(rx_total), SUM(url_msgs)
-            FROM message_facts
-            WHERE guild_id=? AND day BETWEEN ? AND ?
+            {facts}
             GROUP BY guild_id,user_id,day
             """,
-            (guild_id, start_day, end_day),
+            fact_args,
         )
 
         # daily per-channel
         cur.execute(
-            """
+            f"""
             INSERT INTO message_metrics_channel_daily
             (guild_id,channel_id,day,messages,words)
-            SELECT guild_id,channel_id,day, COUNT(*), SUM(words)
-            FROM message_facts
-            WHERE guild_id=? AND day BETWEEN ? AND ?
+            SELECT guild_id,channel_id,{FACT_DAY_SQL} AS day, COUNT(*), SUM(words)
+            {facts}
             GROUP BY guild_id,channel_id,day
             """,
-            (guild_id, start_day, end_day),
+            fact_args,
         )
 
         # hourly
         cur.execute(
-            """
+            f"""
             INSERT INTO message_metrics_hourly(guild_id,hour,messages)
-            SELECT guild_id,hour, COUNT(*)
-            FROM message_facts
-            WHERE guild_id=? AND substr(hour,1,10) BETWEEN ? AND ?
+            SELECT guild_id,{FACT_HOUR_SQL} AS hour, COUNT(*)
+            {facts}
             GROUP BY guild_id,hour
             """,
-            (guild_id, start_day, end_day),
+            fact_args,
+        )
+        cur.execute(
+            f"""
+            INSERT INTO message_metrics_user_hourly(guild_id,user_id,hour,messages)
+            SELECT guild_id,user_id,{FACT_HOUR_SQL} AS hour, COUNT(*)
+            {facts}
+            GROUP BY guild_id,user_id,hour
+            """,
+            fact_args,
         )
+        _refresh_tiers(cur, guild_id, start_day, end_day)
+        _refresh_user_totals(cur, guild_id)
+
+        # active-user bitmaps
+        active: Dict[Tuple[int, int], set[int]] = defaultdict(set)
+        for day, uid in cur.execute(
+            f"SELECT DISTINCT {FACT_DAY_SQL}, user_id {facts}", fact_args
+        ).fetchall():
+            active[(guild_id, day)].add(uid)
+        _write_active(cur, active)
 
         # reaction hist (count & diversity bucketed 0..9)
         # count
         cur.execute(
-            """
+            f"""
             WITH b AS (
-              SELECT guild_id, day, CASE WHEN rx_total>=9 THEN 9 ELSE rx_total END AS bucket
-              FROM message_facts
-              WHERE guild_id=? AND day BETWEEN ? AND ? AND rx_total>0
+              SELECT guild_id, {FACT_DAY_SQL} AS day,
+                     CASE WHEN rx_total>=9 THEN 9 ELSE rx_total END AS bucket
+              {facts} AND rx_total>0
             )
             INSERT INTO reaction_hist_daily(guild_id,day,kind,bucket,n)
             SELECT guild_id, day, 'count', bucket, COUNT(*)
             FROM b GROUP BY guild_id, day, bucket
             """,
-            (guild_id, start_day, end_day),
+            fact_args,
         )
         # diversity
         cur.execute(
-            """
+            f"""
             WITH b AS (
-              SELECT guild_id, day, CASE WHEN rx_div>=9 THEN 9 ELSE rx_div END AS bucket
-              FROM message_facts
-              WHERE guild_id=? AND day BETWEEN ? AND ? AND rx_div>0
+              SELECT guild_id, {FACT_DAY_SQL} AS day,
+                     CASE WHEN rx_div>=9 THEN 9 ELSE rx_div END AS bucket
+              {facts} AND rx_div>0
             )
             INSERT INTO reaction_hist_daily(guild_id,day,kind,bucket,n)
             SELECT guild_id, day, 'diversity', bucket, COUNT(*)
             FROM b GROUP BY guild_id, day, bucket
             """,
-            (guild_id, start_day, end_day),
+            fact_args,
         )
 
-        # lexical diversity (tokens)
-        # We can’t re-tokenize content from facts (we didn’t store content),
-        # but user_token_daily is only used for ttr; recompute ttr another way or
-        # keep your existing tokens if you rely on them. If needed, store a small
-        # token array in message_facts next time.
+        con.commit()
+    finally:
+        try:
+            con.close()
+        except Exception:
+            pass
 
-        # sentiment rebuild is optional unless you also persisted the scores separately.
 
+def purge(
+    guild_id: int,
+    start_day: Optional[str] = None,
+    end_day: Optional[str] = None,
+    *,
+    include_facts: bool = True,
+) -> int:
+    """
+    Delete a guild's rollups for UTC days start_day..end_day (all when both
+    are None) and reset its latency watermarks. ``include_facts`` also drops
+    the message_facts rows so the range can be re-ingested. Returns rows deleted.
+    """
+    con = connect()
+    try:
+        cur = con.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        before = con.total_changes
+        _wipe_range(cur, guild_id, start_day, end_day, facts=include_facts)
+        cur.execute("DELETE FROM channel_last_msg WHERE guild_id=?", (guild_id,))
         con.commit()
+        return con.total_changes - before
     finally:
         try:
             con.close()
@@ -709,6 +1176,257 @@ def rebuild_aggregates_from_facts(guild_id: int, start_day: str, end_day: str) -
             pass
 
 
+# ────────────────────────────────
+# Offline rebuild from message_archive
+# ────────────────────────────────
+
+USER_MENTION_RE = re.compile(r"<@!?(\d+)>")
+
+class _Emoji:
+    __slots__ = ("id", "name", "_repr")
+
+    def __init__(self, d: Dict[str, Any]):
+        self.id = d.get("emoji_id")
+        self.name = d.get("emoji_name")
+        self._repr = d.get("emoji") or ""
+
+    def __str__(self) -> str:
+        return self._repr
+
+
+class _Embed:
+    __slots__ = ("_d",)
+
+    def __init__(self, d: Dict[str, Any]):
+        self._d = d
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self._d
+
+
+def _json_list(raw: Optional[str]) -> List[Dict[str, Any]]:
+    if not raw:
+        return []
+    try:
+        v = json.loads(raw)
+    except ValueError:
+        return []
+    return [x for x in v if isinstance(x, dict)] if isinstance(v, list) else []
+
+
+class ArchivedMessageView:
+    """
+    Read-only stand-in for discord.Message built from a message_archive row,
+    exposing just what extract_fact() reads. ``mentions`` is rebuilt from
+    the <@id> tokens in the content (reply pings are not archived).
+    """
+
+    __slots__ = (
+        "id",
+        "guild",
+        "channel",
+        "author",
+        "created_at",
+        "content",
+        "mentions",
+        "reference",
+        "reactions",
+        "attachments",
+        "embeds",
+    )
+
+    def __init__(self, row):
+        from types import SimpleNamespace as NS
+
+        self.id = int(row.message_id)
+        self.guild = NS(id=int(row.guild_id))
+        self.channel = NS(id=int(row.channel_id))
+        self.author = NS(id=int(row.author_id), bot=False)  # archive skips bots
+        self.created_at = dt.datetime.fromisoformat(
+            str(row.created_at).replace("Z", "+00:00")
+        )
+        self.content = row.content or ""
+        self.mentions = list(dict.fromkeys(USER_MENTION_RE.findall(self.content)))
+        self.reference = NS(message_id=row.reply_to_id) if row.reply_to_id else None
+        self.reactions = [
+            NS(
+                count=int(r.get("count") or 0),
+                emoji=_Emoji(r) if r.get("emoji") else None,
+            )
+            for r in _json_list(row.reactions)
+        ]
+        self.attachments = [
+            NS(
+                content_type=a.get("content_type") or "",
+                filename=a.get("filename") or "",
+                url=a.get("url") or "",
+            )
+            for a in _json_list(row.attachments_json)
+        ]
+        self.embeds = [_Embed(e) for e in _json_list(row.embeds_json)]
+
+
+def _reseed_channel_last(cur, guild_id: int, before_id: int) -> None:
+    """Point channel_last_msg at each channel's newest archived message < before_id."""
+    cur.execute("DELETE FROM channel_last_msg WHERE guild_id=?", (guild_id,))
+    cur.execute(
+        """
+        INSERT INTO channel_last_msg(guild_id,channel_id,last_ts_utc,last_msg_id,last_author)
+        SELECT a.guild_id, a.channel_id, a.created_at, a.message_id, a.author_id
+        FROM message_archive a
+        JOIN (
+          SELECT MAX(message_id) AS mid FROM message_archive
+          WHERE guild_id=? AND message_id<? GROUP BY channel_id
+        ) m ON a.message_id = m.mid
+        """,
+        (guild_id, before_id),
+    )
+
+
+def rebuild_from_archive(
+    guild_id: int,
+    start_day: Optional[str] = None,
+    end_day: Optional[str] = None,
+    *,
+    batch_size: int = 2000,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Regenerate every activity table for ``guild_id`` over [start_day, end_day]
+    (inclusive, UTC; open-ended when None) from message_archive. No network.
+
+    Rows are streamed in snowflake order through extract_fact() — the same
+    path as live ingest — and written with write_batch(), so tokens, latency
+    and sentiment come back too. The range is wiped first; channel_last_msg
+    is seeded from the archive so latency at the range start is correct.
+    ``progress(scanned, written)`` is called after every batch.
+
+    Must run on the DB writer side (a thread or the CLI), never the event loop.
+    """
+    started = time.perf_counter()
+    lo_id, hi_id = snowflake_day_range(start_day, end_day)
+
+    con = connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        _wipe_range(con, guild_id, start_day, end_day, facts=True)
+        _reseed_channel_last(con, guild_id, lo_id)
+        con.commit()
+    finally:
+        con.close()
+
+    from . import message_archive
+
+    scanned = written = batches = 0
+    batch: List[MessageFact] = []
+    for row in message_archive.scan_guild_messages(
+        guild_id,
+        after_message_id=max(lo_id - 1, 0),
+        before_message_id=hi_id,
+        chunk_size=batch_size,
+    ):
+        scanned += 1
+        try:
+            fact = extract_fact(ArchivedMessageView(row))
+        except Exception:
+            log.exception("activity.rebuild.bad_row message_id=%s", row.message_id)
+            continue
+        if fact is not None:
+            batch.append(fact)
+        if len(batch) >= batch_size:
+            written += write_batch(batch)
+            batches += 1
+            batch = []
+            if progress:
+                progress(scanned, written)
+    if batch:
+        written += write_batch(batch)
+        batches += 1
+    if progress:
+        progress(scanned, written)
+
+    # leave latency state where live ingest expects it: the newest message
+    if hi_id is not None:
+        con = connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            _reseed_channel_last(con, guild_id, _MAX_SNOWFLAKE)
+            con.commit()
+        finally:
+            con.close()
+
+    result = {
+        "guild_id": guild_id,
+        "start_day": start_day,
+        "end_day": end_day,
+        "scanned": scanned,
+        "written": written,
+        "batches": batches,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    log.info("activity.rebuild.archive", extra=result)
+    return result
+
+
+def rebuild_threads(
+    guild_id: int,
+    *,
+    batch_size: int = 5000,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Re-resolve every reply chain for ``guild_id`` from message_archive's
+    reply_to_id, in snowflake order, without touching the other rollups.
+    Live ingest can keep running: replies it indexes first are skipped here.
+    ``progress(replies)`` is called after every batch.
+    """
+    started = time.perf_counter()
+    con = connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        _wipe_threads(con.cursor(), guild_id, 0, _MAX_SNOWFLAKE)
+        con.commit()
+    finally:
+        con.close()
+
+    from . import message_archive
+
+    scanned = added = 0
+    batch: List[Tuple[int, int, int]] = []
+
+    def _flush() -> int:
+        con = connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            n = _index_replies(con.cursor(), batch)
+            con.commit()
+            return n
+        finally:
+            con.close()
+
+    for mid, parent in message_archive.scan_replies(guild_id, chunk_size=batch_size):
+        scanned += 1
+        batch.append((guild_id, mid, parent))
+        if len(batch) >= batch_size:
+            added += _flush()
+            batch = []
+            if progress:
+                progress(scanned)
+    if batch:
+        added += _flush()
+    if progress:
+        progress(scanned)
+
+    result = {
+        "guild_id": guild_id,
+        "replies": scanned,
+        "indexed": added,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    log.info("activity.rebuild.threads", extra=result)
+    return result
+
+
 # ────────────────────────────────
 # Query helpers (no heavy rescans)
 # ────────────────────────────────
@@ -725,26 +1443,8 @@ class BasicStats:
     gini: float
 
 
-def _gini(values: List[int]) -> float:
-    if not values:
-        return float("nan")
-    x = sorted(float(v) for v in values if v >= 0)
-    if not x:
-        return float("nan")
-    s = sum(x)
-    if s == 0:
-        return 0.0
-    cum = 0.0
-    acc = 0.0
-    n = len(x)
-    for i, v in enumerate(x, 1):
-        cum += v
-        acc += i * v
-    return (2.0 * acc / (n * s)) - (n + 1) / n
-
-
 def get_basic_stats(guild_id: int, start_day: str, end_day: str) -> BasicStats:
-    con = connect()
+    con = connect(readonly=True)
     try:
         cur = con.cursor()
         rows = cur.execute(
@@ -754,144 +1454,125 @@ def get_basic_stats(guild_id: int, start_day: str, end_day: str) -> BasicStats:
             WHERE guild_id=? AND day BETWEEN ? AND ?
             GROUP BY user_id
             """,
-            (guild_id, start_day, end_day),
+            (guild_id, *_key_bounds("day", start_day, end_day)),
         ).fetchall()
     finally:
         con.close()
 
-    arr = [int(r["m"] or 0) for r in rows]
-    n = len(arr)
-    if n == 0:
+    arr = np.array([int(r["m"] or 0) for r in rows], dtype=np.int64)
+    if arr.size == 0:
         return BasicStats(0, 0, 0.0, 0.0, float("nan"), float("nan"), float("nan"))
-    mean = sum(arr) / n
-    var = sum((x - mean) ** 2 for x in arr) / n if n > 0 else 0.0
-    std = math.sqrt(var)
-    # Biased (population) skew/kurtosis to match scipy defaults (bias=True)
-    if std > 0:
-        m3 = sum(((x - mean) / std) ** 3 for x in arr) / n
-        m4 = sum(((x - mean) / std) ** 4 for x in arr) / n
-        skewness = float(m3)
-        kurt = float(m4 - 3.0)  # excess kurtosis
-    else:
-        skewness = float("0")
-        kurt = float("0")
+    m = analytics.moments(arr)
     return BasicStats(
-        min(arr), max(arr), float(mean), float(std), skewness, kurt, _gini(arr)
+        int(arr.min()),
+        int(arr.max()),
+        m["mean"],
+        m["std"],
+        m["skewness"],
+        m["kurtosis"],
+        analytics.gini(arr),
     )
 
 
-def get_hourly_counts(guild_id: int, start_hour: str, end_hour: str) -> Dict[str, int]:
-    """
-    Returns {'YYYY-MM-DDTHH': messages} for hours in [start_hour, end_hour] (UTC).
-    """
-    con = connect()
+def _hourly_rows(
+    guild_id: int, lo: int, hi: int, user_id: Optional[int] = None
+) -> List[sqlite3.Row]:
+    """(hour, messages) for epoch hours lo..hi, guild-wide or for one user."""
+    if user_id is None:
+        sql = (
+            "SELECT hour, messages FROM message_metrics_hourly "
+            "WHERE guild_id=? AND hour BETWEEN ? AND ?"
+        )
+        args: Tuple[int, ...] = (guild_id, lo, hi)
+    else:
+        sql = (
+            "SELECT hour, messages FROM message_metrics_user_hourly "
+            "WHERE guild_id=? AND user_id=? AND hour BETWEEN ? AND ?"
+        )
+        args = (guild_id, int(user_id), lo, hi)
+    con = connect(readonly=True)
     try:
-        cur = con.cursor()
-        rows = cur.execute(
-            """
-            SELECT hour, messages
-            FROM message_metrics_hourly
-            WHERE guild_id=? AND hour BETWEEN ? AND ?
-            ORDER BY hour
-            """,
-            (guild_id, start_hour, end_hour),
-        ).fetchall()
+        return con.execute(sql + " ORDER BY hour", args).fetchall()
     finally:
         con.close()
-    return {str(r["hour"]): int(r["messages"]) for r in rows}
 
 
-def get_heatmap(guild_id: int, start_day: str, end_day: str) -> List[List[float]]:
+def get_hourly_counts(
+    guild_id: int, start_hour: str, end_hour: str, *, user_id: Optional[int] = None
+) -> Dict[str, int]:
     """
-    7x24 matrix of avg msgs per (weekday,hour) across [start_day, end_day].
-    Uses message_metrics_hourly, normalizing by how many occurrences of each weekday
-    fall in the range.
+    Returns {'YYYY-MM-DDTHH': messages} for hours in [start_hour, end_hour] (UTC).
     """
-    # Build day counts per weekday in the range
-    start = dt.date.fromisoformat(start_day)
-    end = dt.date.fromisoformat(end_day)
-    days_per_dow = [0] * 7
-    d = start
-    while d <= end:
-        days_per_dow[d.weekday()] += 1
-        d += dt.timedelta(days=1)
-    # Pull hourly counts in range
-    con = connect()
-    try:
-        cur = con.cursor()
-        rows = cur.execute(
-            """
-            SELECT hour, messages
-            FROM message_metrics_hourly
-            WHERE guild_id=? AND substr(hour,1,10) BETWEEN ? AND ?
-            """,
-            (guild_id, start_day, end_day),
-        ).fetchall()
-    finally:
-        con.close()
-    accum = [[0 for _ in range(24)] for _ in range(7)]
-    for r in rows:
-        hour_s = str(r["hour"])  # 'YYYY-MM-DDTHH'
-        day = dt.date.fromisoformat(hour_s[:10])
-        dow = day.weekday()
-        hour = int(hour_s[11:13])
-        accum[dow][hour] += int(r["messages"])
-    # average per weekday by number of that weekday in range
-    for dow in range(7):
-        denom = max(1, days_per_dow[dow])
-        for h in range(24):
-            accum[dow][h] = accum[dow][h] / float(denom)
-    return [[float(x) for x in row] for row in accum]
+    rows = _hourly_rows(guild_id, hour_num(start_hour), hour_num(end_hour), user_id)
+    return {hour_str(r["hour"]): int(r["messages"]) for r in rows}
+
+
+def _hourly_series(
+    guild_id: int, lo: int, hi: int, user_id: Optional[int] = None
+) -> np.ndarray:
+    """Zero-filled message counts for epoch hours lo..hi."""
+    return analytics.dense_series(_hourly_rows(guild_id, lo, hi, user_id), lo, hi)
+
+
+def get_heatmap(
+    guild_id: int, start_day: str, end_day: str, *, user_id: Optional[int] = None
+) -> List[List[float]]:
+    """
+    7x24 matrix of avg msgs per (weekday,hour) across [start_day, end_day],
+    normalizing by how many occurrences of each weekday fall in the range.
+    Whole calendar months come from message_metrics_dowhour_monthly, only
+    the days around them from message_metrics_hourly; a user's heatmap is
+    read from message_metrics_user_hourly.
+    """
+    lo, hi = day_num(start_day), day_num(end_day)
+    if user_id is not None:
+        series = _hourly_series(guild_id, lo * 24, hi * 24 + 23, user_id)
+        return analytics.dow_hour_means(series, lo * 24).tolist()
+    months, edges = analytics.split_months(lo, hi)
+    grid = np.zeros(analytics.SLOTS, dtype=np.float64)
+    if months:
+        con = connect(readonly=True)
+        try:
+            rows = con.execute(
+                """
+                SELECT slots FROM message_metrics_dowhour_monthly
+                WHERE guild_id=? AND month BETWEEN ? AND ?
+                """,
+                (guild_id, *months),
+            ).fetchall()
+        finally:
+            con.close()
+        for r in rows:
+            grid += analytics.decode_slots(r[0])
+    for a, b in edges:
+        series = _hourly_series(guild_id, a * 24, b * 24 + 23)
+        grid += analytics.dow_hour_totals(series, a * 24).ravel()
+    per_dow = np.maximum(analytics.weekday_counts(lo, hi), 1)
+    return (grid.reshape(7, 24) / per_dow[:, None]).tolist()
 
 
 def get_burst_std_24h(
-    guild_id: int, start_hour: str, end_hour: str
+    guild_id: int, start_hour: str, end_hour: str, *, user_id: Optional[int] = None
 ) -> Dict[str, float]:
     """
     24-hour rolling std of hourly message counts in [start_hour, end_hour] (UTC).
-    We rebuild the full hourly sequence to include zeros for missing hours.
+    Missing hours count as zero.
     """
-    # Build timeline of hours
-    start_dt = dt.datetime.fromisoformat(start_hour + ":00+00:00")
-    end_dt = dt.datetime.fromisoformat(end_hour + ":00+00:00")
-    hours: List[str] = []
-    t = start_dt
-    while t <= end_dt:
-        hours.append(t.strftime("%Y-%m-%dT%H"))
-        t += dt.timedelta(hours=1)
-
-    # Pull counts
-    raw = get_hourly_counts(guild_id, start_hour, end_hour)
-    series = [int(raw.get(h, 0)) for h in hours]
-
-    # Rolling std over window=24
-    out: Dict[str, float] = {}
-    window = 24
-    from collections import deque
-    import statistics
-
-    dq: deque[int] = deque()
-    for idx, h in enumerate(hours):
-        dq.append(series[idx])
-        if len(dq) > window:
-            dq.popleft()
-        if len(dq) <= 1:
-            out[h] = 0.0
-        else:
-            out[h] = float(statistics.pstdev(dq))
-    return out
+    lo, hi = hour_num(start_hour), hour_num(end_hour)
+    burst = analytics.rolling_std(_hourly_series(guild_id, lo, hi, user_id), 24)
+    return dict(zip(analytics.hour_labels(lo, len(burst)).tolist(), burst.tolist()))
 
 
 def get_totals(guild_id: int, start_day: str, end_day: str) -> dict:
-    con = connect()
+    con = connect(readonly=True)
     try:
         row = con.execute(
             """
             SELECT COALESCE(SUM(messages),0) AS m, COALESCE(SUM(words),0) AS w
-            FROM message_metrics_daily
+            FROM message_metrics_guild_daily
             WHERE guild_id=? AND day BETWEEN ? AND ?
             """,
-            (guild_id, start_day, end_day),
+            (guild_id, *_key_bounds("day", start_day, end_day)),
         ).fetchone()
         return {"messages": int(row["m"] or 0), "words": int(row["w"] or 0)}
     finally:
@@ -901,7 +1582,7 @@ def get_totals(guild_id: int, start_day: str, end_day: str) -> dict:
 def get_totals_by_channel(
     guild_id: int, start_day: str, end_day: str
 ) -> dict[int, int]:
-    con = connect()
+    con = connect(readonly=True)
     try:
         rows = con.execute(
             """
@@ -910,19 +1591,61 @@ def get_totals_by_channel(
             WHERE guild_id=? AND day BETWEEN ? AND ?
             GROUP BY channel_id
             """,
-            (guild_id, start_day, end_day),
+            (guild_id, *_key_bounds("day", start_day, end_day)),
         ).fetchall()
         return {int(r["channel_id"]): int(r["m"] or 0) for r in rows}
     finally:
         con.close()
 
 
+def get_top_users(
+    guild_id: int,
+    stat: str = "messages",
+    start_day: Optional[str] = None,
+    end_day: Optional[str] = None,
+    *,
+    limit: int = 10,
+) -> List[Tuple[int, int]]:
+    """
+    Top ``limit`` (user_id, value) by a TOP_STATS column, highest first.
+    Without a window this walks user_totals' index for the stat; with one it
+    sums message_metrics_daily over the (guild, day) range.
+    """
+    if stat not in TOP_STATS:
+        raise ValueError(f"unknown stat {stat!r}")
+    con = connect(readonly=True)
+    try:
+        if start_day is None and end_day is None:
+            rows = con.execute(
+                f"""
+                SELECT user_id, {stat} FROM user_totals
+                WHERE guild_id=? AND {stat} > 0
+                ORDER BY {stat} DESC LIMIT ?
+                """,
+                (guild_id, limit),
+            ).fetchall()
+        else:
+            expr = "COUNT(*)" if stat == "active_days" else f"SUM({stat})"
+            rows = con.execute(
+                f"""
+                SELECT user_id, {expr} AS v FROM message_metrics_daily
+                WHERE guild_id=? AND day BETWEEN ? AND ?
+                GROUP BY user_id HAVING v > 0
+                ORDER BY v DESC LIMIT ?
+                """,
+                (guild_id, *_key_bounds("day", start_day, end_day), limit),
+            ).fetchall()
+    finally:
+        con.close()
+    return [(int(r[0]), int(r[1])) for r in rows]
+
+
 def get_latency_stats(guild_id: int, start_day: str, end_day: str) -> Dict[str, Any]:
     """
     Approximate per-channel + global latency (median/p95) using log2(ms) histograms
     in [start_day, end_day].
     """
-    con = connect()
+    con = connect(readonly=True)
     try:
         cur = con.cursor()
         rows = cur.execute(
@@ -932,58 +1655,131 @@ def get_latency_stats(guild_id: int, start_day: str, end_day: str) -> Dict[str,
             WHERE guild_id=? AND day BETWEEN ? AND ?
             GROUP BY channel_id, bucket
             """,
-            (guild_id, start_day, end_day),
+            (guild_id, *_key_bounds("day", start_day, end_day)),
         ).fetchall()
     finally:
         con.close()
 
-    max_bin = 20
-    by_chan: Dict[int, List[int]] = defaultdict(lambda: [0] * (max_bin + 1))
-    global_hist = [0] * (max_bin + 1)
-    for r in rows:
-        cid = int(r["channel_id"])
-        b = int(r["bucket"])
-        n = int(r["n"])
-        by_chan[cid][b] += n
-        global_hist[b] += n
-
-    def quantiles_from_hist(hist: List[int], probs=(0.5, 0.95)) -> Tuple[float, float]:
-        total = sum(hist)
-        if total == 0:
-            return (float("nan"), float("nan"))
-        cdf = []
-        acc = 0
-        for n in hist:
-            acc += n
-            cdf.append(acc / total)
-        outs = []
-        for p in probs:
-            i = 0
-            while i < len(cdf) and cdf[i] < p:
-                i += 1
-            # Use lower-edge of bucket as conservative estimate
-            ms = float(2**i)
-            outs.append(ms)
-        return tuple(outs)  # median_ms, p95_ms
-
-    chans = []
-    for cid, hist in by_chan.items():
-        med, p95 = quantiles_from_hist(hist)
-        chans.append(
-            {"channel_id": cid, "median_ms": med, "p95_ms": p95, "n": int(sum(hist))}
-        )
-    gmed, gp95 = quantiles_from_hist(global_hist)
+    return analytics.latency_summary(rows)
+
+
+def get_thread_stats(guild_id: int, start_day: str, end_day: str) -> Dict[str, Any]:
+    """
+    Reply chains started in [start_day, end_day]: count, replies per thread,
+    depth distribution ({max_depth: threads}) and lifespan (root to last
+    reply) as exact quantiles plus a log2-millisecond histogram.
+    """
+    lo_id, hi_id = snowflake_day_range(start_day, end_day)
+    con = connect(readonly=True)
+    try:
+        rows = con.execute(
+            """
+            SELECT root_id, last_id, max_depth, replies FROM thread_index
+            WHERE guild_id=? AND root_id>=? AND root_id<?
+            """,
+            (guild_id, lo_id, hi_id if hi_id is not None else _MAX_SNOWFLAKE),
+        ).fetchall()
+    finally:
+        con.close()
+
+    if not rows:
+        return {
+            "threads": 0,
+            "replies": 0,
+            "replies_mean": 0.0,
+            "depth_hist": {},
+            "lifespan_ms": {"p50": None, "p90": None, "max": None, "mean": None},
+            "lifespan_hist": [],
+        }
+    arr = np.array(rows, dtype=np.int64)
+    life = ((arr[:, 1] >> 22) - (arr[:, 0] >> 22)).astype(np.float64)
+    depths, counts = np.unique(arr[:, 2], return_counts=True)
     return {
-        "channels": chans,
-        "global": {"median_ms": gmed, "p95_ms": gp95, "n": int(sum(global_hist))},
+        "threads": len(rows),
+        "replies": int(arr[:, 3].sum()),
+        "replies_mean": float(arr[:, 3].mean()),
+        "depth_hist": {int(d): int(n) for d, n in zip(depths, counts)},
+        "lifespan_ms": {
+            "p50": float(np.percentile(life, 50)),
+            "p90": float(np.percentile(life, 90)),
+            "max": float(life.max()),
+            "mean": float(life.mean()),
+        },
+        "lifespan_hist": analytics.log2_hist(life, max_bucket=31).tolist(),
     }
 
 
-def get_content_stats(guild_id: int, start_day: str, end_day: str) -> Dict[str, Any]:
+def _vocab_sizes(
+    con: sqlite3.Connection,
+    guild_id: int,
+    bounds: Tuple[int, int],
+    mode: str,
+    via: str = "numpy",
+) -> Dict[int, float]:
+    """Distinct tokens per user over day ``bounds``: exact, or HLL estimates."""
+    if mode != "hll":
+        rows = con.execute(
+            """
+            SELECT user_id, COUNT(DISTINCT token_id)
+            FROM user_token_daily
+            WHERE guild_id=? AND day BETWEEN ? AND ?
+            GROUP BY user_id
+            """,
+            (guild_id, *bounds),
+        )
+        return {int(u): float(n) for u, n in rows}
+    if via == "sqlite":
+        rows = con.execute(
+            """
+            SELECT user_id, hll_count(regs)
+            FROM user_token_hll
+            WHERE guild_id=? AND day BETWEEN ? AND ?
+            GROUP BY user_id
+            """,
+            (guild_id, *bounds),
+        )
+        return {int(u): float(n) for u, n in rows}
+    rows = con.execute(
+        "SELECT user_id, regs FROM user_token_hll WHERE guild_id=? AND day BETWEEN ? AND ?",
+        (guild_id, *bounds),
+    )
+    return {int(u): n for u, n in hll.union_by_key(rows).items()}
+
+
+def get_vocab_sizes(
+    guild_id: int,
+    start_day: Optional[str],
+    end_day: Optional[str],
+    *,
+    mode: Optional[str] = None,
+    via: str = "numpy",
+) -> Dict[int, float]:
+    """
+    Distinct tokens per user in [start_day, end_day]. ``mode`` is "exact" or
+    "hll" (default: TTR_MODE); HLL sketches merge in NumPy, or with
+    ``via="sqlite"`` in the registered hll_count aggregate.
+    """
+    con = connect(readonly=True)
+    try:
+        return _vocab_sizes(
+            con,
+            guild_id,
+            _key_bounds("day", start_day, end_day),
+            mode or TTR_MODE,
+            via,
+        )
+    finally:
+        con.close()
+
+
+def get_content_stats(
+    guild_id: int, start_day: str, end_day: str, *, ttr_mode: Optional[str] = None
+) -> Dict[str, Any]:
     """
     Returns totals + words/msg, url rate, lexical diversity by user, and optional sentiment coverage.
+    ``ttr_mode`` picks the diversity source ("exact" / "hll", default TTR_MODE).
     """
-    con = connect()
+    con = connect(readonly=True)
     try:
         cur = con.cursor()
         rows = cur.execute(
@@ -993,17 +1789,14 @@ def get_content_stats(guild_id: int, start_day: str, end_day: str) -> Dict[str,
             WHERE guild_id=? AND day BETWEEN ? AND ?
             GROUP BY user_id
             """,
-            (guild_id, start_day, end_day),
-        ).fetchall()
-        tok_rows = cur.execute(
-            """
-            SELECT user_id, COUNT(DISTINCT token) AS uniq
-            FROM user_token_daily
-            WHERE guild_id=? AND day BETWEEN ? AND ?
-            GROUP BY user_id
-            """,
-            (guild_id, start_day, end_day),
+            (guild_id, *_key_bounds("day", start_day, end_day)),
         ).fetchall()
+        uniq_by_user = _vocab_sizes(
+            con,
+            guild_id,
+            _key_bounds("day", start_day, end_day),
+            ttr_mode or TTR_MODE,
+        )
         sent_rows = cur.execute(
             """
             SELECT user_id, SUM(n) AS n, SUM(sum_compound) AS csum
@@ -1011,69 +1804,93 @@ def get_content_stats(guild_id: int, start_day: str, end_day: str) -> Dict[str,
             WHERE guild_id=? AND day BETWEEN ? AND ?
             GROUP BY user_id
             """,
-            (guild_id, start_day, end_day),
+            (guild_id, *_key_bounds("day", start_day, end_day)),
         ).fetchall()
     finally:
         con.close()
 
-    # totals
-    total_msgs = sum(int(r["m"] or 0) for r in rows)
-    total_words = sum(int(r["w"] or 0) for r in rows)
-    url_msgs = sum(int(r["u"] or 0) for r in rows)
-    words_per_msg_samples: List[float] = []
-    for r in rows:
-        m = int(r["m"] or 0)
-        w = int(r["w"] or 0)
-        if m > 0:
-            words_per_msg_samples.append(w / m)
-    words_per_msg_mean = (
-        float(sum(words_per_msg_samples) / len(words_per_msg_samples))
-        if words_per_msg_samples
-        else 0.0
-    )
-    words_per_msg_median = (
-        float(sorted(words_per_msg_samples)[len(words_per_msg_samples) // 2])
-        if words_per_msg_samples
-        else 0.0
-    )
-    url_rate = (url_msgs / total_msgs) if total_msgs else 0.0
-
-    uniq_by_user = {int(r["user_id"]): int(r["uniq"]) for r in tok_rows}
-    ttr_by_user: Dict[int, float] = {}
-    for r in rows:
-        uid = int(r["user_id"])
-        m = int(r["m"] or 0)
-        w = int(r["w"] or 0)
-        denom = max(1, w)
-        ttr_by_user[uid] = float(uniq_by_user.get(uid, 0)) / float(denom)
-
-    # sentiment coverage + mean/median compound if stored
-    cov = 0.0
-    comp_samples: List[float] = []
-    n_scored = sum(int(r["n"] or 0) for r in sent_rows)
-    if total_msgs:
-        cov = float(n_scored) / float(total_msgs)
-    for r in sent_rows:
-        n = int(r["n"] or 0)
-        if n:
-            comp = float(r["csum"] or 0.0) / float(n)
-            comp = max(-1.0, min(1.0, comp))
-            comp_samples.append(comp)
-    comp_mean = float(sum(comp_samples) / len(comp_samples)) if comp_samples else None
-    comp_median = (
-        float(sorted(comp_samples)[len(comp_samples) // 2]) if comp_samples else None
-    )
+    return analytics.content_summary(rows, uniq_by_user, sent_rows)
+
+
+# ────────────────────────────────
+# Active users (bitmaps)
+# ────────────────────────────────
+
+
+def _active_bits(
+    con: sqlite3.Connection, guild_id: int, lo: int, hi: int
+) -> np.ndarray:
+    """active_daily for days lo..hi as a (days x bytes) matrix; gaps are empty rows."""
+    return bitmaps.active_matrix(con, guild_id, lo, hi)
+
+
+def get_active_users(guild_id: int, start_day: str, end_day: str) -> Dict[str, Any]:
+    """
+    Daily DAU / WAU / MAU (trailing 7 and 30 days, inclusive) and stickiness
+    (DAU / MAU) for every day in [start_day, end_day], plus distinct actives
+    over the whole range.
+    """
+    lo, hi = day_num(start_day), day_num(end_day)
+    con = connect(readonly=True)
+    try:
+        bits = _active_bits(con, guild_id, lo - 29, hi)
+    finally:
+        con.close()
 
+    dau = bitmaps.popcount(bits)[29:]
+    wau = bitmaps.popcount(bitmaps.rolling_union(bits, 7))[29:]
+    mau = bitmaps.popcount(bitmaps.rolling_union(bits, 30))[29:]
+    sticky = np.divide(dau, mau, out=np.zeros(len(dau)), where=mau > 0)
+    total = int(bitmaps.popcount(np.bitwise_or.reduce(bits[29:], axis=0)))
     return {
-        "total_messages": int(total_msgs),
-        "total_words": int(total_words),
-        "words_per_msg_mean": words_per_msg_mean,
-        "words_per_msg_median": words_per_msg_median,
-        "url_rate": float(url_rate),
-        "lexical_diversity_by_user": ttr_by_user,
-        "sentiment": {
-            "coverage": float(cov),
-            "compound_mean": comp_mean,
-            "compound_median": comp_median,
-        },
+        "days": [day_str(d) for d in range(lo, hi + 1)],
+        "dau": dau.tolist(),
+        "wau": wau.tolist(),
+        "mau": mau.tolist(),
+        "stickiness": sticky.tolist(),
+        "active_users": total,
+        "dau_mean": float(dau.mean()) if len(dau) else 0.0,
     }
+
+
+def get_retention(
+    guild_id: int,
+    start_day: str,
+    end_day: str,
+    *,
+    period_days: int = 7,
+    periods: int = 8,
+) -> Dict[str, Any]:
+    """
+    Cohort retention. Cohorts are the members first active in each
+    ``period_days`` period starting at start_day (up to end_day); for each,
+    how many were active again in each of the next ``periods`` periods.
+    Period 0 is the cohort itself. ``period_days=1`` gives N-day retention.
+    """
+    period_days = max(1, int(period_days))
+    periods = max(1, int(periods))
+    lo, end = day_num(start_day), day_num(end_day)
+    n_cohorts = (end - lo) // period_days + 1
+    n_total = n_cohorts + periods - 1
+    hi = lo + n_total * period_days - 1
+
+    con = connect(readonly=True)
+    try:
+        bits = _active_bits(con, guild_id, lo, hi)
+        seen = bitmaps.active_before(con, guild_id, lo)
+    finally:
+        con.close()
+
+    cohorts = []
+    for k, (size, retained) in enumerate(
+        bitmaps.retention(bits, seen, period_days, periods)
+    ):
+        cohorts.append(
+            {
+                "start": day_str(lo + k * period_days),
+                "size": size,
+                "retained": retained,
+                "rate": [(r / size) if size else 0.0 for r in retained],
+            }
+        )
+    return {"period_days": period_days, "periods": periods, "cohorts": cohorts}
@@ -5,31 +5,6 @@ from typing import List, Optional
 
 from ..db import connect as db_connect
 
-# --- Schema ---
-
-TABLE_SQL = """
-CREATE TABLE IF NOT EXISTS birthdays (
-    guild_id            INTEGER NOT NULL,
-    user_id             INTEGER NOT NULL,
-    month               INTEGER NOT NULL CHECK (month BETWEEN 1 AND 12),
-    day                 INTEGER NOT NULL CHECK (day BETWEEN 1 AND 31),
-    tz                  TEXT NOT NULL,
-    last_congrats_year  INTEGER,
-    closeness_level     INTEGER,  -- 1..5; NULL -> default handling
-    PRIMARY KEY (guild_id, user_id)
-);
-"""
-
-INDEX_SQL = """
-CREATE INDEX IF NOT EXISTS idx_birthdays_guild_month_day ON birthdays (guild_id, month, day);
-"""
-
-# Backfill/migration: add closeness_level if old table exists without it
-ALTERS = [
-    ("PRAGMA table_info(birthdays)", "closeness_level"),
-    ("ALTER TABLE birthdays ADD COLUMN closeness_level INTEGER", None),
-]
-
 
 @dataclass
 class Birthday:
@@ -42,23 +17,6 @@ class Birthday:
     closeness_level: Optional[int]  # 1..5 or None
 
 
-# --- DDL ---
-
-
-def ensure_tables() -> None:
-    with db_connect() as con:
-        con.execute(TABLE_SQL)
-        con.execute(INDEX_SQL)
-        # conditional add column
-        try:
-            cols = {row[1] for row in con.execute(ALTERS[0][0]).fetchall()}
-            if ALTERS[0][1] not in cols:
-                con.execute(ALTERS[1][0])
-        except Exception:
-            pass
-        con.commit()
-
-
 # --- CRUD ---
 
 
@@ -107,7 +65,7 @@ def update_birthday(
 
 
 def get_birthday(guild_id: int, user_id: int) -> Optional[Birthday]:
-    with db_connect() as con:
+    with db_connect(readonly=True) as con:
         row = con.execute(
             "SELECT guild_id, user_id, month, day, tz, last_congrats_year, closeness_level "
             "FROM birthdays WHERE guild_id=? AND user_id=?",
@@ -128,7 +86,7 @@ def delete_birthday(guild_id: int, user_id: int) -> bool:
 
 
 def fetch_all_for_guild(guild_id: int) -> List[Birthday]:
-    with db_connect() as con:
+    with db_connect(readonly=True) as con:
         rows = con.execute(
             "SELECT guild_id, user_id, month, day, tz, last_congrats_year, closeness_level "
             "FROM birthdays WHERE guild_id=? ORDER BY month, day, user_id",
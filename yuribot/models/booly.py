@@ -41,33 +41,30 @@ def _row_to_message(row: sqlite3.Row) -> BoolyMessage:
 def fetch_messages(
     scope: BoolyScope, user_id: Optional[int] = None
 ) -> List[BoolyMessage]:
-    con = connect()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    if user_id is None:
-        rows = cur.execute(
-            "SELECT id, scope, user_id, content, created_at, updated_at "
-            "FROM booly_messages WHERE scope=? AND user_id IS NULL ORDER BY id",
-            (scope,),
-        ).fetchall()
-    else:
-        rows = cur.execute(
-            "SELECT id, scope, user_id, content, created_at, updated_at "
-            "FROM booly_messages WHERE scope=? AND user_id=? ORDER BY id",
-            (scope, user_id),
-        ).fetchall()
-    con.close()
+    with connect(readonly=True) as con:
+        con.row_factory = sqlite3.Row
+        cur = con.cursor()
+        if user_id is None:
+            rows = cur.execute(
+                "SELECT id, scope, user_id, content, created_at, updated_at "
+                "FROM booly_messages WHERE scope=? AND user_id IS NULL ORDER BY id",
+                (scope,),
+            ).fetchall()
+        else:
+            rows = cur.execute(
+                "SELECT id, scope, user_id, content, created_at, updated_at "
+                "FROM booly_messages WHERE scope=? AND user_id=? ORDER BY id",
+                (scope, user_id),
+            ).fetchall()
     return [_row_to_message(r) for r in rows]
 
 
 def fetch_all_pools() -> tuple[List[str], List[str], Dict[int, List[str]], List[str]]:
-    con = connect()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    rows = cur.execute(
-        "SELECT id, scope, user_id, content, created_at, updated_at FROM booly_messages ORDER BY id"
-    ).fetchall()
-    con.close()
+    with connect(readonly=True) as con:
+        con.row_factory = sqlite3.Row
+        rows = con.execute(
+            "SELECT id, scope, user_id, content, created_at, updated_at FROM booly_messages ORDER BY id"
+        ).fetchall()
 
     general: List[str] = []
     mod: List[str] = []
@@ -86,30 +83,26 @@ def fetch_all_pools() -> tuple[List[str], List[str], Dict[int, List[str]], List[
 
 
 def fetch_message(message_id: int) -> Optional[BoolyMessage]:
-    con = connect()
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    row = cur.execute(
-        "SELECT id, scope, user_id, content, created_at, updated_at "
-        "FROM booly_messages WHERE id=?",
-        (message_id,),
-    ).fetchone()
-    con.close()
+    with connect(readonly=True) as con:
+        con.row_factory = sqlite3.Row
+        row = con.execute(
+            "SELECT id, scope, user_id, content, created_at, updated_at "
+            "FROM booly_messages WHERE id=?",
+            (message_id,),
+        ).fetchone()
     return _row_to_message(row) if row else None
 
 
 def create_message(
     scope: BoolyScope, content: str, user_id: Optional[int] = None
 ) -> BoolyMessage:
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, ?, ?)",
-        (scope, user_id, content),
-    )
-    message_id = cur.lastrowid
-    con.commit()
-    con.close()
+    with connect() as con:
+        cur = con.cursor()
+        cur.execute(
+            "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, ?, ?)",
+            (scope, user_id, content),
+        )
+        message_id = cur.lastrowid
     created = fetch_message(int(message_id))
     if not created:
         raise RuntimeError("Failed to create booly message")
@@ -117,53 +110,39 @@ def create_message(
 
 
 def update_message(message_id: int, content: str) -> Optional[BoolyMessage]:
-    con = connect()
-    cur = con.cursor()
-    cur.execute(
-        "UPDATE booly_messages SET content=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
-        (content, message_id),
-    )
-    con.commit()
-    con.close()
+    with connect() as con:
+        con.execute(
+            "UPDATE booly_messages SET content=?, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+            (content, message_id),
+        )
     return fetch_message(message_id)
 
 
 def delete_message(message_id: int) -> bool:
-    con = connect()
-    cur = con.cursor()
-    cur.execute("DELETE FROM booly_messages WHERE id=?", (message_id,))
-    deleted = cur.rowcount > 0
-    con.commit()
-    con.close()
-    return deleted
+    with connect() as con:
+        cur = con.execute("DELETE FROM booly_messages WHERE id=?", (message_id,))
+        return cur.rowcount > 0
 
 
 def ensure_seed_data() -> None:
-    con = connect()
-    cur = con.cursor()
-    count = cur.execute("SELECT COUNT(1) FROM booly_messages").fetchone()[0]
-    if count:
-        con.close()
-        return
-    cur.executemany(
-        "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, ?, ?)",
-        DEFAULT_BOOLY_ROWS,
-    )
-    con.commit()
-    con.close()
+    with connect() as con:
+        count = con.execute("SELECT COUNT(1) FROM booly_messages").fetchone()[0]
+        if count:
+            return
+        con.executemany(
+            "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, ?, ?)",
+            DEFAULT_BOOLY_ROWS,
+        )
 
 
 def bulk_replace(
     scope: BoolyScope, messages: Iterable[Tuple[Optional[int], str]]
 ) -> None:
-    con = connect()
-    cur = con.cursor()
     if scope == SCOPE_PERSONAL:
         raise ValueError("Use dedicated functions for personal scope")
-    cur.execute("DELETE FROM booly_messages WHERE scope=?", (scope,))
-    cur.executemany(
-        "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, NULL, ?)",
-        [(scope, content) for _, content in messages],
-    )
-    con.commit()
-    con.close()
+    with connect() as con:
+        con.execute("DELETE FROM booly_messages WHERE scope=?", (scope,))
+        con.executemany(
+            "INSERT INTO booly_messages (scope, user_id, content) VALUES (?, NULL, ?)",
+            [(scope, content) for _, content in messages],
+        )
@@ -2,6 +2,13 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 
+from shared.snowflakes import (
+    DISCORD_EPOCH_MS,
+    snowflake_at,
+    snowflake_day_range,
+    snowflake_time_ms,
+)
+
 
 def now_iso_utc() -> str:
     """Current UTC timestamp as ISO8601 (seconds resolution)."""
@@ -22,4 +29,11 @@ def iso_parts(when_iso: str) -> tuple[str, str, str, int]:
     )
 
 
-__all__ = ["iso_parts", "now_iso_utc"]
+__all__ = [
+    "DISCORD_EPOCH_MS",
+    "iso_parts",
+    "now_iso_utc",
+    "snowflake_at",
+    "snowflake_day_range",
+    "snowflake_time_ms",
+]
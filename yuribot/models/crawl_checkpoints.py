@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping
+
+from ..db import connect
+from .common import now_iso_utc as _now_iso_utc
+
+JOB_ACTIVITY = "activity"
+JOB_ARCHIVE = "archive"
+
+
+@dataclass
+class Checkpoint:
+    channel_id: int
+    last_message_id: int
+    since_id: int
+    complete: bool
+
+
+def load(job: str, guild_id: int) -> Dict[int, Checkpoint]:
+    with connect(readonly=True) as con:
+        rows = con.execute(
+            """
+            SELECT channel_id, last_message_id, since_id, complete
+            FROM crawl_checkpoints WHERE job=? AND guild_id=?
+            """,
+            (job, guild_id),
+        ).fetchall()
+    return {
+        int(r[0]): Checkpoint(int(r[0]), int(r[1]), int(r[2]), bool(r[3]))
+        for r in rows
+    }
+
+
+def advance(
+    job: str,
+    guild_id: int,
+    marks: Mapping[int, int],
+    completed: Iterable[int] = (),
+    *,
+    since_ids: Mapping[int, int] | None = None,
+) -> None:
+    """
+    Record committed progress: ``marks`` maps channel_id -> newest committed
+    snowflake; channels in ``completed`` are flagged done. ``since_ids`` gives
+    the crawl lower bound per channel (default 0 = full history).
+    """
+    since_ids = since_ids or {}
+    done = set(int(c) for c in completed)
+    now = _now_iso_utc()
+    rows = [
+        (
+            job,
+            guild_id,
+            int(cid),
+            int(mid),
+            int(since_ids.get(cid, 0)),
+            1 if cid in done else 0,
+            now,
+        )
+        for cid, mid in marks.items()
+    ]
+    rows.extend(
+        (job, guild_id, cid, 0, int(since_ids.get(cid, 0)), 1, now)
+        for cid in done
+        if cid not in marks
+    )
+    if not rows:
+        return
+    with connect() as con:
+        con.executemany(
+            """
+            INSERT INTO crawl_checkpoints
+              (job, guild_id, channel_id, last_message_id, since_id, complete, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job, guild_id, channel_id) DO UPDATE SET
+              last_message_id = CASE WHEN excluded.last_message_id > 0
+                                     THEN excluded.last_message_id
+                                     ELSE last_message_id END,
+              since_id        = excluded.since_id,
+              complete        = excluded.complete,
+              updated_at      = excluded.updated_at
+            """,
+            rows,
+        )
+        con.commit()
+
+
+def reset(job: str, guild_id: int) -> int:
+    with connect() as con:
+        cur = con.execute(
+            "DELETE FROM crawl_checkpoints WHERE job=? AND guild_id=?",
+            (job, guild_id),
+        )
+        con.commit()
+        return cur.rowcount
@@ -49,7 +49,7 @@ def upsert_guild_cfg(
 
 def get_guild_cfg(guild_id: int) -> Optional[Dict[str, Optional[int]]]:
     """Fetch the reserved clubs row for this guild if present."""
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             """
@@ -102,7 +102,7 @@ def upsert_club_cfg(
 
 
 def get_club_cfg(guild_id: int, club_type: str) -> Optional[Dict[str, int]]:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             """
@@ -125,7 +125,7 @@ def get_club_cfg(guild_id: int, club_type: str) -> Optional[Dict[str, int]]:
 def get_club_by_planning_forum(
     guild_id: int, forum_id: int
 ) -> Optional[Tuple[int, str]]:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             """
@@ -139,7 +139,7 @@ def get_club_by_planning_forum(
 
 def get_club_map(guild_id: int) -> Dict[str, Dict[str, int | str | None]]:
     """Return mapping of club slug to stored configuration details."""
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         rows = cur.execute(
             """
@@ -35,7 +35,7 @@ def mu_register_thread_series(
 
 
 def mu_get_thread_series(thread_id: int, guild_id: int | None = None) -> str | None:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         if guild_id is None:
             row = cur.execute(
@@ -123,7 +123,7 @@ def mu_bulk_upsert_releases(series_id: str, items: list[dict]) -> list[int]:
 
 
 def mu_latest_release_ts(series_id: str) -> int:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             "SELECT COALESCE(MAX(release_ts), -1) FROM mu_releases WHERE series_id=?",
@@ -139,7 +139,7 @@ def mu_list_unposted_for_thread(
     Return releases NOT yet posted in thread (ordered by release_ts asc, unknowns first).
     Columns: (release_id, title, raw_title, description, volume, chapter, subchapter, group_name, url, release_ts)
     """
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         rows = cur.execute(
             """
@@ -191,7 +191,7 @@ def mu_mark_posted(
 
 
 def mu_get_release(series_id: str, release_id: int) -> dict | None:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             """
@@ -219,7 +219,7 @@ def mu_get_release(series_id: str, release_id: int) -> dict | None:
 
 def mu_list_links_for_guild(guild_id: int) -> list[tuple[int, str, str]]:
     """Returns [(thread_id, series_id, series_title)] newest threads first when possible."""
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         rows = cur.execute(
             """
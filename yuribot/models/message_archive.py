@@ -7,10 +7,12 @@ from typing import Iterable, Sequence, Tuple, Dict, Any, Iterator
 import re
 import html
 import discord
+from shared.fts import fts_query
 
 # Public DB surface for other modules (e.g., cogs) to use.
 # connect() must return a sqlite3.Connection-compatible object.
-from ..db import connect
+from ..db import WriteBuffer, connect, env_int
+from .common import snowflake_at, snowflake_time_ms
 
 _EMOJI_RE = re.compile(
     "["
@@ -141,7 +143,7 @@ def from_discord_message(message: "discord.Message") -> ArchivedMessage:
 
 def get_connection():
     """
-    Return a *new* connection to the archive DB.
+    Lease a pooled connection to the archive DB.
 
     Consumers that need a context-managed connection can do:
         with get_connection() as con:
@@ -157,7 +159,7 @@ def stats_summary(guild_id: int) -> Dict[str, int]:
 
     Uses the existing `message_archive` table and its columns.
     """
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         cur.execute(
             "SELECT COUNT(*) FROM message_archive WHERE guild_id=?",
@@ -188,7 +190,7 @@ def iter_guild_messages(
     before_message_id: int | None = None,
     chunk_size: int = 500,
 ) -> Iterator[ArchivedMessage]:
-    """Yield archived messages for a guild ordered by timestamp then id."""
+    """Yield archived messages for a guild in snowflake (= creation time) order."""
 
     conditions: list[str] = ["guild_id=?"]
     params: list[object] = [guild_id]
@@ -208,10 +210,10 @@ def iter_guild_messages(
         "SELECT message_id, guild_id, channel_id, author_id, message_type, created_at, content, "
         "edited_at, attachments_json, embeds_json, reactions, reply_to_id "
         f"FROM message_archive WHERE {where_clause} "
-        "ORDER BY created_at ASC, message_id ASC"
+        "ORDER BY message_id ASC"
     )
 
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         cur.execute(sql, params)
         while True:
@@ -222,6 +224,64 @@ def iter_guild_messages(
                 yield ArchivedMessage(*row)
 
 
+def scan_guild_messages(
+    guild_id: int,
+    *,
+    after_message_id: int = 0,
+    before_message_id: int | None = None,
+    chunk_size: int = 2000,
+) -> Iterator[ArchivedMessage]:
+    """
+    Yield archived messages for a guild in snowflake (message_id) order.
+
+    Pages by keyset on the primary key, taking a fresh read per page so a
+    long scan never pins one WAL snapshot.
+    """
+    chunk_size = max(1, int(chunk_size))
+    last = int(after_message_id or 0)
+    upper = "AND message_id<? " if before_message_id is not None else ""
+    sql = (
+        "SELECT message_id, guild_id, channel_id, author_id, message_type, created_at, content, "
+        "edited_at, attachments_json, embeds_json, reactions, reply_to_id "
+        f"FROM message_archive WHERE message_id>? {upper}AND guild_id=? "
+        "ORDER BY message_id ASC LIMIT ?"
+    )
+    while True:
+        params: list[object] = [last]
+        if before_message_id is not None:
+            params.append(before_message_id)
+        params.extend((guild_id, chunk_size))
+        with connect(readonly=True) as con:
+            rows = con.execute(sql, params).fetchall()
+        for row in rows:
+            yield ArchivedMessage(*row)
+        if len(rows) < chunk_size:
+            return
+        last = int(rows[-1][0])
+
+
+
+def scan_replies(
+    guild_id: int, *, after_message_id: int = 0, chunk_size: int = 5000
+) -> Iterator[tuple[int, int]]:
+    """Yield (message_id, reply_to_id) for a guild's replies in snowflake order."""
+    chunk_size = max(1, int(chunk_size))
+    last = int(after_message_id or 0)
+    sql = (
+        "SELECT message_id, reply_to_id FROM message_archive "
+        "WHERE message_id>? AND guild_id=? AND reply_to_id IS NOT NULL "
+        "ORDER BY message_id ASC LIMIT ?"
+    )
+    while True:
+        with connect(readonly=True) as con:
+            rows = con.execute(sql, (last, guild_id, chunk_size)).fetchall()
+        for mid, parent in rows:
+            yield int(mid), int(parent)
+        if len(rows) < chunk_size:
+            return
+        last = int(rows[-1][0])
+
+
 # ---- Existing archiver types & functions ----
 
 
@@ -442,7 +502,7 @@ def upsert_many(
 
 
 def max_message_id(guild_id: int, channel_id: int) -> int | None:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             "SELECT MAX(message_id) FROM message_archive WHERE guild_id=? AND channel_id=?",
@@ -453,10 +513,110 @@ def max_message_id(guild_id: int, channel_id: int) -> int | None:
 
 
 def has_message(message_id: int) -> bool:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             "SELECT 1 FROM message_archive WHERE message_id=? LIMIT 1",
             (message_id,),
         ).fetchone()
     return bool(row)
+
+
+# Live listener: rows are buffered and written with upsert_many() in one
+# transaction per flush (the cog flushes on size, on a timer and on unload).
+live_buffer: WriteBuffer[ArchivedMessage] = WriteBuffer(
+    upsert_many,
+    max_items=env_int("ARCHIVE_FLUSH_MESSAGES", 100),
+    max_delay_ms=env_int("ARCHIVE_FLUSH_MS", 2000),
+)
+
+
+# ---- Full-text search (FTS5, external content) ----
+
+# message_archive_fts is an external-content index (yuribot.migrations): it
+# stores only tokens, and snippets are read back from message_archive.content
+# through the rowid (= message_id).
+
+@dataclass(slots=True)
+class SearchHit:
+    message_id: int
+    channel_id: int
+    author_id: int
+    created_at: str
+    snippet: str
+
+    @property
+    def created_ts(self) -> float:
+        """Unix seconds, from the snowflake."""
+        return snowflake_time_ms(self.message_id) / 1000.0
+
+
+def search(
+    guild_id: int,
+    query: str,
+    *,
+    author_id: int | None = None,
+    channel_id: int | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    before_id: int | None = None,
+    limit: int = 10,
+    offset: int = 0,
+    highlight: tuple[str, str] = ("**", "**"),
+) -> list[SearchHit]:
+    """
+    Newest-first full-text search over a guild's archive.
+
+    Date bounds become snowflake bounds on the primary key; ``before_id`` is
+    a keyset cursor (pass the last hit's message_id to get the next page).
+    """
+    match = fts_query(query)
+    if not match:
+        return []
+    conditions = ["message_archive_fts MATCH ?", "a.guild_id=?"]
+    params: list[object] = [match, guild_id]
+    if author_id is not None:
+        conditions.append("a.author_id=?")
+        params.append(author_id)
+    if channel_id is not None:
+        conditions.append("a.channel_id=?")
+        params.append(channel_id)
+    if since is not None:
+        conditions.append("f.rowid>=?")
+        params.append(snowflake_at(since))
+    if until is not None:
+        conditions.append("f.rowid<?")
+        params.append(snowflake_at(until))
+    if before_id is not None:
+        conditions.append("f.rowid<?")
+        params.append(before_id)
+    sql = (
+        "SELECT a.message_id, a.channel_id, a.author_id, a.created_at, "
+        "snippet(message_archive_fts, 0, ?, ?, '…', 24) "
+        "FROM message_archive_fts f JOIN message_archive a ON a.message_id = f.rowid "
+        f"WHERE {' AND '.join(conditions)} "
+        "ORDER BY f.rowid DESC LIMIT ? OFFSET ?"
+    )
+    with connect(readonly=True) as con:
+        rows = con.execute(
+            sql,
+            [
+                highlight[0],
+                highlight[1],
+                *params,
+                max(1, int(limit)),
+                max(0, int(offset)),
+            ],
+        ).fetchall()
+    return [SearchHit(*row) for row in rows]
+
+
+def rebuild_search_index() -> None:
+    """Re-derive message_archive_fts from message_archive and merge segments."""
+    with connect() as con:
+        for command in ("rebuild", "optimize"):
+            con.execute(
+                "INSERT INTO message_archive_fts(message_archive_fts) VALUES (?)",
+                (command,),
+            )
+        con.commit()
@@ -44,7 +44,7 @@ def add_mod_action(
 def list_mod_actions_for_user(
     guild_id: int, target_user_id: int, limit: int = 20
 ) -> List[Tuple]:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         return cur.execute(
             """
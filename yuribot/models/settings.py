@@ -20,7 +20,7 @@ def set_mod_logs_channel(guild_id: int, channel_id: int) -> None:
 
 
 def get_mod_logs_channel(guild_id: int) -> Optional[int]:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             "SELECT mod_logs_channel_id FROM guild_settings WHERE guild_id=?",
@@ -44,7 +44,7 @@ def set_bot_logs_channel(guild_id: int, channel_id: int) -> None:
 
 
 def get_bot_logs_channel(guild_id: int) -> Optional[int]:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             "SELECT bot_logs_channel_id FROM guild_settings WHERE guild_id=?",
@@ -70,7 +70,7 @@ def set_welcome_settings(guild_id: int, channel_id: int, image_filename: str) ->
 
 
 def get_welcome_settings(guild_id: int) -> Optional[Dict[str, str | int]]:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             """
@@ -102,7 +102,7 @@ def set_mu_forum_channel(guild_id: int, channel_id: int) -> None:
 
 
 def get_mu_forum_channel(guild_id: int) -> int | None:
-    with connect() as con:
+    with connect(readonly=True) as con:
         cur = con.cursor()
         row = cur.execute(
             "SELECT mu_forum_channel_id FROM guild_settings WHERE guild_id=?",
@@ -128,20 +128,7 @@ def _conn():
     from .. import db as _db
     return _db.connect()
 
-def _ensure_kv_table():
-    with _conn() as c:
-        c.execute(
-            """CREATE TABLE IF NOT EXISTS guild_kv (
-                guild_id INTEGER NOT NULL,
-                key      TEXT    NOT NULL,
-                value    TEXT,
-                PRIMARY KEY (guild_id, key)
-            )"""
-        )
-        c.commit()
-
 def get_guild_setting(guild_id: int, key: str, default=None):
-    _ensure_kv_table()
     with _conn() as c:
         cur = c.execute(
             "SELECT value FROM guild_kv WHERE guild_id=? AND key=?",
@@ -151,7 +138,6 @@ def get_guild_setting(guild_id: int, key: str, default=None):
         return row[0] if row else default
 
 def set_guild_setting(guild_id: int, key: str, value: str | None):
-    _ensure_kv_table()
     with _conn() as c:
         c.execute(
             "INSERT INTO guild_kv (guild_id, key, value) VALUES (?, ?, ?) "
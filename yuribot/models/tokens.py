@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+
+from ..db import env_int
+
+# The tokens table is append-only: an id never changes meaning, so cached
+# ids stay valid for the life of the process.
+
+_CHUNK = 500  # stay under SQLITE_MAX_VARIABLE_NUMBER on old builds
+
+
+class TokenDictionary:
+    """
+    text -> id interning for the ``tokens`` table with an in-process LRU.
+
+    ``ids()`` runs inside the caller's write transaction and inserts unseen
+    texts. Ids it had to read from the database only enter the LRU on
+    ``commit()``: after a rollback SQLite may hand the same id to another
+    text, so ``rollback()`` discards them. Pending ids are per thread, so the
+    writer thread and an offline rebuild can both ingest.
+    """
+
+    def __init__(self, capacity: int = 50_000):
+        self.capacity = max(1, int(capacity))
+        self._lru: OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _pending(self) -> Dict[str, int]:
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = {}
+        return pending
+
+    def ids(self, con, texts: Iterable[str]) -> Dict[str, int]:
+        """Map every text to its id, inserting new ones (caller commits)."""
+        out: Dict[str, int] = {}
+        pending = self._pending()
+        missing: List[str] = []
+        with self._lock:
+            for text in set(texts):
+                tid = self._lru.get(text)
+                if tid is not None:
+                    self._lru.move_to_end(text)
+                    out[text] = tid
+                    continue
+                tid = pending.get(text)
+                if tid is not None:
+                    out[text] = tid
+                else:
+                    missing.append(text)
+            self.hits += len(out)
+            self.misses += len(missing)
+        if not missing:
+            return out
+
+        found = self._select(con, missing)
+        unseen = [t for t in missing if t not in found]
+        if unseen:
+            con.executemany(
+                "INSERT OR IGNORE INTO tokens(text) VALUES(?)",
+                [(t,) for t in unseen],
+            )
+            found.update(self._select(con, unseen))
+        pending.update(found)
+        out.update(found)
+        return out
+
+    @staticmethod
+    def _select(con, texts: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for i in range(0, len(texts), _CHUNK):
+            chunk = texts[i : i + _CHUNK]
+            marks = ",".join("?" * len(chunk))
+            for tid, text in con.execute(
+                f"SELECT id, text FROM tokens WHERE text IN ({marks})", chunk
+            ):
+                found[str(text)] = int(tid)
+        return found
+
+    def commit(self) -> None:
+        """The transaction that resolved the pending ids has committed."""
+        pending = self._pending()
+        if not pending:
+            return
+        with self._lock:
+            self._lru.update(pending)
+            while len(self._lru) > self.capacity:
+                self._lru.popitem(last=False)
+        pending.clear()
+
+    def rollback(self) -> None:
+        self._pending().clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "cached": len(self._lru),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+dictionary = TokenDictionary(env_int("TOKEN_CACHE_SIZE", 50_000))
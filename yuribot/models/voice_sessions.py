@@ -7,33 +7,6 @@ from typing import Optional
 
 log = logging.getLogger(__name__)
 
-TABLE_SQL = """
-CREATE TABLE IF NOT EXISTS voice_sessions (
-    session_id          INTEGER PRIMARY KEY AUTOINCREMENT,
-    guild_id            INTEGER NOT NULL,
-    user_id             INTEGER NOT NULL,
-    channel_id          INTEGER NOT NULL,
-    join_time           TEXT NOT NULL,
-    leave_time          TEXT,
-    duration_seconds    INTEGER,
-    -- For backfilled data
-    join_message_id     INTEGER UNIQUE,
-    leave_message_id    INTEGER UNIQUE
-)
-"""
-INDEX_SQL = """
-CREATE INDEX IF NOT EXISTS idx_voice_sessions_user ON
-voice_sessions (guild_id, user_id, join_time)
-"""
-
-
-def ensure_table() -> None:
-    """Creates the voice_sessions table and index if they don't exist."""
-    with connect() as con:
-        con.execute(TABLE_SQL)
-        con.execute(INDEX_SQL)
-        con.commit()
-
 
 def open_live_session(
     guild_id: int, user_id: int, channel_id: int, join_time: datetime
@@ -115,7 +88,7 @@ def get_last_processed_log_id(guild_id: int) -> Optional[int]:
     Finds the newest botlog message ID (join or leave) we have
     processed for this guild, to allow resumable backfills.
     """
-    with connect() as con:
+    with connect(readonly=True) as con:
         row = con.execute(
             """
             SELECT MAX(MAX(join_message_id), MAX(leave_message_id))
@@ -1033,9 +1033,14 @@ _STRINGS.update(
         "archive.backfill.already_running": "An archive task is already running for this server.",
         "archive.backfill.starting": "Starting archive task. This will take a long time. I will send updates as I go.",
         "archive.backfill.found_channels": "Found {count} text-based channels and threads to scan.",
-        "archive.backfill.progress_update": "Progress: Archived {count} new messages from {channel}...",
+        "archive.backfill.resuming": "Resuming from saved progress: {complete} complete channels only fetch new messages, {partial} continue a partial archive.",
+        "archive.backfill.progress": "Progress: {done}/{total} channels scanned, {messages} messages archived ({rate} msg/s)...",
         "archive.backfill.complete": "Archive task complete. Scanned {channels} channels and archived {messages} new messages.",
         "archive.backfill.error": "An error occurred during the archive: {err}",
+        "archive.search.title": "Archive search: {query} (page {page})",
+        "archive.search.no_results": "No archived messages match `{query}`.",
+        "archive.search.error": "Search failed. Check the query and try again.",
+        "archive.reindex.done": "Search index rebuilt in {seconds}s.",
         # Hints / field help
         "birthday.hint.mmdd": {
             "neutral": "Birthday in MM-DD format (e.g. 04-13)",
@@ -0,0 +1 @@
+"""Offline maintenance entry points (``python -m yuribot.tools.<name>``)."""
@@ -0,0 +1,105 @@
+"""
+Compare exact and HyperLogLog lexical diversity on a real database.
+
+    python -m yuribot.tools.bench_ttr --guild 123 [--start 2025-09-01] [--end 2025-09-30]
+
+Times the per-user distinct-token count over the window three ways — exact
+COUNT(DISTINCT) on user_token_daily, user_token_hll merged in NumPy, and
+merged by the hll_count SQLite aggregate — and reports the estimate error
+against the exact counts plus the on-disk size of both tables. Read-only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="python -m yuribot.tools.bench_ttr",
+        description="Benchmark exact vs HyperLogLog distinct-token counts.",
+    )
+    p.add_argument("--guild", type=int, required=True, help="Guild ID to measure.")
+    p.add_argument("--start", help="First day, YYYY-MM-DD (UTC). Default: all history.")
+    p.add_argument("--end", help="Last day, YYYY-MM-DD (UTC, inclusive). Default: open.")
+    p.add_argument("--db", help="SQLite path (overrides BOT_DB_PATH).")
+    p.add_argument("--repeat", type=int, default=5, help="Timed runs per method.")
+    return p.parse_args(argv)
+
+
+def _time(fn, repeat: int):
+    runs = []
+    result = None
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        result = fn()
+        runs.append((time.perf_counter() - t0) * 1000.0)
+    return result, statistics.median(runs)
+
+
+def _table_bytes(con, table: str) -> int | None:
+    try:
+        row = con.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name=?", (table,)
+        ).fetchone()
+    except Exception:  # dbstat is optional in SQLite builds
+        return None
+    return int(row[0] or 0)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    if args.db:
+        os.environ["BOT_DB_PATH"] = args.db
+
+    # Imported late so --db is honoured by the pool.
+    from ..db import close_pool, connect
+    from ..models import activity_metrics as am
+
+    def run(mode: str, via: str = "numpy"):
+        return am.get_vocab_sizes(
+            args.guild, args.start, args.end, mode=mode, via=via
+        )
+
+    try:
+        exact, t_exact = _time(lambda: run("exact"), args.repeat)
+        est_np, t_np = _time(lambda: run("hll", "numpy"), args.repeat)
+        est_sql, t_sql = _time(lambda: run("hll", "sqlite"), args.repeat)
+        con = connect(readonly=True)
+        try:
+            sizes = {
+                t: _table_bytes(con, t) for t in ("user_token_daily", "tokens", "user_token_hll")
+            }
+        finally:
+            con.close()
+    finally:
+        close_pool()
+
+    errors = [
+        abs(est_np.get(uid, 0.0) - n) / n for uid, n in exact.items() if n > 0
+    ]
+    errors.sort()
+    print(f"guild {args.guild}, {len(exact):,} users, window {args.start or '-'}..{args.end or '-'}")
+    print(f"  exact COUNT(DISTINCT)  {t_exact:9.2f} ms")
+    print(f"  hll merge (numpy)      {t_np:9.2f} ms")
+    print(f"  hll merge (sqlite agg) {t_sql:9.2f} ms")
+    if errors:
+        p95 = errors[min(len(errors) - 1, int(len(errors) * 0.95))]
+        print(
+            f"  relative error: mean {statistics.fmean(errors):.2%}  "
+            f"p95 {p95:.2%}  max {errors[-1]:.2%}"
+        )
+    if any(abs(est_np.get(u, 0.0) - v) > 1e-6 for u, v in est_sql.items()):
+        print("  warning: numpy and sqlite merges disagree", file=sys.stderr)
+    for table, size in sizes.items():
+        if size is not None:
+            print(f"  {table:<18} {size / 1024:10.1f} KiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""
+Rebuild activity metrics for a guild from message_archive, offline.
+
+    python -m yuribot.tools.rebuild_metrics --guild 123 [--start 2025-09-16] [--end 2025-10-31]
+    python -m yuribot.tools.rebuild_metrics --guild 123 --threads
+
+Uses BOT_DB_PATH (or --db) and needs no Discord connection, so it can run
+while the bot is stopped. Safe to run with the bot up as well: writes are
+batched and share the same writer lock discipline. ``--threads`` only
+re-resolves reply chains (thread_index / message_thread), which is much
+cheaper than a full rebuild.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(
+        prog="python -m yuribot.tools.rebuild_metrics",
+        description="Regenerate activity tables from message_archive (no network).",
+    )
+    p.add_argument("--guild", type=int, required=True, help="Guild ID to rebuild.")
+    p.add_argument("--start", help="First day, YYYY-MM-DD (UTC). Default: all history.")
+    p.add_argument("--end", help="Last day, YYYY-MM-DD (UTC, inclusive). Default: open.")
+    p.add_argument("--db", help="SQLite path (overrides BOT_DB_PATH).")
+    p.add_argument("--batch-size", type=int, default=2000, help="Facts per transaction.")
+    p.add_argument(
+        "--threads",
+        action="store_true",
+        help="Only re-resolve reply chains (all history; ignores --start/--end).",
+    )
+    p.add_argument("-q", "--quiet", action="store_true", help="No progress output.")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    if args.db:
+        os.environ["BOT_DB_PATH"] = args.db
+    logging.basicConfig(
+        level=logging.WARNING if args.quiet else logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+    # Imported late so --db is honoured by the pool.
+    from ..db import close_pool, ensure_db
+    from ..models import activity_metrics as am
+
+    ensure_db()
+    started = time.perf_counter()
+
+    def _progress(scanned: int, written: int) -> None:
+        if args.quiet:
+            return
+        rate = scanned / max(time.perf_counter() - started, 1e-6)
+        print(
+            f"\rscanned {scanned:,}  written {written:,}  ({rate:,.0f} msg/s)",
+            end="",
+            file=sys.stderr,
+            flush=True,
+        )
+
+    if args.threads:
+        return _threads(args, am, close_pool)
+
+    try:
+        result = am.rebuild_from_archive(
+            args.guild,
+            args.start,
+            args.end,
+            batch_size=args.batch_size,
+            progress=_progress,
+        )
+    finally:
+        close_pool()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(
+        f"guild {result['guild_id']}: {result['scanned']:,} archived messages, "
+        f"{result['written']:,} facts in {result['batches']} batches, "
+        f"{result['seconds']}s"
+    )
+    return 0
+
+
+def _threads(args, am, close_pool) -> int:
+    def _progress(replies: int) -> None:
+        if not args.quiet:
+            print(f"\rreplies {replies:,}", end="", file=sys.stderr, flush=True)
+
+    try:
+        result = am.rebuild_threads(
+            args.guild, batch_size=args.batch_size, progress=_progress
+        )
+    finally:
+        close_pool()
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(
+        f"guild {result['guild_id']}: {result['replies']:,} archived replies, "
+        f"{result['indexed']:,} indexed in {result['seconds']}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ import discord
 from discord.ext import tasks
 
 from .. import config
+from ..db import aio
 from ..models import bday as model
 from ..ui.bday import select_birthday_message
 
@@ -125,7 +126,6 @@ class BirthdayService:
         self.loop = self._loop_task
 
     def start(self):
-        model.ensure_tables()
         if not self.loop.is_running():
             self.loop.start()
 
@@ -146,7 +146,7 @@ class BirthdayService:
                 )
 
     async def _check_guild(self, guild: discord.Guild):
-        entries = model.fetch_all_for_guild(guild.id)
+        entries = await aio.run_read(model.fetch_all_for_guild, guild.id)
 
         # Resolve target channel once per guild
         target_ch: Optional[discord.TextChannel] = None
@@ -216,7 +216,9 @@ class BirthdayService:
 
             if delivered:
                 try:
-                    model.mark_congratulated(guild.id, b.user_id, today.year)
+                    await aio.run_write(
+                        model.mark_congratulated, guild.id, b.user_id, today.year
+                    )
                 except Exception:
                     log.exception(
                         "birthday.mark_failed",
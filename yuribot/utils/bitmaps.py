@@ -0,0 +1,40 @@
+"""
+Packed bitmaps over dense per-guild member indexes (active-user rollups).
+
+The helpers live in analytics.bitmaps so the dashboard reads the same
+format; this module adds the SQLite ``bits_or`` aggregate hook.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+
+from analytics.bitmaps import (
+    active_before,
+    active_matrix,
+    from_indexes,
+    matrix,
+    month_unions,
+    popcount,
+    retention,
+    rolling_union,
+    union,
+)
+
+__all__ = [
+    "active_before",
+    "active_matrix",
+    "from_indexes",
+    "matrix",
+    "month_unions",
+    "popcount",
+    "register",
+    "retention",
+    "rolling_union",
+    "union",
+]
+
+
+def register(con: sqlite3.Connection) -> None:
+    """Install ``bits_or(a, b)`` (``union``)."""
+    con.create_function("bits_or", 2, union, deterministic=True)
@@ -7,6 +7,7 @@ from typing import Dict, Iterable, List, Optional, Tuple
 
 import discord
 
+from ..db import aio
 from ..models import settings
 
 IGNORED_USER_IDS: set[int] = {
@@ -42,3 +43,17 @@ class BotLogCache:
             log.exception("botlog.lookup_failed", extra={"guild_id": guild_id})
             self._store[guild_id] = (None, now)
             return None
+
+    async def fetch_channel_id(self, guild_id: int) -> Optional[int]:
+        """Async variant of get_channel_id; cache misses read off the event loop."""
+        now = time.monotonic()
+        cached = self._store.get(guild_id)
+        if cached and now - cached[1] < self.ttl:
+            return cached[0]
+        try:
+            channel_id = await aio.run_read(settings.get_bot_logs_channel, guild_id)
+        except Exception:
+            log.exception("botlog.lookup_failed", extra={"guild_id": guild_id})
+            channel_id = None
+        self._store[guild_id] = (channel_id, now)
+        return channel_id
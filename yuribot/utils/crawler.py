@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    TypeVar,
+)
+
+import aiohttp
+import discord
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_DONE = object()  # end-of-channel marker on the item queue
+
+DEFAULT_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4") or 4)
+MAX_CONCURRENCY = 16
+MAX_RETRIES = 5  # per channel, for 429s that outlast discord.py's own retries and 5xx
+
+
+def clamp_concurrency(n: Optional[int]) -> int:
+    if not n or n < 1:
+        return DEFAULT_CONCURRENCY
+    return min(int(n), MAX_CONCURRENCY)
+
+
+def _retry_delay(exc: BaseException, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if Discord sent one, else backoff."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for key in ("Retry-After", "X-RateLimit-Reset-After"):
+        try:
+            value = float(headers.get(key))
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            return min(value, 300.0)
+    return min(2.0**attempt, 60.0)
+
+
+def _is_transient(exc: BaseException) -> bool:
+    if isinstance(exc, discord.HTTPException):
+        status = getattr(exc, "status", 0) or 0
+        return status == 429 or status >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def channel_label(ch: Any) -> str:
+    parent = getattr(ch, "parent", None)
+    if isinstance(ch, discord.Thread) and parent is not None:
+        return f"{parent.name} → {ch.name}"
+    return getattr(ch, "name", str(getattr(ch, "id", "?")))
+
+
+@dataclass
+class ChannelProgress:
+    label: str
+    messages: int = 0
+    started: float = field(default_factory=time.monotonic)
+    finished: Optional[float] = None
+
+    @property
+    def rate(self) -> float:
+        """Messages per second for this channel (so far, or over its run)."""
+        end = self.finished or time.monotonic()
+        dt = max(end - self.started, 1e-6)
+        return self.messages / dt
+
+
+@dataclass
+class CrawlStats:
+    channels_total: int = 0
+    channels_done: int = 0
+    channels_skipped: int = 0
+    messages_fetched: int = 0
+    items_parsed: int = 0
+    items_written: int = 0
+    batches: int = 0
+    errors: int = 0
+    retries: int = 0
+    retry_wait_s: float = 0.0
+    last_errors: List[str] = field(default_factory=list)
+    started: float = field(default_factory=time.monotonic)
+    active: Dict[int, ChannelProgress] = field(default_factory=dict)
+
+    @property
+    def rate(self) -> float:
+        return self.messages_fetched / max(time.monotonic() - self.started, 1e-6)
+
+    def error(self, msg: str) -> None:
+        self.errors += 1
+        self.last_errors.append(msg)
+        if len(self.last_errors) > 1000:
+            del self.last_errors[:500]
+        log.warning("crawl.error %s", msg)
+
+
+class ChannelCrawler(Generic[T]):
+    """
+    Fetch → parse → write pipeline over many channels.
+
+    * ``concurrency`` workers each own one channel/thread at a time, so
+      histories are fetched in parallel. Discord buckets message history per
+      channel and discord.py waits out per-route/global limits from the
+      response headers, so parallel channels use separate buckets instead of
+      queueing behind one. A 429 that outlasts those retries, a 5xx or a
+      dropped connection is waited out (Retry-After, else exponential
+      backoff) and the channel resumes after the last message fetched.
+    * ``parse`` runs per message on the worker and returns an item (or None
+      to skip). Items flow through a bounded queue, so a slow writer applies
+      backpressure to the fetchers.
+    * ``write`` receives batches of up to ``batch_size`` items (or whatever
+      arrived within ``batch_ms``) and returns how many were stored.
+
+    Text channels and forums expand into their active and archived threads
+    when ``expand_threads`` is set.
+
+    Resuming: ``resume`` maps channel_id -> snowflake to continue after
+    (overriding ``after``) and channels in ``skip`` are not fetched (their
+    threads are still expanded). After each successful batch ``checkpoint``
+    is awaited with {channel_id: newest committed snowflake} and the channels
+    whose history has been fully written. A channel whose batch failed is not
+    checkpointed again this run, so a resume never skips over a hole.
+    """
+
+    def __init__(
+        self,
+        *,
+        parse: Callable[[discord.Message], Optional[T]],
+        write: Callable[[List[T]], Awaitable[int]],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        batch_size: int = 500,
+        batch_ms: int = 1000,
+        after: Optional[discord.abc.Snowflake | Any] = None,
+        expand_threads: bool = True,
+        resume: Optional[Dict[int, int]] = None,
+        skip: Optional[Iterable[int]] = None,
+        checkpoint: Optional[
+            Callable[[Dict[int, int], List[int]], Awaitable[None]]
+        ] = None,
+    ):
+        self.parse = parse
+        self.write = write
+        self.concurrency = clamp_concurrency(concurrency)
+        self.batch_size = max(1, int(batch_size))
+        self.batch_ms = max(1, int(batch_ms))
+        self.after = after
+        self.expand_threads = expand_threads
+        self.resume = dict(resume or {})
+        self.skip = set(int(c) for c in (skip or ()))
+        self.checkpoint = checkpoint
+        self.stats = CrawlStats()
+        self._tainted: set[int] = set()
+
+        self._targets: asyncio.Queue = asyncio.Queue()
+        self._items: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 4)
+        self._seen: set[int] = set()
+        self._me: Optional[discord.Member] = None
+
+    # ---- targets ----
+    def _enqueue(self, ch: Any) -> None:
+        cid = int(getattr(ch, "id", 0))
+        if cid in self._seen:
+            return
+        self._seen.add(cid)
+        self.stats.channels_total += 1
+        self._targets.put_nowait(ch)
+
+    async def _expand(self, ch: Any) -> None:
+        for th in list(getattr(ch, "threads", []) or []):
+            self._enqueue(th)
+        try:
+            async for th in ch.archived_threads(limit=None):
+                self._enqueue(th)
+        except discord.Forbidden:
+            self.stats.error(f"{ch.name}: cannot list archived threads (Forbidden)")
+        except Exception as e:
+            self.stats.error(f"{ch.name}: archived threads: {e}")
+
+    # ---- stages ----
+    async def _scan(self, ch: Any) -> None:
+        label = channel_label(ch)
+        if isinstance(ch, discord.ForumChannel):
+            # forum posts are threads; the forum itself has no history
+            if self.expand_threads:
+                await self._expand(ch)
+            self.stats.channels_done += 1
+            return
+
+        me = self._me or getattr(getattr(ch, "guild", None), "me", None)
+        if me is not None and not ch.permissions_for(me).read_message_history:
+            self.stats.channels_skipped += 1
+            self.stats.error(f"Skipping #{label}: missing Read Message History")
+            return
+
+        cid = int(ch.id)
+        if cid in self.skip:
+            self.stats.channels_skipped += 1
+            self.stats.channels_done += 1
+        else:
+            await self._fetch(ch, cid, label)
+
+        if self.expand_threads and isinstance(ch, discord.TextChannel):
+            await self._expand(ch)
+
+    async def _fetch(self, ch: Any, cid: int, label: str) -> None:
+        after = self.after
+        if cid in self.resume:
+            after = discord.Object(id=self.resume[cid])
+        prog = ChannelProgress(label)
+        self.stats.active[cid] = prog
+        finished = False
+        attempt = 0
+        try:
+            while not finished:
+                try:
+                    async for m in ch.history(
+                        limit=None, oldest_first=True, after=after
+                    ):
+                        after = discord.Object(id=m.id)
+                        prog.messages += 1
+                        self.stats.messages_fetched += 1
+                        try:
+                            item = self.parse(m)
+                        except Exception as e:
+                            # as a failed write: the checkpoint stops short of
+                            # it so the next run fetches it again
+                            self.stats.error(f"{label} / msg {m.id}: {e}")
+                            self._tainted.add(cid)
+                            continue
+                        if item is not None:
+                            self.stats.items_parsed += 1
+                        # skipped (None) messages advance the checkpoint too
+                        await self._items.put((cid, int(m.id), item))
+                    finished = True
+                except discord.Forbidden:
+                    self.stats.error(f"{label}: Forbidden")
+                    break
+                except Exception as e:
+                    if not _is_transient(e) or attempt >= MAX_RETRIES:
+                        raise
+                    attempt += 1
+                    delay = _retry_delay(e, attempt)
+                    self.stats.retries += 1
+                    self.stats.retry_wait_s += delay
+                    log.info(
+                        "crawl.retry channel=%s attempt=%d wait=%.1fs err=%s",
+                        label,
+                        attempt,
+                        delay,
+                        e,
+                    )
+                    await asyncio.sleep(delay)
+        finally:
+            prog.finished = time.monotonic()
+            self.stats.active.pop(cid, None)
+            self.stats.channels_done += 1
+        if finished:
+            await self._items.put((cid, 0, _DONE))
+
+    async def _worker(self) -> None:
+        while True:
+            ch = await self._targets.get()
+            try:
+                await self._scan(ch)
+            except Exception as e:
+                self.stats.error(f"{channel_label(ch)}: {e}")
+            finally:
+                self._targets.task_done()
+
+    async def _commit(self, batch: List[tuple]) -> None:
+        items: List[T] = []
+        marks: Dict[int, int] = {}
+        completed: List[int] = []
+        for cid, mid, item in batch:
+            if item is _DONE:
+                completed.append(cid)
+                continue
+            if mid > marks.get(cid, 0):
+                marks[cid] = mid
+            if item is not None:
+                items.append(item)
+        try:
+            if items:
+                self.stats.items_written += await self.write(items)
+            self.stats.batches += 1
+        except Exception as e:
+            self.stats.error(f"write batch of {len(items)}: {e}")
+            self._tainted.update(marks)
+            return
+        if self.checkpoint is None:
+            return
+        marks = {c: m for c, m in marks.items() if c not in self._tainted}
+        completed = [c for c in completed if c not in self._tainted]
+        if not (marks or completed):
+            return
+        try:
+            await self.checkpoint(marks, completed)
+        except Exception as e:
+            self.stats.error(f"checkpoint: {e}")
+
+    async def _writer(self) -> None:
+        done = False
+        while not done:
+            first = await self._items.get()
+            if first is None:
+                break
+            batch: List[tuple] = [first]
+            deadline = time.monotonic() + self.batch_ms / 1000.0
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._items.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    done = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+
+    # ---- entry point ----
+    async def run(self, channels: Iterable[Any]) -> CrawlStats:
+        for ch in channels:
+            if self._me is None:
+                self._me = getattr(getattr(ch, "guild", None), "me", None)
+            self._enqueue(ch)
+
+        writer = asyncio.create_task(self._writer(), name="crawl-writer")
+        workers = [
+            asyncio.create_task(self._worker(), name=f"crawl-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+        try:
+            await self._targets.join()
+        finally:
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self._items.put(None)
+            await writer
+        return self.stats
@@ -0,0 +1,59 @@
+"""
+HyperLogLog sketches for distinct-token counts (lexical diversity).
+
+The blob format, merge and estimator live in analytics.hll so the dashboard
+reads the same sketches; this module adds the SQLite hooks.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from typing import Optional
+
+import numpy as np
+
+from analytics.hll import (
+    DEFAULT_P,
+    decode,
+    encode,
+    estimate,
+    merge,
+    registers,
+    union_by_key,
+)
+
+__all__ = [
+    "DEFAULT_P",
+    "decode",
+    "encode",
+    "estimate",
+    "merge",
+    "register",
+    "registers",
+    "union_by_key",
+]
+
+
+class _UnionAggregate:
+    """SQL ``hll_count(blob)``: estimated distinct count of the merged group."""
+
+    def __init__(self):
+        self.regs: Optional[np.ndarray] = None
+
+    def step(self, blob):
+        if not blob:
+            return
+        r = decode(blob)
+        if self.regs is None:
+            self.regs = r
+        else:
+            np.maximum(self.regs, r, out=self.regs)
+
+    def finalize(self):
+        return 0.0 if self.regs is None else float(estimate(self.regs))
+
+
+def register(con: sqlite3.Connection) -> None:
+    """Install ``hll_merge(a, b)`` (``merge``) and the ``hll_count(blob)`` aggregate."""
+    con.create_function("hll_merge", 2, merge, deterministic=True)
+    con.create_aggregate("hll_count", 1, _UnionAggregate)